@@ -5,7 +5,7 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[('data/municipios_sc.json.gz', 'data')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
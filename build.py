@@ -62,6 +62,7 @@ def create_executable():
         "--add-data=services;services",  # Incluir serviços
         "--add-data=ui;ui",  # Incluir interface
         "--add-data=utils;utils",  # Incluir utilitários
+        "--add-data=data;data",  # Incluir snapshot de municípios
         "--hidden-import=PySide6.QtCore",
         "--hidden-import=PySide6.QtGui",
         "--hidden-import=PySide6.QtWidgets",
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para gerar os relatórios mensais por cidade ou região, sem interface gráfica
+"""
+
+import sys
+import os
+import argparse
+import logging
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def parse_args(argv=None):
+    """Lê as opções de linha de comando"""
+    parser = argparse.ArgumentParser(description="Gera um relatório por cidade ou região da carteira de imóveis")
+    parser.add_argument("--por", choices=("cidade", "regiao"), default="cidade",
+                        help="Particionamento dos relatórios (padrão: cidade)")
+    parser.add_argument("--pasta", default="relatorios",
+                        help="Pasta de saída dos relatórios e do índice (padrão: relatorios)")
+    parser.add_argument("--formatos", default="pdf,xlsx",
+                        help="Extensões a gerar, separadas por vírgula (padrão: pdf,xlsx; também csv, tsv.gz, parquet)")
+    parser.add_argument("--processos", type=int, default=None,
+                        help="Número de processos em paralelo (padrão: um por CPU)")
+    parser.add_argument("--banco", default="imoveis.db",
+                        help="Banco de dados SQLite (padrão: imoveis.db)")
+    parser.add_argument("--forcar", action="store_true",
+                        help="Gera todas as partições, mesmo as que não mudaram")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Função principal para gerar os relatórios"""
+    args = parse_args(argv)
+    formatos = tuple(formato.strip().lower().lstrip('.') for formato in args.formatos.split(',') if formato.strip())
+    try:
+        print(f"📑 Gerando relatórios por {args.por} ({', '.join(formatos)}) em {args.pasta}...")
+        print("=" * 60)
+
+        from models.database import DatabaseManager
+        from services.relatorio_service import RelatorioService, ARQUIVO_INDICE
+
+        if not os.path.exists(args.banco):
+            print(f"❌ Banco de dados não encontrado: {args.banco}")
+            return False
+
+        service = RelatorioService(DatabaseManager(args.banco))
+
+        def progresso(particao, reaproveitada):
+            print(f"   {'⏭️ ' if reaproveitada else '✅'} {particao}")
+
+        indice = service.gerar(args.pasta, por=args.por, formatos=formatos,
+                               processos=args.processos, forcar=args.forcar, progresso=progresso)
+
+        particoes = indice['particoes'].values()
+        geradas = [p for p in particoes if not p['reaproveitada']]
+        falhas = [p for p in geradas if p['impressao'] is None]
+        print(f"\n📊 {len(indice['particoes'])} partições: {len(geradas)} geradas, "
+              f"{len(indice['particoes']) - len(geradas)} sem alterações, {len(falhas)} com falha")
+        print(f"   Tempo total: {indice['segundos']:.2f}s")
+        print(f"   Índice: {os.path.join(args.pasta, ARQUIVO_INDICE)}")
+        return not falhas
+
+    except ImportError as e:
+        print(f"❌ Erro de importação: {e}")
+        print("💡 Certifique-se de que todas as dependências estão instaladas:")
+        print("   pip install -r requirements.txt")
+        return False
+
+    except Exception as e:
+        print(f"❌ Erro inesperado: {e}")
+        logging.error(f"Erro detalhado: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
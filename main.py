@@ -15,6 +15,7 @@ from models.database import DatabaseManager
 from ui.filtros_widget import FiltrosWidget
 from ui.tabela_imoveis import TabelaImoveis
 from ui.painel_calculo import PainelCalculo
+from ui.resumo_widget import ResumoWidget
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -89,7 +90,11 @@ class MainWindow(QMainWindow):
         
         # Tabela de imóveis (ocupa todo o espaço vertical)
         self.tabela_imoveis = TabelaImoveis()
-        right_layout.addWidget(self.tabela_imoveis)
+        right_layout.addWidget(self.tabela_imoveis, 3)
+        
+        # Resumo do portfólio agrupado abaixo da tabela
+        self.resumo_widget = ResumoWidget()
+        right_layout.addWidget(self.resumo_widget, 1)
         
         # Adicionar painel direito ao splitter
         main_splitter.addWidget(right_panel)
@@ -156,6 +161,9 @@ class MainWindow(QMainWindow):
         # Conectar seleção na tabela ao painel de cálculos
         self.tabela_imoveis.imovel_selecionado.connect(self.painel_calculo.carregar_imovel)
         
+        # Conectar dados exibidos na tabela ao resumo do portfólio
+        self.tabela_imoveis.dados_atualizados.connect(self.resumo_widget.carregar_colunas)
+        
     def load_data(self):
         """Carrega dados iniciais"""
         try:
@@ -9,8 +9,11 @@ import os
 from datetime import datetime
 import logging
 
+# Banco da aplicação, usado quando nenhum caminho é informado
+BANCO_PADRAO = "imoveis.db"
+
 class DatabaseManager:
-    def __init__(self, db_path="imoveis.db"):
+    def __init__(self, db_path=BANCO_PADRAO):
         self.db_path = db_path
         self.init_database()
         
@@ -67,6 +70,56 @@ class DatabaseManager:
                     )
                 """)
                 
+                # Criar tabela de indicadores personalizados (fórmulas definidas pelo usuário)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS indicadores_personalizados (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        nome TEXT NOT NULL UNIQUE,
+                        expressao TEXT NOT NULL,
+                        formato TEXT CHECK(formato IN ('numero', 'moeda', 'percentual')) DEFAULT 'numero',
+                        ativo INTEGER DEFAULT 1,
+                        data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+
+                # Criar tabela de histórico de preços (somente inserção)
+                # A chave (imovel_id, registrado_em) é o próprio índice clusterizado,
+                # então consultas por imóvel e intervalo de tempo não tocam outras linhas
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS imoveis_historico (
+                        imovel_id INTEGER NOT NULL,
+                        registrado_em TEXT NOT NULL,
+                        cidade TEXT NOT NULL,
+                        metragem REAL NOT NULL,
+                        preco_estimado REAL NOT NULL,
+                        custo_total REAL NOT NULL,
+                        status TEXT NOT NULL,
+                        PRIMARY KEY (imovel_id, registrado_em)
+                    ) WITHOUT ROWID
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_historico_cidade_tempo
+                    ON imoveis_historico(cidade, registrado_em)
+                """)
+                
+                # Agregado diário do histórico por cidade, atualizado a cada inserção:
+                # reamostragens e projeções leem um registro por cidade e dia, não
+                # todos os pontos. Somas (e não médias) para poder juntar dias
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS imoveis_historico_diario (
+                        cidade TEXT NOT NULL,
+                        dia TEXT NOT NULL,
+                        pontos INTEGER NOT NULL,
+                        soma_preco REAL NOT NULL,
+                        minimo_preco REAL NOT NULL,
+                        maximo_preco REAL NOT NULL,
+                        soma_custo REAL NOT NULL,
+                        soma_metragem REAL NOT NULL,
+                        PRIMARY KEY (cidade, dia)
+                    ) WITHOUT ROWID
+                """)
+                self.preencher_historico_diario(cursor)
+                
                 # Inserir parâmetros padrão se não existirem
                 self.insert_default_params(cursor)
                 
@@ -79,6 +132,24 @@ class DatabaseManager:
             logging.error(f"Erro ao inicializar banco de dados: {e}")
             raise
             
+    def preencher_historico_diario(self, cursor):
+        """Monta o agregado diário de bancos que já tinham histórico antes dele existir"""
+        cursor.execute("""
+            SELECT EXISTS (SELECT 1 FROM imoveis_historico_diario),
+                   EXISTS (SELECT 1 FROM imoveis_historico)
+        """)
+        agregado, historico = cursor.fetchone()
+        if agregado or not historico:
+            return
+        cursor.execute("""
+            INSERT INTO imoveis_historico_diario
+            (cidade, dia, pontos, soma_preco, minimo_preco, maximo_preco, soma_custo, soma_metragem)
+            SELECT cidade, substr(registrado_em, 1, 10), COUNT(*), SUM(preco_estimado),
+                   MIN(preco_estimado), MAX(preco_estimado), SUM(custo_total), SUM(metragem)
+            FROM imoveis_historico
+            GROUP BY 1, 2
+        """)
+            
     def insert_default_params(self, cursor):
         """Insere parâmetros padrão no banco"""
         default_params = [
@@ -87,7 +158,10 @@ class DatabaseManager:
             ('fator_padrao_medio', 1.0, 'Fator para padrão de acabamento médio'),
             ('fator_padrao_alto', 1.1, 'Fator para padrão de acabamento alto'),
             ('percentual_lucro_credor_default', 10.0, 'Percentual padrão de lucro do credor'),
-            ('lucro_desejado_investidor_default', 15.0, 'Percentual padrão de lucro desejado do investidor')
+            ('lucro_desejado_investidor_default', 15.0, 'Percentual padrão de lucro desejado do investidor'),
+            ('taxa_desconto_anual', 12.0, 'Taxa de desconto anual (%) usada no VPL'),
+            ('prazo_reforma_meses', 3.0, 'Meses de duração da reforma após a aquisição'),
+            ('prazo_venda_meses', 12.0, 'Meses entre a aquisição e a venda do imóvel')
         ]
         
         for chave, valor, descricao in default_params:
@@ -133,7 +207,7 @@ class DatabaseManager:
                 else:
                     cursor.execute(query)
                     
-                if query.strip().upper().startswith('SELECT'):
+                if query.strip().upper().startswith(('SELECT', 'WITH')):
                     return cursor.fetchall()
                 else:
                     conn.commit()
@@ -143,6 +217,19 @@ class DatabaseManager:
             logging.error(f"Erro ao executar query: {e}")
             raise
             
+    def execute_insert(self, query, params=None):
+        """Executa um INSERT e retorna o id da linha inserida"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params or ())
+                conn.commit()
+                return cursor.lastrowid
+                
+        except Exception as e:
+            logging.error(f"Erro ao executar inserção: {e}")
+            raise
+            
     def execute_many(self, query, params_list):
         """Executa uma query múltiplas vezes com diferentes parâmetros"""
         try:
@@ -9,8 +9,8 @@ import logging
 from models.database import DatabaseManager
 
 class ParametrosGlobais:
-    def __init__(self):
-        self.db_manager = DatabaseManager()
+    def __init__(self, db_manager: DatabaseManager = None):
+        self.db_manager = db_manager or DatabaseManager()
         
         # Parâmetros padrão
         self.preco_base_m2 = 5000.0
@@ -19,6 +19,9 @@ class ParametrosGlobais:
         self.fator_padrao_alto = 1.1
         self.percentual_lucro_credor_default = 10.0
         self.lucro_desejado_investidor = 15.0
+        self.taxa_desconto_anual = 12.0
+        self.prazo_reforma_meses = 3
+        self.prazo_venda_meses = 12
         
         # Carregar do banco
         self.load_from_db()
@@ -46,7 +49,10 @@ class ParametrosGlobais:
                 ('fator_padrao_medio', self.fator_padrao_medio),
                 ('fator_padrao_alto', self.fator_padrao_alto),
                 ('percentual_lucro_credor_default', self.percentual_lucro_credor_default),
-                ('lucro_desejado_investidor', self.lucro_desejado_investidor)
+                ('lucro_desejado_investidor', self.lucro_desejado_investidor),
+                ('taxa_desconto_anual', self.taxa_desconto_anual),
+                ('prazo_reforma_meses', self.prazo_reforma_meses),
+                ('prazo_venda_meses', self.prazo_venda_meses)
             ]
             
             for chave, valor in params_to_update:
@@ -78,7 +84,10 @@ class ParametrosGlobais:
             'fator_padrao_medio': self.fator_padrao_medio,
             'fator_padrao_alto': self.fator_padrao_alto,
             'percentual_lucro_credor_default': self.percentual_lucro_credor_default,
-            'lucro_desejado_investidor': self.lucro_desejado_investidor
+            'lucro_desejado_investidor': self.lucro_desejado_investidor,
+            'taxa_desconto_anual': self.taxa_desconto_anual,
+            'prazo_reforma_meses': self.prazo_reforma_meses,
+            'prazo_venda_meses': self.prazo_venda_meses
         }
         
     def update_from_dict(self, data: Dict[str, Any]):
@@ -98,6 +107,9 @@ class ParametrosGlobais:
         self.fator_padrao_alto = 1.1
         self.percentual_lucro_credor_default = 10.0
         self.lucro_desejado_investidor = 15.0
+        self.taxa_desconto_anual = 12.0
+        self.prazo_reforma_meses = 3
+        self.prazo_venda_meses = 12
         
         self.save_to_db()
         
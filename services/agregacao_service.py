@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serviço de agregação do portfólio: somas, médias, contagens e ROI ponderado
+por cidade, região, status e padrão, em uma única passada pelos dados
+"""
+
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Callable
+from models.imovel import Imovel
+from models.database import DatabaseManager
+from services.catalogo_cidades import get_catalogo
+import logging
+
+# Agrupamentos suportados: chave interna -> rótulo
+AGRUPAMENTOS = {
+    'cidade': 'Cidade',
+    'regiao': 'Região',
+    'status': 'Status',
+    'padrao_acabamento': 'Padrão',
+}
+
+# Colunas lidas do banco para montar os imóveis durante a passada
+_COLUNAS_IMOVEL = [
+    'id', 'endereco', 'cidade', 'estado', 'cep', 'latitude', 'longitude',
+    'metragem', 'quartos', 'banheiros', 'ano', 'padrao_acabamento',
+    'custo_aquisicao', 'custos_reforma', 'custos_transacao',
+    'percentual_lucro_credor', 'status', 'data_criacao', 'data_atualizacao'
+]
+
+
+class Acumulador:
+    """Totais de um grupo; ocupa memória constante independente do número de linhas"""
+
+    __slots__ = ('quantidade', 'soma_custo', 'soma_preco', 'soma_margem', 'soma_metragem')
+
+    def __init__(self):
+        self.quantidade = 0
+        self.soma_custo = 0.0
+        self.soma_preco = 0.0
+        self.soma_margem = 0.0
+        self.soma_metragem = 0.0
+
+    def adicionar(self, custo_total: float, preco_estimado: float, margem: float, metragem: float):
+        self.quantidade += 1
+        self.soma_custo += custo_total or 0.0
+        self.soma_preco += preco_estimado or 0.0
+        self.soma_margem += margem or 0.0
+        self.soma_metragem += metragem or 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converte o acumulador em somas, médias e ROI ponderado pelo custo"""
+        n = self.quantidade
+        return {
+            'quantidade': n,
+            'total_custo': self.soma_custo,
+            'total_preco_estimado': self.soma_preco,
+            'total_margem': self.soma_margem,
+            'total_metragem': self.soma_metragem,
+            'media_custo': self.soma_custo / n if n else 0.0,
+            'media_preco_estimado': self.soma_preco / n if n else 0.0,
+            'media_margem': self.soma_margem / n if n else 0.0,
+            'preco_medio_m2': self.soma_preco / self.soma_metragem if self.soma_metragem else 0.0,
+            'roi_ponderado': self.soma_margem / self.soma_custo * 100 if self.soma_custo else 0.0,
+        }
+
+
+class Agregador:
+    """
+    Agregação incremental: as linhas são adicionadas uma a uma (ex.: enquanto
+    um relatório é gerado) e o resultado sai no fim, sem guardar as linhas
+    """
+
+    def __init__(self, agrupamentos: List[str], regiao_da_cidade: Callable[[str], str]):
+        self.agrupamentos = list(agrupamentos)
+        self.regiao_da_cidade = regiao_da_cidade
+        self.total = Acumulador()
+        self.grupos: Dict[str, Dict[str, Acumulador]] = {chave: {} for chave in self.agrupamentos}
+
+    def adicionar(self, linha: Dict[str, Any]):
+        valores = (
+            linha.get('custo_total'),
+            linha.get('preco_venda_estimado'),
+            linha.get('margem'),
+            linha.get('metragem'),
+        )
+        self.total.adicionar(*valores)
+
+        for chave in self.agrupamentos:
+            if chave == 'regiao' and not linha.get('regiao'):
+                grupo = self.regiao_da_cidade(linha.get('cidade'))
+            else:
+                grupo = linha.get(chave) or "-"
+            acumulador = self.grupos[chave].get(grupo)
+            if acumulador is None:
+                acumulador = self.grupos[chave][grupo] = Acumulador()
+            acumulador.adicionar(*valores)
+
+    def resultado(self) -> Dict[str, Any]:
+        return {
+            'total': self.total.to_dict(),
+            'grupos': {
+                chave: {grupo: acc.to_dict() for grupo, acc in sorted(por_grupo.items())}
+                for chave, por_grupo in self.grupos.items()
+            }
+        }
+
+
+class AgregacaoService:
+    def __init__(self, calculo_service=None, db_manager: DatabaseManager = None,
+                 regiao_por_cidade: Callable[[str], str] = None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.calculo_service = calculo_service
+        self._regiao_por_cidade = regiao_por_cidade
+
+    def regiao_da_cidade(self, cidade: str) -> str:
+        """Retorna a região de uma cidade a partir do cadastro de municípios"""
+        if self._regiao_por_cidade is not None:
+            return self._regiao_por_cidade(cidade)
+        return get_catalogo(self.db_manager.db_path).regiao_de(cidade)
+
+    def agregar(self, linhas: Iterable[Dict[str, Any]],
+                agrupamentos: List[str] = None) -> Dict[str, Any]:
+        """
+        Agrega as linhas em uma única passada
+
+        Cada linha precisa de custo_total, preco_venda_estimado, margem,
+        metragem e das chaves de agrupamento (regiao é derivada da cidade
+        quando ausente). Retorna o total geral e um dicionário por
+        agrupamento com os indicadores de cada grupo.
+        """
+        agregador = self.novo_agregador(agrupamentos)
+        for linha in linhas:
+            agregador.adicionar(linha)
+        return agregador.resultado()
+
+    def novo_agregador(self, agrupamentos: List[str] = None) -> Agregador:
+        """Agregador incremental que usa o cadastro de municípios para derivar a região"""
+        return Agregador(agrupamentos or AGRUPAMENTOS.keys(), self.regiao_da_cidade)
+
+    def linhas_de_colunas(self, colunas: Dict[str, List[Any]]) -> Iterator[Dict[str, Any]]:
+        """Percorre um quadro colunar (um campo por lista) linha a linha, sem copiá-lo"""
+        nomes = list(colunas.keys())
+        for valores in zip(*(colunas[nome] for nome in nomes)):
+            yield dict(zip(nomes, valores))
+
+    def linhas_do_banco(self, where: str = "", params: tuple = (),
+                        tamanho_lote: int = 500) -> Iterator[Dict[str, Any]]:
+        """Lê os imóveis do banco em lotes e calcula os valores de cada linha"""
+        if self.calculo_service is None:
+            from services.calculo_service import get_calculo_service
+            self.calculo_service = get_calculo_service(self.db_manager)
+
+        query = f"SELECT {', '.join(_COLUNAS_IMOVEL)} FROM imoveis {where}"
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            while True:
+                lote = cursor.fetchmany(tamanho_lote)
+                if not lote:
+                    break
+                for row in lote:
+                    try:
+                        imovel = Imovel.from_db_row(row)
+                    except ValueError as e:
+                        logging.warning(f"Imóvel {row[0]} ignorado na agregação: {e}")
+                        continue
+                    linha = imovel.to_dict()
+                    linha.update(self.calculo_service.calcular_valores_base(imovel))
+                    yield linha
+
+    def agregar_banco(self, agrupamentos: List[str] = None, where: str = "",
+                      params: tuple = ()) -> Dict[str, Any]:
+        """Agrega o portfólio direto do banco, sem materializar a lista de imóveis"""
+        try:
+            return self.agregar(self.linhas_do_banco(where, params), agrupamentos)
+        except Exception as e:
+            logging.error(f"Erro ao agregar portfólio: {e}")
+            return self.agregar([], agrupamentos)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de busca de cidades em memória: nomes normalizados (sem acentos),
+busca por prefixo, por início de palavra e por trigramas, com ranking
+"""
+
+import bisect
+import heapq
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Níveis de relevância (menor = mais relevante)
+_EXATO = 0
+_PREFIXO = 1
+_PREFIXO_PALAVRA = 2
+_SUBSTRING = 3
+_APROXIMADO = 4
+
+# Fração mínima de trigramas da consulta presentes no nome para a busca aproximada
+SIMILARIDADE_MINIMA = 0.5
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples ("São  José" -> "sao jose")"""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().replace("'", ' ').replace('-', ' ').split())
+
+
+def trigramas(texto: str) -> Set[str]:
+    """Trigramas do texto com bordas marcadas, para tolerar erros de digitação"""
+    marcado = f"  {texto} "
+    return {marcado[i:i + 3] for i in range(len(marcado) - 2)}
+
+
+class IndiceBuscaCidades:
+    """
+    Índice imutável sobre (nome, região); construído uma vez por catálogo
+
+    As buscas por prefixo usam bisect sobre listas ordenadas e a busca
+    aproximada usa um índice invertido de trigramas, sem varrer os nomes.
+    O índice de trigramas só é montado na primeira busca que precisa dele,
+    para não pesar na carga do catálogo.
+    """
+
+    def __init__(self, cidades: Iterable[Tuple[str, str]]):
+        self.nomes: List[str] = []
+        self.regioes: List[str] = []
+        self.normalizados: List[str] = []
+        for nome, regiao in cidades:
+            self.nomes.append(nome)
+            self.regioes.append(regiao)
+            self.normalizados.append(normalizar(nome))
+
+        # Nome completo e cada início de palavra, ordenados para busca por prefixo
+        self._prefixos: List[Tuple[str, int, bool]] = []
+        for i, normalizado in enumerate(self.normalizados):
+            palavras = normalizado.split(' ')
+            for p in range(len(palavras)):
+                self._prefixos.append((' '.join(palavras[p:]), i, p == 0))
+        self._prefixos.sort()
+        self._chaves = [chave for chave, _, _ in self._prefixos]
+        self._indice_trigramas: Optional[Dict[str, List[int]]] = None
+
+    def __len__(self):
+        return len(self.nomes)
+
+    @property
+    def _trigramas(self) -> Dict[str, List[int]]:
+        if self._indice_trigramas is None:
+            indice: Dict[str, List[int]] = {}
+            for i, normalizado in enumerate(self.normalizados):
+                for trigrama in trigramas(normalizado):
+                    indice.setdefault(trigrama, []).append(i)
+            self._indice_trigramas = indice
+        return self._indice_trigramas
+
+    def _por_prefixo(self, consulta: str) -> Dict[int, int]:
+        encontrados = {}
+        inicio = bisect.bisect_left(self._chaves, consulta)
+        for chave, i, nome_completo in self._prefixos[inicio:]:
+            if not chave.startswith(consulta):
+                break
+            if nome_completo:
+                nivel = _EXATO if chave == consulta else _PREFIXO
+            else:
+                nivel = _PREFIXO_PALAVRA
+            encontrados[i] = min(nivel, encontrados.get(i, nivel))
+        return encontrados
+
+    def _por_substring(self, consulta: str) -> Set[int]:
+        """
+        Nomes que contêm a consulta em qualquer ponto: interseção das listas
+        dos trigramas internos (sem as bordas marcadas, que um trecho do meio
+        da palavra não tem), confirmada no nome
+        """
+        internos = {consulta[i:i + 3] for i in range(len(consulta) - 2)}
+        listas = sorted((self._trigramas.get(trigrama, ()) for trigrama in internos), key=len)
+        if not listas or not listas[0]:
+            return set()
+        candidatos = set(listas[0])
+        for lista in listas[1:]:
+            candidatos.intersection_update(lista)
+            if not candidatos:
+                return candidatos
+        return {i for i in candidatos if consulta in self.normalizados[i]}
+
+    def _por_trigramas(self, consulta: str) -> Dict[int, float]:
+        tri_consulta = trigramas(consulta)
+        contagem: Dict[int, int] = {}
+        for trigrama in tri_consulta:
+            for i in self._trigramas.get(trigrama, ()):
+                contagem[i] = contagem.get(i, 0) + 1
+        minimo = SIMILARIDADE_MINIMA * len(tri_consulta)
+        return {i: n / len(tri_consulta) for i, n in contagem.items() if n >= minimo}
+
+    def buscar(self, texto: str, regiao: Optional[str] = None, limite: Optional[int] = 20) -> List[str]:
+        """Retorna os nomes que casam com o texto, do mais para o menos relevante"""
+        consulta = normalizar(texto)
+        if not consulta:
+            return []
+
+        ranking: Dict[int, Tuple] = {}
+        for i, nivel in self._por_prefixo(consulta).items():
+            if not regiao or self.regioes[i] == regiao:
+                ranking[i] = (nivel, 0.0)
+        # Prefixos sempre vencem substrings e aproximações: com o limite já
+        # preenchido por eles, a busca por trigramas não mudaria o resultado
+        completo = limite is not None and len({self.nomes[i] for i in ranking}) >= limite
+        if len(consulta) >= 3 and not completo:
+            # Substrings não dependem da similaridade mínima, só as aproximações
+            for i in self._por_substring(consulta):
+                ranking.setdefault(i, (_SUBSTRING, 0.0))
+            for i, similaridade in self._por_trigramas(consulta).items():
+                ranking.setdefault(i, (_APROXIMADO, -similaridade))
+
+        if regiao:
+            ranking = {i: r for i, r in ranking.items() if self.regioes[i] == regiao}
+        chave = lambda i: (ranking[i], len(self.normalizados[i]), self.normalizados[i])
+        # Nomes repetidos em UFs diferentes aparecem uma vez só
+        if limite is not None:
+            nomes = list(dict.fromkeys(self.nomes[i] for i in heapq.nsmallest(2 * limite, ranking, key=chave)))
+            if len(nomes) >= limite or len(ranking) <= 2 * limite:
+                return nomes[:limite]
+        nomes = list(dict.fromkeys(self.nomes[i] for i in sorted(ranking, key=chave)))
+        return nomes[:limite] if limite is not None else nomes
+
+    def melhor(self, texto: str) -> Optional[str]:
+        """Nome mais relevante para o texto, ou None"""
+        resultado = self.buscar(texto, limite=1)
+        return resultado[0] if resultado else None
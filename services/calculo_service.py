@@ -4,19 +4,46 @@
 Serviço de cálculos para preços-alvo, margens e ROI
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from models.imovel import Imovel
 from models.localizacao import LocalizacaoIndice
 from models.parametros import ParametrosGlobais
-from models.database import DatabaseManager
+from models.database import DatabaseManager, BANCO_PADRAO
+from services.fluxo_caixa_service import FluxoCaixaService
+import os
+import threading
 import logging
 
+# Instância única da aplicação, criada sob demanda por get_calculo_service()
+_instancia = None
+_instancia_lock = threading.Lock()
+
+
+def get_calculo_service(db_manager: DatabaseManager = None) -> 'CalculoService':
+    """
+    Retorna o serviço de cálculo compartilhado pela interface e pelos trabalhos em segundo plano
+
+    Com um db_manager de outro banco, retorna um serviço próprio ligado a ele,
+    com os parâmetros e índices de localização desse banco.
+    """
+    if db_manager is not None and os.path.abspath(db_manager.db_path) != os.path.abspath(BANCO_PADRAO):
+        return CalculoService(db_manager)
+    global _instancia
+    if _instancia is None:
+        with _instancia_lock:
+            if _instancia is None:
+                _instancia = CalculoService()
+    return _instancia
+
+
 class CalculoService:
-    def __init__(self):
-        self.db_manager = DatabaseManager()
-        self.parametros = ParametrosGlobais()
-        # Cache para fatores de localização
+    def __init__(self, db_manager: DatabaseManager = None, parametros: ParametrosGlobais = None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.parametros = parametros or ParametrosGlobais(self.db_manager)
+        self.fluxo_caixa = FluxoCaixaService(self.parametros)
+        # Cache para fatores de localização, compartilhado entre threads
         self._fatores_cache = {}
+        self._fatores_lock = threading.Lock()
         
     def calcular_preco_venda_estimado(self, imovel: Imovel) -> float:
         """Calcula o preço de venda estimado do imóvel"""
@@ -47,9 +74,12 @@ class CalculoService:
         cache_key = f"{cidade}:{cep or 'default'}"
         
         # Verificar cache primeiro
-        if cache_key in self._fatores_cache:
-            return self._fatores_cache[cache_key]
+        with self._fatores_lock:
+            if cache_key in self._fatores_cache:
+                return self._fatores_cache[cache_key]
         
+        # A consulta roda fora do lock; se duas threads buscarem a mesma chave,
+        # a primeira a gravar prevalece e as duas devolvem o mesmo valor
         try:
             if cep:
                 query = """
@@ -68,22 +98,15 @@ class CalculoService:
                 """
                 result = self.db_manager.execute_query(query, (cidade,))
                 
-            if result:
-                fator = result[0][0]
-                # Armazenar no cache
-                self._fatores_cache[cache_key] = fator
-                return fator
-            else:
-                # Retornar fator padrão se não encontrar (sem warning)
-                fator_padrao = 1.0
-                self._fatores_cache[cache_key] = fator_padrao
-                return fator_padrao
+            # Retornar fator padrão se não encontrar (sem warning)
+            fator = result[0][0] if result else 1.0
                 
         except Exception as e:
             logging.error(f"Erro ao obter fator de localização: {e}")
-            fator_padrao = 1.0
-            self._fatores_cache[cache_key] = fator_padrao
-            return fator_padrao
+            fator = 1.0
+            
+        with self._fatores_lock:
+            return self._fatores_cache.setdefault(cache_key, fator)
             
     def calcular_custos_totais(self, imovel: Imovel) -> Dict[str, float]:
         """Calcula todos os custos do imóvel"""
@@ -129,14 +152,154 @@ class CalculoService:
             return (margem / custo_total) * 100
         return 0.0
         
-    def calcular_payback(self, custo_total: float, margem_mensal: float) -> float:
-        """Calcula o tempo de payback em meses"""
-        if margem_mensal > 0:
-            return custo_total / margem_mensal
-        return float('inf')
-        
     def calcular_tudo(self, imovel: Imovel) -> Dict[str, Any]:
         """Calcula todos os valores financeiros do imóvel"""
+        return self.calcular_lote([imovel])[0]
+        
+    def carregar_fatores_localizacao(self, imoveis: List[Imovel]):
+        """
+        Coloca no cache, com uma consulta por bloco de cidades, os fatores de
+        localização dos imóveis que ainda não estão nele (mesmo critério de
+        get_fator_localizacao: o índice mais recente da cidade/CEP)
+        """
+        self._carregar_fatores((imovel.cidade, imovel.cep) for imovel in imoveis)
+        
+    def _carregar_fatores(self, pares):
+        """carregar_fatores_localizacao para pares (cidade, CEP) soltos"""
+        with self._fatores_lock:
+            pendentes = {
+                (cidade, cep or None) for cidade, cep in pares
+                if f"{cidade}:{cep or 'default'}" not in self._fatores_cache
+            }
+        if not pendentes:
+            return
+            
+        cidades = sorted({cidade for cidade, _ in pendentes})
+        por_cidade, por_cep = {}, {}
+        try:
+            for inicio in range(0, len(cidades), 500):
+                bloco = cidades[inicio:inicio + 500]
+                query = f"""
+                    SELECT cidade, cep, fator_localizacao 
+                    FROM localizacao_indices 
+                    WHERE cidade IN ({', '.join('?' * len(bloco))})
+                    ORDER BY id
+                """
+                # Em ordem de id: o último índice de cada chave prevalece
+                for cidade, cep, fator in self.db_manager.execute_query(query, tuple(bloco)):
+                    por_cidade[cidade] = fator
+                    por_cep[(cidade, cep)] = fator
+        except Exception as e:
+            logging.error(f"Erro ao carregar fatores de localização: {e}")
+            return
+            
+        with self._fatores_lock:
+            for cidade, cep in pendentes:
+                fator = por_cep.get((cidade, cep), 1.0) if cep else por_cidade.get(cidade, 1.0)
+                self._fatores_cache.setdefault(f"{cidade}:{cep or 'default'}", fator)
+                
+    def calcular_lote(self, imoveis: List[Imovel]) -> List[Dict[str, Any]]:
+        """Calcula todos os valores financeiros de vários imóveis de uma vez"""
+        self.carregar_fatores_localizacao(imoveis)
+        bases = [self.calcular_valores_base(imovel) for imovel in imoveis]
+        
+        # VPL, TIR e payback do portfólio inteiro em uma única rodada do solver
+        indicadores = self.fluxo_caixa.calcular_indicadores_lote(
+            imoveis, [base['preco_venda_estimado'] for base in bases]
+        )
+        
+        resultados = []
+        for base, extras in zip(bases, indicadores):
+            resultado = dict(base)
+            resultado.update(extras)
+            resultados.append(resultado)
+        return resultados
+        
+    def calcular_colunas(self, colunas: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+        """
+        Calcula os valores financeiros de um quadro colunar (um campo por
+        lista) sem montar um Imovel por linha
+        
+        Mesmas contas de calcular_lote, coluna a coluna: um fator de
+        localização por cidade/CEP distinto, um fator por padrão de
+        acabamento e VPL/TIR/payback em uma rodada do solver. Campos ausentes
+        assumem os padrões do Imovel; linhas com metragem, custos, percentual
+        ou padrão inválidos ficam com None nos resultados.
+        """
+        n = len(next(iter(colunas.values()), []))
+        
+        def coluna(campo, padrao):
+            valores = colunas.get(campo)
+            return valores if valores is not None else [padrao] * n
+            
+        cidades = coluna('cidade', '')
+        ceps = coluna('cep', '')
+        metragens = coluna('metragem', 0.0)
+        padroes = coluna('padrao_acabamento', 'medio')
+        aquisicoes = [valor or 0.0 for valor in coluna('custo_aquisicao', 0.0)]
+        reformas = [valor or 0.0 for valor in coluna('custos_reforma', 0.0)]
+        transacoes = [valor or 0.0 for valor in coluna('custos_transacao', 0.0)]
+        percentual_padrao = self.parametros.percentual_lucro_credor_default
+        percentuais = [valor or percentual_padrao for valor in coluna('percentual_lucro_credor', 10.0)]
+        
+        validas = [
+            i for i in range(n)
+            if isinstance(metragens[i], (int, float)) and metragens[i] > 0
+            and padroes[i] in ('baixo', 'medio', 'alto') and 0 <= percentuais[i] <= 100
+            and aquisicoes[i] >= 0 and reformas[i] >= 0 and transacoes[i] >= 0
+        ]
+        if len(validas) < n:
+            invalidas = sorted(set(range(n)) - set(validas))
+            ids = coluna('id', None)
+            logging.warning(f"{len(invalidas)} imóveis sem cálculos por dados inválidos "
+                            f"(ids {[ids[i] for i in invalidas[:10]]})")
+            
+        # Fatores buscados uma vez por chave distinta, não por linha
+        pares = {(cidades[i], ceps[i] or None) for i in validas}
+        self._carregar_fatores(pares)
+        fatores_localizacao = {par: self.get_fator_localizacao(*par) for par in pares}
+        fatores_padrao = {padrao: self.parametros.get_fator_padrao(padrao) for padrao in ('baixo', 'medio', 'alto')}
+        
+        preco_base = self.parametros.preco_base_m2
+        lucro_investidor = self.parametros.lucro_desejado_investidor
+        precos = [
+            round(preco_base * metragens[i] * fatores_localizacao[(cidades[i], ceps[i] or None)]
+                  * fatores_padrao[padroes[i]], 2)
+            for i in validas
+        ]
+        custos = [aquisicoes[i] + reformas[i] + transacoes[i] for i in validas]
+        lucros_credor = [custo * (percentuais[i] / 100) for custo, i in zip(custos, validas)]
+        margens = [preco - custo for preco, custo in zip(precos, custos)]
+        resultados = {
+            'preco_venda_estimado': precos,
+            'custo_total': custos,
+            'lucro_credor': lucros_credor,
+            'lucro_investidor': [custo * (lucro_investidor / 100) for custo in custos],
+            'preco_minimo': [custo + lucro for custo, lucro in zip(custos, lucros_credor)],
+            'margem': margens,
+            'roi': [(margem / custo) * 100 if custo > 0 else 0.0 for margem, custo in zip(margens, custos)],
+        }
+        
+        indicadores = self.fluxo_caixa.calcular_indicadores_colunas(
+            [aquisicoes[i] for i in validas], [transacoes[i] for i in validas],
+            [reformas[i] for i in validas], precos
+        )
+        for campo in ('vpl', 'tir_mensal', 'tir_anual', 'payback_meses'):
+            resultados[campo] = [extras[campo] for extras in indicadores]
+            
+        if len(validas) == n:
+            return resultados
+        # Resultados de volta às posições do quadro, com None nas linhas inválidas
+        completos = {}
+        for campo, valores in resultados.items():
+            completo = [None] * n
+            for i, valor in zip(validas, valores):
+                completo[i] = valor
+            completos[campo] = completo
+        return completos
+        
+    def calcular_valores_base(self, imovel: Imovel) -> Dict[str, Any]:
+        """Calcula preço, custos, lucros, margem e ROI de um imóvel"""
         try:
             # Calcular preço de venda estimado
             preco_venda_estimado = self.calcular_preco_venda_estimado(imovel)
@@ -159,10 +322,6 @@ class CalculoService:
             # Calcular ROI
             roi = self.calcular_roi(margem, custo_total)
             
-            # Calcular payback estimado (assumindo margem mensal como 1/12 da margem anual)
-            margem_mensal = margem / 12 if margem > 0 else 0
-            payback_meses = self.calcular_payback(custo_total, margem_mensal)
-            
             return {
                 'preco_venda_estimado': preco_venda_estimado,
                 'custo_total': custo_total,
@@ -170,8 +329,7 @@ class CalculoService:
                 'lucro_investidor': lucro_investidor,
                 'preco_minimo': preco_minimo,
                 'margem': margem,
-                'roi': roi,
-                'payback_meses': payback_meses
+                'roi': roi
             }
             
         except Exception as e:
@@ -184,10 +342,15 @@ class CalculoService:
                 'lucro_investidor': 0.0,
                 'preco_minimo': 0.0,
                 'margem': 0.0,
-                'roi': 0.0,
-                'payback_meses': 0.0
+                'roi': 0.0
             }
             
     def limpar_cache(self):
         """Limpa o cache de fatores de localização"""
-        self._fatores_cache.clear()
+        with self._fatores_lock:
+            self._fatores_cache.clear()
+            
+    def recarregar_parametros(self):
+        """Relê os parâmetros globais do banco e descarta os fatores em cache"""
+        self.parametros.load_from_db()
+        self.limpar_cache()
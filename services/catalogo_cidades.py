@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Catálogo de municípios em memória, compartilhado pelo processo inteiro
+
+Carregado uma vez por banco com uma única consulta, expira após um TTL
+(para enxergar sincronizações feitas por outros processos) e é invalidado
+explicitamente a cada sincronização local.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.busca_cidades import IndiceBuscaCidades, normalizar
+from services.proximidade_cidades import IndiceProximidade
+
+# Validade padrão do catálogo em memória, em segundos
+TTL_PADRAO = 300.0
+
+REGIAO_PADRAO = "Central"
+
+
+class CatalogoCidades:
+    """
+    Visão imutável do cadastro de cidades com buscas O(1) e listas por região e UF
+
+    Nomes repetidos em UFs diferentes (ex.: "Bom Jesus") aparecem uma vez em
+    `nomes`; `por_nome` guarda a primeira UF em ordem alfabética e a UF pode
+    ser informada em `cidade()` para desambiguar.
+    """
+
+    def __init__(self, registros: List[Dict[str, Any]]):
+        self.carregado_em = time.monotonic()
+        self.cidades = sorted(registros, key=lambda cidade: (cidade['nome'], cidade.get('uf') or ''))
+        self.nomes = list(dict.fromkeys(cidade['nome'] for cidade in self.cidades))
+        self.por_nome: Dict[str, Dict[str, Any]] = {}
+        self.por_nome_normalizado: Dict[str, Dict[str, Any]] = {}
+        self.por_nome_uf: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.por_codigo = {cidade['codigo_ibge']: cidade for cidade in self.cidades}
+        self.por_regiao: Dict[str, List[Dict[str, Any]]] = {}
+        self.por_uf: Dict[str, List[Dict[str, Any]]] = {}
+        self.indice_busca = IndiceBuscaCidades((cidade['nome'], cidade['regiao']) for cidade in self.cidades)
+        for cidade, normalizado in zip(self.cidades, self.indice_busca.normalizados):
+            self.por_nome.setdefault(cidade['nome'], cidade)
+            self.por_nome_normalizado.setdefault(normalizado, cidade)
+            self.por_nome_uf[(normalizado, cidade.get('uf'))] = cidade
+            self.por_regiao.setdefault(cidade['regiao'], []).append(cidade)
+            self.por_uf.setdefault(cidade.get('uf'), []).append(cidade)
+        self.regioes = sorted(self.por_regiao)
+        self.ufs = sorted(uf for uf in self.por_uf if uf)
+        self._indice_proximidade: Optional[IndiceProximidade] = None
+
+    def __len__(self):
+        return len(self.cidades)
+
+    @property
+    def indice_proximidade(self) -> IndiceProximidade:
+        """Árvore KD dos centroides, montada no primeiro uso"""
+        if self._indice_proximidade is None:
+            self._indice_proximidade = IndiceProximidade(self.cidades)
+        return self._indice_proximidade
+
+    def cidade(self, nome: str, uf: str = None) -> Optional[Dict[str, Any]]:
+        """Cidade pelo nome exato ou, na falta dele, sem acentos/maiúsculas (opcionalmente na UF)"""
+        if uf:
+            return self.por_nome_uf.get((normalizar(nome), uf.upper()))
+        return self.por_nome.get(nome) or self.por_nome_normalizado.get(normalizar(nome))
+
+    def regiao_de(self, nome: str, padrao: str = REGIAO_PADRAO) -> str:
+        cidade = self.cidade(nome) if nome else None
+        return cidade['regiao'] if cidade else padrao
+
+
+_catalogos: Dict[str, CatalogoCidades] = {}
+_catalogos_lock = threading.Lock()
+
+
+def _carregar(db_path: str) -> CatalogoCidades:
+    campos = ('codigo_ibge', 'nome', 'regiao', 'latitude', 'longitude', 'populacao', 'uf')
+    try:
+        with sqlite3.connect(db_path) as conn:
+            colunas = {row[1] for row in conn.execute("PRAGMA table_info(cidades_sc)")}
+            # Bancos ainda não migrados para várias UFs só têm cidades de SC
+            uf = 'uf' if 'uf' in colunas else "'SC'"
+            rows = conn.execute(f"""
+                SELECT codigo_ibge, nome, regiao, latitude, longitude, populacao, {uf} FROM cidades_sc
+            """).fetchall()
+    except sqlite3.Error as e:
+        logging.warning(f"Cadastro de cidades indisponível: {e}")
+        rows = []
+    return CatalogoCidades([dict(zip(campos, row)) for row in rows])
+
+
+def get_catalogo(db_path: str = "imoveis.db", ttl: float = TTL_PADRAO) -> CatalogoCidades:
+    """Retorna o catálogo do banco, recarregando-o se expirou ou foi invalidado"""
+    chave = os.path.abspath(db_path)
+    with _catalogos_lock:
+        catalogo = _catalogos.get(chave)
+        if catalogo is None or time.monotonic() - catalogo.carregado_em >= ttl:
+            catalogo = _catalogos[chave] = _carregar(chave)
+        return catalogo
+
+
+def invalidar_catalogo(db_path: str = None):
+    """Descarta o catálogo de um banco (ou de todos) para a próxima leitura recarregar"""
+    with _catalogos_lock:
+        if db_path is None:
+            _catalogos.clear()
+        else:
+            _catalogos.pop(os.path.abspath(db_path), None)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Geocodificação de CEPs com cache local
+
+Cada CEP é consultado na fonte externa no máximo uma vez: o resultado
+(inclusive "não encontrado") fica na tabela ceps_cache e as consultas
+seguintes não usam a rede. A fonte é plugável para testes e para trocar
+de provedor.
+"""
+
+import re
+import sqlite3
+from abc import ABC, abstractmethod
+import logging
+import requests
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from services.http_client import ClienteHTTP, LimitadorTaxa, CircuitoAbertoError
+from services.catalogo_cidades import get_catalogo
+from services.proximidade_cidades import tem_centroide
+
+BRASILAPI_CEP = "https://brasilapi.com.br/api/cep/v2"
+
+# Campos devolvidos para cada CEP resolvido
+CAMPOS_CEP = ('cep', 'logradouro', 'bairro', 'cidade', 'uf', 'latitude', 'longitude', 'precisao')
+
+# Tamanho dos lotes de leitura do cache (limite de parâmetros do SQLite)
+LOTE_CONSULTA = 500
+
+
+def normalizar_cep(cep) -> Optional[str]:
+    """Só os 8 dígitos do CEP ("88015-600" -> "88015600"), ou None se inválido"""
+    digitos = re.sub(r'\D', '', str(cep or ''))
+    return digitos if len(digitos) == 8 else None
+
+
+class FonteCEP(ABC):
+    """Fonte externa de CEPs; consultar retorna None quando o CEP não existe"""
+
+    @abstractmethod
+    def consultar(self, cep: str) -> Optional[Dict]:
+        """Dados do CEP (8 dígitos): logradouro, bairro, cidade, uf, latitude e longitude"""
+
+
+class FonteBrasilAPI(FonteCEP):
+    """CEP v2 da BrasilAPI (logradouro, bairro, cidade, UF e, quando houver, coordenadas)"""
+
+    def __init__(self, base_url: str = BRASILAPI_CEP, http: ClienteHTTP = None, timeout: float = 5.0):
+        self.base_url = base_url.rstrip('/')
+        self.http = http or ClienteHTTP(timeout=timeout)
+        self.timeout = timeout
+
+    def consultar(self, cep: str) -> Optional[Dict]:
+        try:
+            dados = self.http.get_json(f"{self.base_url}/{cep}", timeout=self.timeout).dados
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+        coordenadas = ((dados.get('location') or {}).get('coordinates') or {})
+        return {
+            'logradouro': dados.get('street'),
+            'bairro': dados.get('neighborhood'),
+            'cidade': dados.get('city'),
+            'uf': dados.get('state'),
+            'latitude': float(coordenadas['latitude']) if coordenadas.get('latitude') else None,
+            'longitude': float(coordenadas['longitude']) if coordenadas.get('longitude') else None,
+        }
+
+
+class CepService:
+    def __init__(self, db_path: str = "imoveis.db", fonte: FonteCEP = None,
+                 max_concorrencia: int = 4, requisicoes_por_segundo: float = 5.0):
+        self.db_path = db_path
+        self.fonte = fonte or FonteBrasilAPI()
+        self.max_concorrencia = max(1, max_concorrencia)
+        self.limitador = LimitadorTaxa(requisicoes_por_segundo, capacidade=self.max_concorrencia)
+        self.estatisticas = {'consultas': 0, 'cache': 0, 'fonte': 0}
+        self.init_database()
+
+    def init_database(self):
+        """Cria a tabela de cache de CEPs"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS ceps_cache (
+                        cep TEXT PRIMARY KEY,
+                        encontrado INTEGER NOT NULL,
+                        logradouro TEXT,
+                        bairro TEXT,
+                        cidade TEXT,
+                        uf TEXT,
+                        latitude REAL,
+                        longitude REAL,
+                        precisao TEXT,
+                        consultado_em TIMESTAMP NOT NULL
+                    ) WITHOUT ROWID
+                """)
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Erro ao inicializar cache de CEPs: {e}")
+            raise
+
+    def _ler_cache(self, ceps: List[str]) -> Dict[str, Optional[Dict]]:
+        encontrados = {}
+        with sqlite3.connect(self.db_path) as conn:
+            for inicio in range(0, len(ceps), LOTE_CONSULTA):
+                lote = ceps[inicio:inicio + LOTE_CONSULTA]
+                rows = conn.execute(f"""
+                    SELECT encontrado, {', '.join(CAMPOS_CEP)} FROM ceps_cache
+                    WHERE cep IN ({', '.join('?' * len(lote))})
+                """, lote).fetchall()
+                for encontrado, *valores in rows:
+                    encontrados[valores[0]] = dict(zip(CAMPOS_CEP, valores)) if encontrado else None
+        return encontrados
+
+    def _gravar_cache(self, resultados: Dict[str, Optional[Dict]]):
+        agora = datetime.now().isoformat(sep=' ')
+        linhas = []
+        for cep, dados in resultados.items():
+            dados = dados or {}
+            linhas.append((cep, 1 if dados else 0, *(dados.get(campo) for campo in CAMPOS_CEP[1:]), agora))
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(f"""
+                INSERT OR REPLACE INTO ceps_cache (cep, encontrado, {', '.join(CAMPOS_CEP[1:])}, consultado_em)
+                VALUES ({', '.join('?' * (len(CAMPOS_CEP) + 2))})
+            """, linhas)
+            conn.commit()
+
+    def _completar_centroide(self, dados: Dict) -> Dict:
+        """Sem coordenadas do CEP, usa o centroide do município como aproximação"""
+        if tem_centroide(dados):
+            dados['precisao'] = 'cep'
+            return dados
+        cidade = get_catalogo(self.db_path).cidade(dados.get('cidade') or '', dados.get('uf'))
+        if cidade and tem_centroide(cidade):
+            dados['latitude'], dados['longitude'] = cidade['latitude'], cidade['longitude']
+            dados['precisao'] = 'municipio'
+        else:
+            dados['precisao'] = None
+        return dados
+
+    def _consultar_fonte(self, cep: str):
+        """Consulta a fonte externa; devolve (cep, dados) ou (cep, False) em caso de falha"""
+        try:
+            if not self.limitador.adquirir(timeout=30):
+                raise TimeoutError("limite de requisições excedido")
+            dados = self.fonte.consultar(cep)
+        except CircuitoAbertoError:
+            return cep, False
+        except Exception as e:
+            logging.warning(f"Erro ao consultar CEP {cep}: {e}")
+            return cep, False
+        if dados is None:
+            return cep, None
+        return cep, self._completar_centroide(dict(dados, cep=cep))
+
+    def resolver(self, cep) -> Optional[Dict]:
+        """Resolve um CEP (bairro, cidade, UF e coordenadas) pelo cache ou pela fonte"""
+        return self.resolver_lote([cep]).get(normalizar_cep(cep))
+
+    def resolver_lote(self, ceps: Iterable, progresso: Callable[[int, int], None] = None) -> Dict[str, Optional[Dict]]:
+        """
+        Resolve vários CEPs de uma vez
+
+        Os CEPs são normalizados e deduplicados; os que já estão no cache saem
+        de uma única leitura em lote e só os demais vão à fonte, em paralelo
+        e respeitando o limite de requisições. Retorna {cep normalizado: dados
+        ou None}. Falhas de rede não são gravadas no cache (nova tentativa na
+        próxima chamada); CEPs inexistentes são.
+        """
+        unicos = list(dict.fromkeys(filter(None, map(normalizar_cep, ceps))))
+        resultados = self._ler_cache(unicos)
+        pendentes = [cep for cep in unicos if cep not in resultados]
+        self.estatisticas['consultas'] += len(unicos)
+        self.estatisticas['cache'] += len(resultados)
+
+        if pendentes:
+            novos = {}
+            with ThreadPoolExecutor(max_workers=min(self.max_concorrencia, len(pendentes))) as executor:
+                for i, (cep, dados) in enumerate(executor.map(self._consultar_fonte, pendentes), 1):
+                    if dados is not False:
+                        novos[cep] = dados
+                    if progresso:
+                        progresso(i, len(pendentes))
+            self.estatisticas['fonte'] += len(pendentes)
+            if novos:
+                self._gravar_cache(novos)
+            resultados.update(novos)
+
+        return {cep: resultados.get(cep) for cep in unicos}
+
+    def completar_coordenadas_imoveis(self, progresso: Callable[[int, int], None] = None) -> int:
+        """Preenche latitude/longitude dos imóveis sem coordenadas a partir do CEP; retorna quantos"""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute("""
+                SELECT id, cep FROM imoveis
+                WHERE (latitude IS NULL OR longitude IS NULL) AND cep IS NOT NULL AND cep != ''
+            """).fetchall()
+        if not rows:
+            return 0
+
+        resolvidos = self.resolver_lote((cep for _, cep in rows), progresso)
+        atualizacoes = []
+        for imovel_id, cep in rows:
+            dados = resolvidos.get(normalizar_cep(cep))
+            if dados and dados.get('latitude') and dados.get('longitude'):
+                atualizacoes.append((dados['latitude'], dados['longitude'], imovel_id))
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany("""
+                UPDATE imoveis SET latitude = ?, longitude = ?, data_atualizacao = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, atualizacoes)
+            conn.commit()
+        logging.info(f"Coordenadas preenchidas por CEP em {len(atualizacoes)} de {len(rows)} imóveis")
+        return len(atualizacoes)
@@ -1,23 +1,286 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Serviço para gerenciar cidades de Santa Catarina
+Serviço para gerenciar cidades (Santa Catarina por padrão, ou um conjunto de UFs)
 Sistema híbrido: banco local + API online
 """
 
+import os
+import gzip
 import sqlite3
 import requests
 import json
 import logging
-from typing import List, Dict, Optional
+import threading
+from typing import List, Dict, Optional, Callable, Iterable
 from datetime import datetime, timedelta
-import time
+from concurrent.futures import ThreadPoolExecutor
+from services.http_client import LimitadorTaxa, ClienteHTTP, CircuitoAbertoError
+from services.busca_cidades import IndiceBuscaCidades, normalizar
+from services.catalogo_cidades import CatalogoCidades, get_catalogo, invalidar_catalogo, TTL_PADRAO
+from services.proximidade_cidades import distancia_km, tem_centroide
+from services.regioes_geograficas import (MESORREGIAO, MICRORREGIAO, caminho_malha, get_classificador,
+                                          invalidar_classificadores)
+
+IBGE_API_BASE = "https://servicodados.ibge.gov.br/api/v1/localidades"
+IBGE_MALHAS_BASE = "https://servicodados.ibge.gov.br/api/v3/malhas"
+
+# Códigos IBGE das unidades da federação
+CODIGOS_UF = {
+    'RO': 11, 'AC': 12, 'AM': 13, 'RR': 14, 'PA': 15, 'AP': 16, 'TO': 17,
+    'MA': 21, 'PI': 22, 'CE': 23, 'RN': 24, 'PB': 25, 'PE': 26, 'AL': 27, 'SE': 28, 'BA': 29,
+    'MG': 31, 'ES': 32, 'RJ': 33, 'SP': 35,
+    'PR': 41, 'SC': 42, 'RS': 43,
+    'MS': 50, 'MT': 51, 'GO': 52, 'DF': 53,
+}
+
+# Catálogos de municípios distribuídos com a aplicação (carregados sem rede no primeiro uso)
+DIRETORIO_SNAPSHOTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+FORMATO_SNAPSHOT = 1
+
+
+def caminho_snapshot(uf: str) -> str:
+    """Arquivo do snapshot de municípios de uma UF"""
+    return os.path.join(DIRETORIO_SNAPSHOTS, f"municipios_{uf.lower()}.json.gz")
+
+
+SNAPSHOT_PADRAO = caminho_snapshot('SC')
+
+# Folga, em km, entre o centroide da cidade digitada e o do município mais
+# próximo antes de o imóvel ser marcado como de cidade divergente
+DISTANCIA_DIVERGENCIA_KM = 15.0
+
+
+# Regiões Norte - cidades conhecidas
+_CIDADES_NORTE = {
+    'Joinville', 'São Francisco do Sul', 'Itapoá', 'Araquari', 'Garuva',
+    'São Bento do Sul', 'Campo Alegre', 'Rio Negrinho', 'Canoinhas',
+    'Mafra', 'Major Vieira', 'Irineópolis', 'Monte Castelo', 'Papanduva',
+    'Três Barras', 'Bela Vista do Toldo', 'Timbó Grande', 'Santa Terezinha',
+    'Doutor Pedrinho', 'Corupá', 'Schroeder', 'Guaramirim', 'Massaranduba',
+    'Jaraguá do Sul', 'Pomerode', 'Blumenau', 'Indaial', 'Rodeio',
+    'Ascurra', 'Apiúna', 'Ibirama', 'Lontras', 'Rio do Sul',
+    'Aurora', 'Agrolândia', 'Benedito Novo', 'Timbó', 'Rio dos Cedros',
+    'Itaiópolis', 'Matos Costa'
+}
+
+# Regiões Sul - cidades conhecidas  
+_CIDADES_SUL = {
+    'Criciúma', 'Içara', 'Nova Veneza', 'Forquilhinha', 'Siderópolis',
+    'Urussanga', 'Cocal do Sul', 'Morro da Fumaça', 'Araranguá',
+    'Balneário Arroio do Silva', 'Balneário Gaivota', 'Balneário Rincão',
+    'Sombrio', 'Santa Rosa do Sul', 'São João do Sul', 'Passo de Torres',
+    'Jacinto Machado', 'Maracajá', 'Meleiro', 'Turvo', 'Ermo',
+    'Sangão', 'Jaguaruna', 'Laguna', 'Imbituba', 'Garopaba',
+    'Paulo Lopes', 'Tubarão', 'Capivari de Baixo', 'Pedras Grandes',
+    'Treze de Maio', 'Orleans', 'Lauro Müller', 'Bom Jardim da Serra',
+    'Urubici', 'São Joaquim', 'Urupema', 'Bom Retiro'
+}
+
+# Regiões Oeste - cidades conhecidas
+_CIDADES_OESTE = {
+    'Chapecó', 'São Miguel do Oeste', 'Xanxerê', 'Concórdia', 'Joaçaba',
+    'Videira', 'Caçador', 'São Lourenço do Oeste', 'Palmitos', 'Caibi',
+    'Maravilha', 'Cunha Porã', 'São José do Cedro', 'Guaraciaba',
+    'Itapiranga', 'Mondaí', 'Riqueza', 'Romelândia', 'Bandeirante',
+    'Barra Bonita', 'Belmonte', 'Descanso', 'Dionísio Cerqueira',
+    'Guarujá do Sul', 'Paraíso', 'São João do Oeste', 'Tunápolis',
+    'Capinzal', 'Herval d\'Oeste', 'Ouro', 'Lacerdópolis', 'Tangará',
+    'Pinheiro Preto', 'Salto Veloso', 'Treze Tílias', 'Vargem Bonita',
+    'Fraiburgo', 'Lebon Régis', 'Monte Carlo', 'Rio das Antas',
+    'Abelardo Luz', 'Entre Rios', 'Vargeão', 'Xaxim', 'Águas de Chapecó',
+    'Águas Frias', 'Caxambu do Sul', 'Cordilheira Alta', 'Cunhataí',
+    'Formosa do Sul', 'Guatambu', 'Irati', 'Jardinópolis', 'Modelo',
+    'Nova Erechim', 'Nova Itaberaba', 'Peritiba', 'Pinhalzinho',
+    'Planalto Alegre', 'Quilombo', 'Saltinho', 'Santa Terezinha do Progresso',
+    'Santiago do Sul', 'São Bernardino', 'São Carlos', 'São Domingos',
+    'Saudades', 'Serra Alta', 'Sul Brasil', 'Tigrinhos', 'União do Oeste'
+}
+
+# Regiões Leste - cidades conhecidas
+_CIDADES_LESTE = {
+    'Florianópolis', 'São José', 'Palhoça', 'Biguaçu', 'Santo Amaro da Imperatriz',
+    'Águas Mornas', 'São Pedro de Alcântara', 'Antônio Carlos', 'Governador Celso Ramos',
+    'Itajaí', 'Balneário Camboriú', 'Camboriú', 'Navegantes', 'Penha',
+    'Piçarras', 'Balneário Piçarras', 'Itapema', 'Porto Belo', 'Bombinhas',
+    'Tijucas', 'Canelinha', 'São João Batista', 'Nova Trento', 'Major Gercino',
+    'Brusque', 'Guabiruba', 'Botuverá', 'Nova Trento', 'Gaspar'
+}
+
+# Precedência da verificação original: Norte, Sul, Oeste, Leste
+REGIAO_POR_CIDADE_SC = {
+    **dict.fromkeys(_CIDADES_LESTE, "Leste"),
+    **dict.fromkeys(_CIDADES_OESTE, "Oeste"),
+    **dict.fromkeys(_CIDADES_SUL, "Sul"),
+    **dict.fromkeys(_CIDADES_NORTE, "Norte"),
+}
+
+# Região da aplicação para cada mesorregião do IBGE em SC (classificação por polígonos)
+REGIAO_POR_MESORREGIAO_SC = {
+    'Oeste Catarinense': "Oeste",
+    'Norte Catarinense': "Norte",
+    'Serrana': "Central",
+    'Vale do Itajaí': "Leste",
+    'Grande Florianópolis': "Leste",
+    'Sul Catarinense': "Sul",
+}
+
+# Coordenadas aproximadas para cidades principais
+COORDENADAS_APROXIMADAS = {
+    'Florianópolis': {'lat': -27.5969, 'lon': -48.5495},
+    'Joinville': {'lat': -26.3044, 'lon': -48.8463},
+    'Blumenau': {'lat': -26.9189, 'lon': -49.0661},
+    'Criciúma': {'lat': -28.6775, 'lon': -49.3697},
+    'Itajaí': {'lat': -26.9077, 'lon': -48.6618},
+    'Chapecó': {'lat': -27.0969, 'lon': -52.6189},
+    'Lages': {'lat': -27.8156, 'lon': -50.3264},
+    'Balneário Camboriú': {'lat': -26.9922, 'lon': -48.6353},
+    'Palhoça': {'lat': -27.6444, 'lon': -48.6678},
+    'São José': {'lat': -27.6136, 'lon': -48.6366},
+    'Tubarão': {'lat': -28.4717, 'lon': -49.0083},
+    'Canoinhas': {'lat': -26.1769, 'lon': -50.3908},
+    'Mafra': {'lat': -26.1111, 'lon': -49.8056},
+    'Rio do Sul': {'lat': -27.2156, 'lon': -49.6433},
+    'Jaraguá do Sul': {'lat': -26.4856, 'lon': -49.0717},
+    'Brusque': {'lat': -27.0978, 'lon': -48.9167},
+    'Navegantes': {'lat': -26.8989, 'lon': -48.6547},
+    'Penha': {'lat': -26.7708, 'lon': -48.6467},
+    'Piçarras': {'lat': -26.7639, 'lon': -48.6717},
+    'Porto Belo': {'lat': -27.1589, 'lon': -48.5497},
+    'Tijucas': {'lat': -27.2417, 'lon': -48.6333},
+    'Biguaçu': {'lat': -27.4917, 'lon': -48.6583},
+    'São João Batista': {'lat': -27.2750, 'lon': -48.8472},
+    'Gaspar': {'lat': -26.9333, 'lon': -48.9583},
+    'Guabiruba': {'lat': -27.0833, 'lon': -48.9833},
+    'Indaial': {'lat': -26.9000, 'lon': -49.2333},
+    'Pomerode': {'lat': -26.7389, 'lon': -49.1789},
+    'Rodeio': {'lat': -26.9222, 'lon': -49.3667},
+    'Doutor Pedrinho': {'lat': -26.7167, 'lon': -49.4833},
+    'Benedito Novo': {'lat': -26.7833, 'lon': -49.3667},
+    'Botuverá': {'lat': -27.2000, 'lon': -49.0667},
+    'Major Gercino': {'lat': -27.4167, 'lon': -48.9500},
+    'Nova Trento': {'lat': -27.2833, 'lon': -48.9333},
+    'Leoberto Leal': {'lat': -27.5000, 'lon': -49.2833},
+    'Angelina': {'lat': -27.5667, 'lon': -48.9833},
+    'Rancho Queimado': {'lat': -27.6833, 'lon': -49.0167},
+    'Anitápolis': {'lat': -27.9000, 'lon': -49.1333},
+    'Capinzal': {'lat': -27.3406, 'lon': -51.6117},
+    'Ouro': {'lat': -27.3333, 'lon': -51.6167},
+    'Lacerdópolis': {'lat': -27.2500, 'lon': -51.5500},
+    'Herval d\'Oeste': {'lat': -27.2000, 'lon': -51.5000},
+    'Fraiburgo': {'lat': -27.0167, 'lon': -50.9167},
+    'Videira': {'lat': -27.0167, 'lon': -51.1500},
+    'Tangará': {'lat': -27.1000, 'lon': -51.2333},
+    'Pinheiro Preto': {'lat': -27.0500, 'lon': -51.2333},
+    'Salto Veloso': {'lat': -26.9000, 'lon': -51.4000},
+    'Treze Tílias': {'lat': -27.0000, 'lon': -51.4000},
+    'Vargem Bonita': {'lat': -27.0167, 'lon': -51.7333},
+    'Monte Carlo': {'lat': -27.2167, 'lon': -50.9833},
+    'Lebon Régis': {'lat': -26.9333, 'lon': -50.7000},
+    'Brunópolis': {'lat': -27.3000, 'lon': -49.8000},
+    'Curitibanos': {'lat': -27.2833, 'lon': -50.5833},
+    'Campos Novos': {'lat': -27.4000, 'lon': -49.6333},
+    'Abelardo Luz': {'lat': -26.5667, 'lon': -52.3333},
+    'Coronel Martins': {'lat': -26.5167, 'lon': -52.6667},
+    'Entre Rios': {'lat': -26.7167, 'lon': -52.5667},
+    'Galvão': {'lat': -26.4500, 'lon': -52.6833},
+    'Ipuaçu': {'lat': -26.6333, 'lon': -52.4500},
+    'Jupiá': {'lat': -26.4000, 'lon': -52.7333},
+    'Lacerdópolis': {'lat': -27.2500, 'lon': -51.5500},
+    'Lajeado Grande': {'lat': -26.8500, 'lon': -52.5667},
+    'Marema': {'lat': -26.8000, 'lon': -52.6167},
+    'Ouro Verde': {'lat': -26.7000, 'lon': -52.3167},
+    'Passos Maia': {'lat': -26.7833, 'lon': -52.0667},
+    'Vargeão': {'lat': -26.8667, 'lon': -52.1500},
+    'Xanxerê': {'lat': -26.8833, 'lon': -52.4000},
+    'Xaxim': {'lat': -26.9667, 'lon': -52.5333},
+    'Águas de Chapecó': {'lat': -27.0667, 'lon': -52.9833},
+    'Águas Frias': {'lat': -26.8833, 'lon': -52.8667},
+    'Bandeirante': {'lat': -26.7667, 'lon': -53.6333},
+    'Barra Bonita': {'lat': -26.6500, 'lon': -53.4333},
+    'Belmonte': {'lat': -26.8333, 'lon': -53.5833},
+    'Bom Jesus do Oeste': {'lat': -26.7167, 'lon': -53.1000},
+    'Caibi': {'lat': -27.0667, 'lon': -53.2500},
+    'Campo Erê': {'lat': -26.4000, 'lon': -53.1000},
+    'Caxambu do Sul': {'lat': -27.1667, 'lon': -52.8833},
+    'Chapecó': {'lat': -27.0969, 'lon': -52.6189},
+    'Cordilheira Alta': {'lat': -26.9833, 'lon': -52.6000},
+    'Cunha Porã': {'lat': -26.8833, 'lon': -53.1667},
+    'Cunhataí': {'lat': -26.9667, 'lon': -53.1000},
+    'Dionísio Cerqueira': {'lat': -26.2500, 'lon': -53.6333},
+    'Flor do Sertão': {'lat': -26.7833, 'lon': -53.3500},
+    'Formosa do Sul': {'lat': -26.6500, 'lon': -52.6667},
+    'Guatambu': {'lat': -27.1333, 'lon': -52.7833},
+    'Guaraciaba': {'lat': -26.6000, 'lon': -53.5167},
+    'Guarujá do Sul': {'lat': -26.3833, 'lon': -53.5333},
+    'Irati': {'lat': -26.6500, 'lon': -52.9000},
+    'Iraceminha': {'lat': -26.8167, 'lon': -53.2833},
+    'Itapiranga': {'lat': -27.1667, 'lon': -53.7167},
+    'Jardinópolis': {'lat': -26.7167, 'lon': -52.8500},
+    'Joaçaba': {'lat': -27.1667, 'lon': -49.7833},
+    'Maravilha': {'lat': -26.7667, 'lon': -53.1667},
+    'Mondaí': {'lat': -27.1000, 'lon': -53.4000},
+    'Modelo': {'lat': -26.7833, 'lon': -53.0500},
+    'Nova Erechim': {'lat': -26.9000, 'lon': -52.9000},
+    'Nova Itaberaba': {'lat': -26.9500, 'lon': -52.8000},
+    'Nova Veneza': {'lat': -28.6333, 'lon': -49.5000},
+    'Palmitos': {'lat': -27.0667, 'lon': -53.1667},
+    'Paraíso': {'lat': -26.6167, 'lon': -53.6833},
+    'Peritiba': {'lat': -27.0667, 'lon': -52.7333},
+    'Pinhalzinho': {'lat': -26.8500, 'lon': -52.9833},
+    'Pinheiro Preto': {'lat': -27.0500, 'lon': -51.2333},
+    'Planalto Alegre': {'lat': -27.0667, 'lon': -52.8667},
+    'Quilombo': {'lat': -26.7333, 'lon': -52.7167},
+    'Rio das Antas': {'lat': -26.9000, 'lon': -49.7833},
+    'Riqueza': {'lat': -27.0667, 'lon': -53.3333},
+    'Romelândia': {'lat': -26.6833, 'lon': -53.3167},
+    'Saltinho': {'lat': -26.6000, 'lon': -53.0500},
+    'Santa Terezinha do Progresso': {'lat': -26.6167, 'lon': -52.9667},
+    'Santiago do Sul': {'lat': -26.6333, 'lon': -52.6833},
+    'São Bernardino': {'lat': -26.4667, 'lon': -52.9667},
+    'São Carlos': {'lat': -27.0667, 'lon': -53.0000},
+    'São Domingos': {'lat': -26.5500, 'lon': -52.5333},
+    'São João do Oeste': {'lat': -27.1000, 'lon': -53.6000},
+    'São José do Cedro': {'lat': -26.4500, 'lon': -53.5000},
+    'São Lourenço do Oeste': {'lat': -26.3667, 'lon': -52.8500},
+    'São Miguel da Boa Vista': {'lat': -26.9500, 'lon': -53.2500},
+    'São Miguel do Oeste': {'lat': -26.7167, 'lon': -53.5167},
+    'Saudades': {'lat': -26.9167, 'lon': -53.0000},
+    'Serra Alta': {'lat': -26.7167, 'lon': -53.0500},
+    'Sul Brasil': {'lat': -26.7333, 'lon': -52.9667},
+    'Tigrinhos': {'lat': -26.6833, 'lon': -53.1500},
+    'Tunápolis': {'lat': -26.9667, 'lon': -53.6333},
+    'União do Oeste': {'lat': -26.7667, 'lon': -52.8500},
+    'Vidal Ramos': {'lat': -27.3833, 'lon': -49.3667}
+}
+
+_COORDENADAS_POR_NOME = {normalizar(nome): coords for nome, coords in COORDENADAS_APROXIMADAS.items()}
+_COORDENADAS_POR_SUBSTRING = sorted(_COORDENADAS_POR_NOME.items(), key=lambda item: -len(item[0]))
 
 class CidadeService:
-    def __init__(self, db_path="imoveis.db"):
+    def __init__(self, db_path="imoveis.db", api_base: str = IBGE_API_BASE,
+                 max_concorrencia: int = 8, requisicoes_por_segundo: float = 20.0,
+                 timeout: float = 5.0, cache_dir: str = None, catalogo_ttl: float = TTL_PADRAO,
+                 ufs: Iterable[str] = ('SC',)):
         self.db_path = db_path
-        self.api_url = "https://servicodados.ibge.gov.br/api/v1/localidades/estados/42/municipios"
+        self.api_base = api_base.rstrip('/')
+        # Cada UF é uma partição do cadastro, sincronizada de forma independente
+        self.ufs = tuple(dict.fromkeys(uf.upper() for uf in ufs))
+        invalidas = [uf for uf in self.ufs if uf not in CODIGOS_UF]
+        if not self.ufs or invalidas:
+            raise ValueError(f"UFs inválidas: {', '.join(invalidas) or 'nenhuma informada'}")
+        self.api_url = self._url_municipios(self.ufs[0])
         self.cache_duration = timedelta(days=7)  # Cache por 7 dias
+        # Busca de coordenadas em paralelo, limitada para não sobrecarregar a API
+        self.max_concorrencia = max(1, max_concorrencia)
+        self.limitador = LimitadorTaxa(requisicoes_por_segundo)
+        self.timeout = timeout
+        # Sessão HTTP reaproveitada, com cache em disco para requisições condicionais
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), ".cache_ibge")
+        self.http = ClienteHTTP(cache_dir, pool_maxsize=self.max_concorrencia, timeout=timeout)
+        # Catálogo em memória compartilhado pelo processo; invalidado a cada sincronização
+        self.catalogo_ttl = catalogo_ttl
         self.init_database()
         
     def init_database(self):
@@ -37,14 +300,50 @@ class CidadeService:
                         longitude REAL,
                         populacao INTEGER,
                         ultima_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        fonte TEXT DEFAULT 'ibge'
+                        fonte TEXT DEFAULT 'ibge',
+                        uf TEXT NOT NULL DEFAULT 'SC'
                     )
                 """)
                 
+                # Bancos anteriores ao suporte a várias UFs: todas as cidades são de SC
+                colunas = {row[1] for row in cursor.execute("PRAGMA table_info(cidades_sc)")}
+                if 'uf' not in colunas:
+                    cursor.execute("ALTER TABLE cidades_sc ADD COLUMN uf TEXT NOT NULL DEFAULT 'SC'")
+                
                 # Criar índices para performance
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_cidades_nome ON cidades_sc(nome)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_cidades_regiao ON cidades_sc(regiao)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_cidades_ibge ON cidades_sc(codigo_ibge)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_cidades_uf ON cidades_sc(uf, nome)")
+                
+                # Metadados da sincronização, uma linha por UF: a verificação de validade é O(1)
+                colunas = {row[1] for row in cursor.execute("PRAGMA table_info(cidades_sincronizacao)")}
+                anterior = None
+                if 'id' in colunas:
+                    # Formato anterior (uma linha só, de SC): migrar para a chave por UF
+                    anterior = cursor.execute("""
+                        SELECT ultima_sincronizacao, versao_fonte, total_cidades FROM cidades_sincronizacao
+                    """).fetchone()
+                    cursor.execute("DROP TABLE cidades_sincronizacao")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS cidades_sincronizacao (
+                        uf TEXT PRIMARY KEY,
+                        ultima_sincronizacao TIMESTAMP NOT NULL,
+                        versao_fonte TEXT,
+                        total_cidades INTEGER DEFAULT 0
+                    )
+                """)
+                if anterior:
+                    cursor.execute("""
+                        INSERT INTO cidades_sincronizacao (uf, ultima_sincronizacao, versao_fonte, total_cidades)
+                        VALUES ('SC', ?, ?, ?)
+                    """, anterior)
+                # Bancos anteriores à tabela de metadados herdam a data do próprio cadastro
+                cursor.execute("""
+                    INSERT OR IGNORE INTO cidades_sincronizacao (uf, ultima_sincronizacao, versao_fonte, total_cidades)
+                    SELECT uf, MAX(ultima_atualizacao), 'legado', COUNT(*) FROM cidades_sc
+                    GROUP BY uf
+                """)
                 
                 conn.commit()
                 
@@ -55,77 +354,43 @@ class CidadeService:
     def get_regiao_por_nome_cidade(self, nome_cidade: str) -> str:
         """Determina a região baseada no nome da cidade (mapeamento conhecido)"""
         
-        # Regiões Norte - cidades conhecidas
-        cidades_norte = {
-            'Joinville', 'São Francisco do Sul', 'Itapoá', 'Araquari', 'Garuva',
-            'São Bento do Sul', 'Campo Alegre', 'Rio Negrinho', 'Canoinhas',
-            'Mafra', 'Major Vieira', 'Irineópolis', 'Monte Castelo', 'Papanduva',
-            'Três Barras', 'Bela Vista do Toldo', 'Timbó Grande', 'Santa Terezinha',
-            'Doutor Pedrinho', 'Corupá', 'Schroeder', 'Guaramirim', 'Massaranduba',
-            'Jaraguá do Sul', 'Pomerode', 'Blumenau', 'Indaial', 'Rodeio',
-            'Ascurra', 'Apiúna', 'Ibirama', 'Lontras', 'Rio do Sul',
-            'Aurora', 'Agrolândia', 'Benedito Novo', 'Timbó', 'Rio dos Cedros',
-            'Itaiópolis', 'Matos Costa'
-        }
-        
-        # Regiões Sul - cidades conhecidas  
-        cidades_sul = {
-            'Criciúma', 'Içara', 'Nova Veneza', 'Forquilhinha', 'Siderópolis',
-            'Urussanga', 'Cocal do Sul', 'Morro da Fumaça', 'Araranguá',
-            'Balneário Arroio do Silva', 'Balneário Gaivota', 'Balneário Rincão',
-            'Sombrio', 'Santa Rosa do Sul', 'São João do Sul', 'Passo de Torres',
-            'Jacinto Machado', 'Maracajá', 'Meleiro', 'Turvo', 'Ermo',
-            'Sangão', 'Jaguaruna', 'Laguna', 'Imbituba', 'Garopaba',
-            'Paulo Lopes', 'Tubarão', 'Capivari de Baixo', 'Pedras Grandes',
-            'Treze de Maio', 'Orleans', 'Lauro Müller', 'Bom Jardim da Serra',
-            'Urubici', 'São Joaquim', 'Urupema', 'Bom Retiro'
-        }
-        
-        # Regiões Oeste - cidades conhecidas
-        cidades_oeste = {
-            'Chapecó', 'São Miguel do Oeste', 'Xanxerê', 'Concórdia', 'Joaçaba',
-            'Videira', 'Caçador', 'São Lourenço do Oeste', 'Palmitos', 'Caibi',
-            'Maravilha', 'Cunha Porã', 'São José do Cedro', 'Guaraciaba',
-            'Itapiranga', 'Mondaí', 'Riqueza', 'Romelândia', 'Bandeirante',
-            'Barra Bonita', 'Belmonte', 'Descanso', 'Dionísio Cerqueira',
-            'Guarujá do Sul', 'Paraíso', 'São João do Oeste', 'Tunápolis',
-            'Capinzal', 'Herval d\'Oeste', 'Ouro', 'Lacerdópolis', 'Tangará',
-            'Pinheiro Preto', 'Salto Veloso', 'Treze Tílias', 'Vargem Bonita',
-            'Fraiburgo', 'Lebon Régis', 'Monte Carlo', 'Rio das Antas',
-            'Abelardo Luz', 'Entre Rios', 'Vargeão', 'Xaxim', 'Águas de Chapecó',
-            'Águas Frias', 'Caxambu do Sul', 'Cordilheira Alta', 'Cunhataí',
-            'Formosa do Sul', 'Guatambu', 'Irati', 'Jardinópolis', 'Modelo',
-            'Nova Erechim', 'Nova Itaberaba', 'Peritiba', 'Pinhalzinho',
-            'Planalto Alegre', 'Quilombo', 'Saltinho', 'Santa Terezinha do Progresso',
-            'Santiago do Sul', 'São Bernardino', 'São Carlos', 'São Domingos',
-            'Saudades', 'Serra Alta', 'Sul Brasil', 'Tigrinhos', 'União do Oeste'
-        }
-        
-        # Regiões Leste - cidades conhecidas
-        cidades_leste = {
-            'Florianópolis', 'São José', 'Palhoça', 'Biguaçu', 'Santo Amaro da Imperatriz',
-            'Águas Mornas', 'São Pedro de Alcântara', 'Antônio Carlos', 'Governador Celso Ramos',
-            'Itajaí', 'Balneário Camboriú', 'Camboriú', 'Navegantes', 'Penha',
-            'Piçarras', 'Balneário Piçarras', 'Itapema', 'Porto Belo', 'Bombinhas',
-            'Tijucas', 'Canelinha', 'São João Batista', 'Nova Trento', 'Major Gercino',
-            'Brusque', 'Guabiruba', 'Botuverá', 'Nova Trento', 'Gaspar'
-        }
-        
-        # Verificar se a cidade está em alguma região conhecida
-        if nome_cidade in cidades_norte:
-            return "Norte"
-        elif nome_cidade in cidades_sul:
-            return "Sul"
-        elif nome_cidade in cidades_oeste:
-            return "Oeste"
-        elif nome_cidade in cidades_leste:
-            return "Leste"
+        return REGIAO_POR_CIDADE_SC.get(nome_cidade, "Central")  # Default para cidades não mapeadas
+    
+    def get_regiao_por_coordenadas(self, lat: float, lon: float, uf: str = 'SC') -> Optional[str]:
+        """Fallback: Determina a região baseada nas coordenadas geográficas (None sem coordenadas)"""
+        return self.classificar_coordenadas([(lat, lon)], uf)[0]['regiao']
+    
+    def classificar_coordenadas(self, pontos: Iterable, uf: str = 'SC') -> List[Dict]:
+        """
+        Classifica vários (lat, lon) de uma vez em região, mesorregião e microrregião
+
+        Usa as fronteiras da malha regional local da UF (data/regioes_<uf>.geojson.gz)
+        quando disponível; sem ela, ou fora dos polígonos, cai nos limites
+        aproximados de latitude/longitude de SC. Pontos sem coordenadas
+        (None ou zeradas) ficam com região None: quem chama escolhe o padrão.
+        """
+        pontos = list(pontos)
+        classificador = get_classificador(uf)
+        if classificador is not None:
+            resultados = classificador.classificar_lote(pontos)
         else:
-            return "Central"  # Default para cidades não mapeadas
+            resultados = [{'mesorregiao': None, 'microrregiao': None} for _ in pontos]
+        
+        for (lat, lon), resultado in zip(pontos, resultados):
+            meso = resultado['mesorregiao']
+            if not (lat and lon):
+                resultado['regiao'] = None
+            elif meso:
+                resultado['regiao'] = REGIAO_POR_MESORREGIAO_SC.get(meso, meso) if uf == 'SC' else meso
+            elif uf == 'SC':
+                resultado['regiao'] = self._regiao_aproximada_sc(lat, lon)
+            else:
+                resultado['regiao'] = "Central"
+        return resultados
     
-    def get_regiao_por_coordenadas(self, lat: float, lon: float) -> str:
-        """Fallback: Determina a região baseada nas coordenadas geográficas"""
-        # Fallback simples se o mapeamento por nome não funcionar
+    @staticmethod
+    def _regiao_aproximada_sc(lat: float, lon: float) -> str:
+        # Fallback simples se não houver malha regional
         if lat > -27.0:
             return "Norte"
         elif lat < -28.5:
@@ -137,45 +402,83 @@ class CidadeService:
         else:
             return "Central"
     
-    def buscar_cidades_online(self) -> List[Dict]:
-        """Busca cidades de SC na API do IBGE"""
+    def _url_municipios(self, uf: str) -> str:
+        return f"{self.api_base}/estados/{CODIGOS_UF[uf]}/municipios"
+    
+    def _buscar_lista_municipios(self, uf: str = 'SC'):
+        """Busca a lista de municípios; nao_modificado indica que o cache ainda vale"""
+        logging.info(f"Buscando cidades de {uf} na API do IBGE...")
+        return self.http.get_json(self._url_municipios(uf), timeout=self.timeout * 2)
+    
+    def _regiao_do_municipio(self, uf: str, municipio: Dict, classificacao: Dict) -> str:
+        """Região de SC pelo mapeamento local; nas demais UFs, a mesorregião do IBGE"""
+        if uf != 'SC':
+            try:
+                return municipio['microrregiao']['mesorregiao']['nome']
+            except (KeyError, TypeError):
+                return classificacao['regiao'] or "Central"
+        
+        # Primeiro tentar mapear por nome da cidade; se não encontrou, usar as coordenadas (se houver)
+        regiao = self.get_regiao_por_nome_cidade(municipio['nome'])
+        if regiao == "Central":
+            regiao = classificacao['regiao'] or regiao
+        return regiao
+    
+    def buscar_cidades_online(self, municipios: List[Dict] = None,
+                              progresso: Callable[[int, int], None] = None,
+                              cancelado: Callable[[], bool] = None,
+                              uf: str = 'SC') -> List[Dict]:
+        """
+        Busca as cidades de uma UF na API do IBGE
+
+        `progresso(feitas, total)` é chamado (das threads do pool) a cada cidade
+        concluída; se `cancelado()` passar a retornar True, as buscas restantes
+        são puladas e nada é retornado.
+        """
         try:
-            logging.info("Buscando cidades de SC na API do IBGE...")
-            response = requests.get(self.api_url, timeout=10)
-            response.raise_for_status()
-            
-            cidades = response.json()
+            cidades = municipios if municipios is not None else self._buscar_lista_municipios(uf).dados
             cidades_processadas = []
+            total = len(cidades)
+            feitas = [0]
+            lock = threading.Lock()
             
-            for cidade in cidades:
-                # Obter coordenadas da cidade
-                coords = self._get_coordenadas_cidade(cidade['id'])
-                
-                # Primeiro tentar mapear por nome da cidade
-                regiao = self.get_regiao_por_nome_cidade(cidade['nome'])
-                
-                # Se não encontrou por nome, usar coordenadas como fallback
-                if regiao == "Central" and coords.get('latitude') and coords.get('longitude'):
-                    regiao = self.get_regiao_por_coordenadas(
-                        coords.get('latitude', 0),
-                        coords.get('longitude', 0)
-                    )
-                
+            def buscar(codigo_ibge):
+                if cancelado and cancelado():
+                    return None
+                coords = self._get_coordenadas_cidade(codigo_ibge)
+                with lock:
+                    feitas[0] += 1
+                    concluidas = feitas[0]
+                if progresso:
+                    progresso(concluidas, total)
+                return coords
+            
+            # Obter coordenadas das cidades em paralelo (a ordem é preservada)
+            with ThreadPoolExecutor(max_workers=self.max_concorrencia) as executor:
+                coordenadas = list(executor.map(buscar, [cidade['id'] for cidade in cidades]))
+            
+            if any(coords is None for coords in coordenadas):
+                logging.info("Busca de cidades cancelada")
+                return []
+            
+            # Todas as coordenadas classificadas em um único lote
+            classificacoes = self.classificar_coordenadas(
+                [(coords.get('latitude'), coords.get('longitude')) for coords in coordenadas], uf)
+            
+            for cidade, coords, classificacao in zip(cidades, coordenadas, classificacoes):
                 cidade_info = {
                     'codigo_ibge': str(cidade['id']),
                     'nome': cidade['nome'],
-                    'regiao': regiao,
+                    'regiao': self._regiao_do_municipio(uf, cidade, classificacao),
                     'latitude': coords.get('latitude'),
                     'longitude': coords.get('longitude'),
                     'populacao': coords.get('populacao', 0),
-                    'fonte': 'ibge'
+                    'fonte': 'ibge',
+                    'uf': uf
                 }
                 cidades_processadas.append(cidade_info)
-                
-                # Pequena pausa para não sobrecarregar a API
-                time.sleep(0.1)
             
-            logging.info(f"Encontradas {len(cidades_processadas)} cidades de SC")
+            logging.info(f"Encontradas {len(cidades_processadas)} cidades de {uf}")
             return cidades_processadas
             
         except requests.RequestException as e:
@@ -189,12 +492,12 @@ class CidadeService:
         """Obtém coordenadas e população de uma cidade específica"""
         try:
             # API do IBGE para dados da cidade
-            url = f"https://servicodados.ibge.gov.br/api/v1/localidades/municipios/{codigo_ibge}"
-            response = requests.get(url, timeout=5)
+            url = f"{self.api_base}/municipios/{codigo_ibge}"
+            if not self.limitador.adquirir(timeout=self.timeout):
+                raise TimeoutError("limite de requisições excedido")
+            cidade_data = self.http.get_json(url, timeout=self.timeout).dados
             
-            if response.status_code == 200:
-                cidade_data = response.json()
-                
+            if cidade_data:
                 # Tentar obter coordenadas do centro da cidade
                 if 'centroide' in cidade_data:
                     return {
@@ -205,311 +508,432 @@ class CidadeService:
                 # Fallback: coordenadas aproximadas por região
                 return self._get_coordenadas_aproximadas(cidade_data.get('nome', ''))
             
+        except CircuitoAbertoError:
+            # API fora do ar: interromper a sincronização em vez de repetir a falha por cidade
+            raise
         except Exception as e:
             logging.warning(f"Erro ao obter coordenadas para cidade {codigo_ibge}: {e}")
         
-        return {'latitude': 0, 'longitude': 0, 'populacao': 0}
+        return {'latitude': None, 'longitude': None, 'populacao': 0}
     
     def _get_coordenadas_aproximadas(self, nome_cidade: str) -> Dict:
         """Retorna coordenadas aproximadas baseadas no nome da cidade"""
-        # Coordenadas aproximadas para cidades principais
-        coordenadas_aproximadas = {
-            'Florianópolis': {'lat': -27.5969, 'lon': -48.5495},
-            'Joinville': {'lat': -26.3044, 'lon': -48.8463},
-            'Blumenau': {'lat': -26.9189, 'lon': -49.0661},
-            'Criciúma': {'lat': -28.6775, 'lon': -49.3697},
-            'Itajaí': {'lat': -26.9077, 'lon': -48.6618},
-            'Chapecó': {'lat': -27.0969, 'lon': -52.6189},
-            'Lages': {'lat': -27.8156, 'lon': -50.3264},
-            'Balneário Camboriú': {'lat': -26.9922, 'lon': -48.6353},
-            'Palhoça': {'lat': -27.6444, 'lon': -48.6678},
-            'São José': {'lat': -27.6136, 'lon': -48.6366},
-            'Tubarão': {'lat': -28.4717, 'lon': -49.0083},
-            'Canoinhas': {'lat': -26.1769, 'lon': -50.3908},
-            'Mafra': {'lat': -26.1111, 'lon': -49.8056},
-            'Rio do Sul': {'lat': -27.2156, 'lon': -49.6433},
-            'Jaraguá do Sul': {'lat': -26.4856, 'lon': -49.0717},
-            'Brusque': {'lat': -27.0978, 'lon': -48.9167},
-            'Navegantes': {'lat': -26.8989, 'lon': -48.6547},
-            'Penha': {'lat': -26.7708, 'lon': -48.6467},
-            'Piçarras': {'lat': -26.7639, 'lon': -48.6717},
-            'Porto Belo': {'lat': -27.1589, 'lon': -48.5497},
-            'Tijucas': {'lat': -27.2417, 'lon': -48.6333},
-            'Biguaçu': {'lat': -27.4917, 'lon': -48.6583},
-            'São João Batista': {'lat': -27.2750, 'lon': -48.8472},
-            'Gaspar': {'lat': -26.9333, 'lon': -48.9583},
-            'Guabiruba': {'lat': -27.0833, 'lon': -48.9833},
-            'Indaial': {'lat': -26.9000, 'lon': -49.2333},
-            'Pomerode': {'lat': -26.7389, 'lon': -49.1789},
-            'Rodeio': {'lat': -26.9222, 'lon': -49.3667},
-            'Doutor Pedrinho': {'lat': -26.7167, 'lon': -49.4833},
-            'Benedito Novo': {'lat': -26.7833, 'lon': -49.3667},
-            'Botuverá': {'lat': -27.2000, 'lon': -49.0667},
-            'Major Gercino': {'lat': -27.4167, 'lon': -48.9500},
-            'Nova Trento': {'lat': -27.2833, 'lon': -48.9333},
-            'Leoberto Leal': {'lat': -27.5000, 'lon': -49.2833},
-            'Angelina': {'lat': -27.5667, 'lon': -48.9833},
-            'Rancho Queimado': {'lat': -27.6833, 'lon': -49.0167},
-            'Anitápolis': {'lat': -27.9000, 'lon': -49.1333},
-            'Capinzal': {'lat': -27.3406, 'lon': -51.6117},
-            'Ouro': {'lat': -27.3333, 'lon': -51.6167},
-            'Lacerdópolis': {'lat': -27.2500, 'lon': -51.5500},
-            'Herval d\'Oeste': {'lat': -27.2000, 'lon': -51.5000},
-            'Fraiburgo': {'lat': -27.0167, 'lon': -50.9167},
-            'Videira': {'lat': -27.0167, 'lon': -51.1500},
-            'Tangará': {'lat': -27.1000, 'lon': -51.2333},
-            'Pinheiro Preto': {'lat': -27.0500, 'lon': -51.2333},
-            'Salto Veloso': {'lat': -26.9000, 'lon': -51.4000},
-            'Treze Tílias': {'lat': -27.0000, 'lon': -51.4000},
-            'Vargem Bonita': {'lat': -27.0167, 'lon': -51.7333},
-            'Monte Carlo': {'lat': -27.2167, 'lon': -50.9833},
-            'Lebon Régis': {'lat': -26.9333, 'lon': -50.7000},
-            'Brunópolis': {'lat': -27.3000, 'lon': -49.8000},
-            'Curitibanos': {'lat': -27.2833, 'lon': -50.5833},
-            'Campos Novos': {'lat': -27.4000, 'lon': -49.6333},
-            'Abelardo Luz': {'lat': -26.5667, 'lon': -52.3333},
-            'Coronel Martins': {'lat': -26.5167, 'lon': -52.6667},
-            'Entre Rios': {'lat': -26.7167, 'lon': -52.5667},
-            'Galvão': {'lat': -26.4500, 'lon': -52.6833},
-            'Ipuaçu': {'lat': -26.6333, 'lon': -52.4500},
-            'Jupiá': {'lat': -26.4000, 'lon': -52.7333},
-            'Lacerdópolis': {'lat': -27.2500, 'lon': -51.5500},
-            'Lajeado Grande': {'lat': -26.8500, 'lon': -52.5667},
-            'Marema': {'lat': -26.8000, 'lon': -52.6167},
-            'Ouro Verde': {'lat': -26.7000, 'lon': -52.3167},
-            'Passos Maia': {'lat': -26.7833, 'lon': -52.0667},
-            'Vargeão': {'lat': -26.8667, 'lon': -52.1500},
-            'Xanxerê': {'lat': -26.8833, 'lon': -52.4000},
-            'Xaxim': {'lat': -26.9667, 'lon': -52.5333},
-            'Águas de Chapecó': {'lat': -27.0667, 'lon': -52.9833},
-            'Águas Frias': {'lat': -26.8833, 'lon': -52.8667},
-            'Bandeirante': {'lat': -26.7667, 'lon': -53.6333},
-            'Barra Bonita': {'lat': -26.6500, 'lon': -53.4333},
-            'Belmonte': {'lat': -26.8333, 'lon': -53.5833},
-            'Bom Jesus do Oeste': {'lat': -26.7167, 'lon': -53.1000},
-            'Caibi': {'lat': -27.0667, 'lon': -53.2500},
-            'Campo Erê': {'lat': -26.4000, 'lon': -53.1000},
-            'Caxambu do Sul': {'lat': -27.1667, 'lon': -52.8833},
-            'Chapecó': {'lat': -27.0969, 'lon': -52.6189},
-            'Cordilheira Alta': {'lat': -26.9833, 'lon': -52.6000},
-            'Cunha Porã': {'lat': -26.8833, 'lon': -53.1667},
-            'Cunhataí': {'lat': -26.9667, 'lon': -53.1000},
-            'Dionísio Cerqueira': {'lat': -26.2500, 'lon': -53.6333},
-            'Flor do Sertão': {'lat': -26.7833, 'lon': -53.3500},
-            'Formosa do Sul': {'lat': -26.6500, 'lon': -52.6667},
-            'Guatambu': {'lat': -27.1333, 'lon': -52.7833},
-            'Guaraciaba': {'lat': -26.6000, 'lon': -53.5167},
-            'Guarujá do Sul': {'lat': -26.3833, 'lon': -53.5333},
-            'Irati': {'lat': -26.6500, 'lon': -52.9000},
-            'Iraceminha': {'lat': -26.8167, 'lon': -53.2833},
-            'Itapiranga': {'lat': -27.1667, 'lon': -53.7167},
-            'Jardinópolis': {'lat': -26.7167, 'lon': -52.8500},
-            'Joaçaba': {'lat': -27.1667, 'lon': -49.7833},
-            'Maravilha': {'lat': -26.7667, 'lon': -53.1667},
-            'Mondaí': {'lat': -27.1000, 'lon': -53.4000},
-            'Modelo': {'lat': -26.7833, 'lon': -53.0500},
-            'Nova Erechim': {'lat': -26.9000, 'lon': -52.9000},
-            'Nova Itaberaba': {'lat': -26.9500, 'lon': -52.8000},
-            'Nova Veneza': {'lat': -28.6333, 'lon': -49.5000},
-            'Palmitos': {'lat': -27.0667, 'lon': -53.1667},
-            'Paraíso': {'lat': -26.6167, 'lon': -53.6833},
-            'Peritiba': {'lat': -27.0667, 'lon': -52.7333},
-            'Pinhalzinho': {'lat': -26.8500, 'lon': -52.9833},
-            'Pinheiro Preto': {'lat': -27.0500, 'lon': -51.2333},
-            'Planalto Alegre': {'lat': -27.0667, 'lon': -52.8667},
-            'Quilombo': {'lat': -26.7333, 'lon': -52.7167},
-            'Rio das Antas': {'lat': -26.9000, 'lon': -49.7833},
-            'Riqueza': {'lat': -27.0667, 'lon': -53.3333},
-            'Romelândia': {'lat': -26.6833, 'lon': -53.3167},
-            'Saltinho': {'lat': -26.6000, 'lon': -53.0500},
-            'Santa Terezinha do Progresso': {'lat': -26.6167, 'lon': -52.9667},
-            'Santiago do Sul': {'lat': -26.6333, 'lon': -52.6833},
-            'São Bernardino': {'lat': -26.4667, 'lon': -52.9667},
-            'São Carlos': {'lat': -27.0667, 'lon': -53.0000},
-            'São Domingos': {'lat': -26.5500, 'lon': -52.5333},
-            'São João do Oeste': {'lat': -27.1000, 'lon': -53.6000},
-            'São José do Cedro': {'lat': -26.4500, 'lon': -53.5000},
-            'São Lourenço do Oeste': {'lat': -26.3667, 'lon': -52.8500},
-            'São Miguel da Boa Vista': {'lat': -26.9500, 'lon': -53.2500},
-            'São Miguel do Oeste': {'lat': -26.7167, 'lon': -53.5167},
-            'Saudades': {'lat': -26.9167, 'lon': -53.0000},
-            'Serra Alta': {'lat': -26.7167, 'lon': -53.0500},
-            'Sul Brasil': {'lat': -26.7333, 'lon': -52.9667},
-            'Tigrinhos': {'lat': -26.6833, 'lon': -53.1500},
-            'Tunápolis': {'lat': -26.9667, 'lon': -53.6333},
-            'União do Oeste': {'lat': -26.7667, 'lon': -52.8500},
-            'Vidal Ramos': {'lat': -27.3833, 'lon': -49.3667}
-        }
-        
-        for nome, coords in coordenadas_aproximadas.items():
-            if nome.lower() in nome_cidade.lower():
-                return {'latitude': coords['lat'], 'longitude': coords['lon'], 'populacao': 0}
+        coords = _COORDENADAS_POR_NOME.get(normalizar(nome_cidade))
+        if coords is None:
+            # Nomes compostos ("Ouro Verde") preferem a cidade de nome mais longo contido neles
+            nome = normalizar(nome_cidade)
+            coords = next((c for chave, c in _COORDENADAS_POR_SUBSTRING if chave in nome), None)
+        if coords:
+            return {'latitude': coords['lat'], 'longitude': coords['lon'], 'populacao': 0}
         
-        return {'latitude': 0, 'longitude': 0, 'populacao': 0}
+        return {'latitude': None, 'longitude': None, 'populacao': 0}
     
-    def sincronizar_cidades(self, forcar_atualizacao: bool = False) -> bool:
-        """Sincroniza cidades locais com dados online"""
+    def sincronizar_cidades(self, forcar_atualizacao: bool = False,
+                            progresso: Callable[[int, int], None] = None,
+                            cancelado: Callable[[], bool] = None,
+                            ufs: Iterable[str] = None) -> bool:
+        """Sincroniza cidades locais com dados online, uma partição (UF) por vez"""
         try:
-            # Verificar se precisa atualizar
-            if not forcar_atualizacao and not self._precisa_atualizar():
+            ufs = tuple(uf.upper() for uf in ufs) if ufs else self.ufs
+            
+            # Verificar se alguma UF precisa atualizar
+            pendentes = [uf for uf in ufs if forcar_atualizacao or self._precisa_atualizar(uf)]
+            if not pendentes:
                 logging.info("Cache de cidades ainda válido")
                 return True
             
-            # Buscar cidades online
-            cidades_online = self.buscar_cidades_online()
-            if not cidades_online:
-                logging.warning("Não foi possível obter cidades online")
+            # Sem rede (ou API marcada como fora do ar): falhar já, sem esperar timeouts
+            if not self.http.online(self.api_url, timeout=min(self.timeout, 1.5)):
+                logging.warning("API do IBGE inacessível; mantendo o catálogo local")
                 return False
             
-            # Atualizar banco local
-            self._atualizar_cidades_locais(cidades_online)
-            
-            logging.info("Cidades sincronizadas com sucesso")
-            return True
+            # Cada UF é independente: a falha de uma não descarta as demais
+            sucesso = True
+            for uf in pendentes:
+                if cancelado and cancelado():
+                    return False
+                sucesso = self._sincronizar_uf(uf, progresso, cancelado) and sucesso
+            return sucesso
             
         except Exception as e:
             logging.error(f"Erro ao sincronizar cidades: {e}")
             return False
     
-    def _precisa_atualizar(self) -> bool:
-        """Verifica se o cache de cidades precisa ser atualizado"""
+    def _sincronizar_uf(self, uf: str, progresso: Callable[[int, int], None] = None,
+                        cancelado: Callable[[], bool] = None) -> bool:
+        # Lista inalterada desde a última sincronização: só renovar a validade
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT COUNT(*) FROM cidades_sc 
-                    WHERE ultima_atualizacao > ?
-                """, (datetime.now() - self.cache_duration,))
-                
-                count = cursor.fetchone()[0]
-                return count == 0
+            resposta = self._buscar_lista_municipios(uf)
+        except requests.RequestException as e:
+            logging.error(f"Erro ao buscar cidades de {uf} online: {e}")
+            return False
+        versao_fonte = f"ibge:{resposta.versao}" if resposta.versao else 'ibge'
+        if resposta.nao_modificado and (self.get_metadados_sincronizacao(uf) or {}).get('total_cidades'):
+            self._marcar_atualizado(versao_fonte, uf)
+            logging.info(f"Lista de cidades de {uf} não mudou desde a última sincronização")
+            return True
+        
+        # Buscar cidades online
+        cidades_online = self.buscar_cidades_online(resposta.dados, progresso, cancelado, uf)
+        if not cidades_online:
+            logging.warning(f"Não foi possível obter cidades de {uf} online")
+            return False
+        
+        # Atualizar banco local
+        self._atualizar_cidades_locais(cidades_online, versao_fonte, uf)
+        
+        logging.info(f"Cidades de {uf} sincronizadas com sucesso")
+        return True
+    
+    def get_metricas_rede(self) -> Dict:
+        """Contadores do cliente HTTP e estado do disjuntor da API do IBGE"""
+        metricas = dict(self.http.estatisticas)
+        metricas['disjuntor'] = self.http.disjuntor(self.api_url).metricas()
+        return metricas
+    
+    def _precisa_atualizar(self, uf: str = 'SC') -> bool:
+        """Verifica se o cache de cidades da UF precisa ser atualizado"""
+        try:
+            metadados = self.get_metadados_sincronizacao(uf)
+            if not metadados:
+                return True
+            ultima = datetime.fromisoformat(str(metadados['ultima_sincronizacao']))
+            return ultima < datetime.now() - self.cache_duration
                 
         except Exception as e:
             logging.error(f"Erro ao verificar cache: {e}")
             return True
     
-    def _atualizar_cidades_locais(self, cidades: List[Dict]):
-        """Atualiza as cidades no banco local"""
+    def get_metadados_sincronizacao(self, uf: str = 'SC') -> Optional[Dict]:
+        """Retorna a data, a versão da fonte e o total da última sincronização da UF"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("""
+                SELECT ultima_sincronizacao, versao_fonte, total_cidades
+                FROM cidades_sincronizacao WHERE uf = ?
+            """, (uf,)).fetchone()
+        if row:
+            return {'ultima_sincronizacao': row[0], 'versao_fonte': row[1], 'total_cidades': row[2]}
+        return None
+    
+    def _registrar_sincronizacao(self, cursor, versao_fonte: str, quando: datetime = None, uf: str = 'SC'):
+        """Grava os metadados da sincronização da UF na mesma transação das cidades"""
+        cursor.execute("""
+            INSERT INTO cidades_sincronizacao (uf, ultima_sincronizacao, versao_fonte, total_cidades)
+            VALUES (?, ?, ?, (SELECT COUNT(*) FROM cidades_sc WHERE uf = ?))
+            ON CONFLICT(uf) DO UPDATE SET
+                ultima_sincronizacao = excluded.ultima_sincronizacao,
+                versao_fonte = excluded.versao_fonte,
+                total_cidades = excluded.total_cidades
+        """, (uf, (quando or datetime.now()).isoformat(sep=' '), versao_fonte, uf))
+    
+    def _marcar_atualizado(self, versao_fonte: str = 'ibge', uf: str = 'SC'):
+        """Renova a data da sincronização da UF sem regravar as cidades"""
+        with sqlite3.connect(self.db_path) as conn:
+            self._registrar_sincronizacao(conn.cursor(), versao_fonte, uf=uf)
+            conn.commit()
+    
+    def _atualizar_cidades_locais(self, cidades: List[Dict], versao_fonte: str = 'ibge',
+                                  uf: str = 'SC') -> Dict[str, int]:
+        """
+        Aplica a lista online de uma UF ao banco local por diferença, em uma única transação
+
+        Só cidades novas ou alteradas são gravadas (UPSERT por codigo_ibge) e
+        municípios da UF que deixaram de existir na fonte são removidos; as
+        demais UFs não são tocadas. Coordenadas que a fonte não informou não
+        apagam as já conhecidas.
+        """
+        campos = ('nome', 'regiao', 'latitude', 'longitude', 'populacao', 'fonte')
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
+                cursor.execute(f"SELECT codigo_ibge, {', '.join(campos)} FROM cidades_sc WHERE uf = ?", (uf,))
+                existentes = {row[0]: row[1:] for row in cursor.fetchall()}
                 
-                # Limpar cidades antigas
-                cursor.execute("DELETE FROM cidades_sc")
-                
-                # Inserir novas cidades
+                agora = datetime.now()
+                alteradas = []
                 for cidade in cidades:
-                    cursor.execute("""
-                        INSERT INTO cidades_sc 
-                        (codigo_ibge, nome, regiao, latitude, longitude, populacao, fonte, ultima_atualizacao)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        cidade['codigo_ibge'],
-                        cidade['nome'],
-                        cidade['regiao'],
-                        cidade['latitude'],
-                        cidade['longitude'],
-                        cidade['populacao'],
-                        cidade['fonte'],
-                        datetime.now()
-                    ))
-                
+                    atual = existentes.get(cidade['codigo_ibge'])
+                    valores = [cidade.get(campo) for campo in campos]
+                    if atual and not (valores[2] and valores[3]):
+                        valores[2], valores[3] = atual[2], atual[3]
+                    if atual is None or tuple(valores) != tuple(atual):
+                        alteradas.append((cidade['codigo_ibge'], *valores, agora, uf))
+                
+                cursor.executemany("""
+                    INSERT INTO cidades_sc 
+                    (codigo_ibge, nome, regiao, latitude, longitude, populacao, fonte, ultima_atualizacao, uf)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(codigo_ibge) DO UPDATE SET
+                        nome = excluded.nome,
+                        regiao = excluded.regiao,
+                        latitude = excluded.latitude,
+                        longitude = excluded.longitude,
+                        populacao = excluded.populacao,
+                        fonte = excluded.fonte,
+                        ultima_atualizacao = excluded.ultima_atualizacao,
+                        uf = excluded.uf
+                """, alteradas)
+                
+                removidas = set(existentes) - {cidade['codigo_ibge'] for cidade in cidades}
+                cursor.executemany("DELETE FROM cidades_sc WHERE codigo_ibge = ?",
+                                   [(codigo,) for codigo in removidas])
+                
+                self._registrar_sincronizacao(cursor, versao_fonte, agora, uf)
                 conn.commit()
-                logging.info(f"{len(cidades)} cidades atualizadas no banco local")
+                
+            invalidar_catalogo(self.db_path)
+            resultado = {'alteradas': len(alteradas), 'removidas': len(removidas),
+                         'inalteradas': len(cidades) - len(alteradas)}
+            logging.info(f"Cidades de {uf} sincronizadas: {resultado['alteradas']} gravadas, "
+                         f"{resultado['removidas']} removidas, {resultado['inalteradas']} inalteradas")
+            return resultado
                 
         except Exception as e:
             logging.error(f"Erro ao atualizar cidades locais: {e}")
             raise
     
-    def get_cidades_por_regiao(self, regiao: str = None) -> List[Dict]:
-        """Retorna cidades filtradas por região"""
+    def baixar_malha_regioes(self, uf: str = 'SC', caminho: str = None,
+                             malhas_base: str = IBGE_MALHAS_BASE) -> int:
+        """
+        Baixa as fronteiras das meso/microrregiões da UF e grava a malha local
+
+        As geometrias vêm da API de malhas do IBGE (só com o código da área) e
+        os nomes da API de localidades; o resultado é um GeoJSON compactado
+        no formato lido por services.regioes_geograficas.
+        """
+        codigo_uf = CODIGOS_UF[uf.upper()]
+        url_uf = f"{self.api_base}/estados/{codigo_uf}"
+        mesorregioes = {str(m['id']): m for m in self.http.get_json(f"{url_uf}/mesorregioes").dados}
+        microrregioes = {str(m['id']): m for m in self.http.get_json(f"{url_uf}/microrregioes").dados}
+        
+        feicoes = []
+        for nivel, nomes in ((MESORREGIAO, mesorregioes), (MICRORREGIAO, microrregioes)):
+            malha = self.http.get_json(
+                f"{malhas_base.rstrip('/')}/estados/{codigo_uf}"
+                f"?formato=application/vnd.geo%2Bjson&intrarregiao={nivel}&qualidade=intermediaria",
+                timeout=self.timeout * 4
+            ).dados
+            for feicao in malha.get('features', []):
+                codigo = str((feicao.get('properties') or {}).get('codarea', ''))
+                regiao = nomes.get(codigo)
+                if regiao is None:
+                    continue
+                propriedades = {'nivel': nivel, 'codigo': codigo, 'nome': regiao['nome']}
+                if nivel == MICRORREGIAO:
+                    propriedades['mesorregiao'] = regiao['mesorregiao']['nome']
+                feicoes.append({'type': 'Feature', 'properties': propriedades, 'geometry': feicao['geometry']})
+        
+        caminho = caminho or caminho_malha(uf)
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with gzip.open(temporario, 'wt', encoding='utf-8') as arquivo:
+            json.dump({'type': 'FeatureCollection', 'features': feicoes}, arquivo,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(temporario, caminho)
+        invalidar_classificadores()
+        logging.info(f"Malha regional de {uf} gravada em {caminho} ({len(feicoes)} regiões)")
+        return len(feicoes)
+    
+    def carregar_snapshot(self, caminho: str = None) -> Dict:
+        """Lê o catálogo de municípios compactado (JSON gzip, colunas + linhas)"""
+        with gzip.open(caminho or SNAPSHOT_PADRAO, 'rt', encoding='utf-8') as arquivo:
+            snapshot = json.load(arquivo)
+        if snapshot.get('formato') != FORMATO_SNAPSHOT:
+            raise ValueError(f"Formato de snapshot não suportado: {snapshot.get('formato')}")
+        return snapshot
+    
+    def importar_snapshot(self, caminho: str = None) -> int:
+        """Carrega o catálogo distribuído com a aplicação em uma única inserção em lote"""
+        snapshot = self.carregar_snapshot(caminho)
+        campos = snapshot['campos']
+        uf = snapshot.get('uf', 'SC')
+        linhas = [
+            (cidade['codigo_ibge'], cidade['nome'], cidade['regiao'],
+             cidade['latitude'], cidade['longitude'], 'snapshot', snapshot['gerado_em'], uf)
+            for cidade in (dict(zip(campos, valores)) for valores in snapshot['municipios'])
+        ]
+        centroides = snapshot.get('centroides', {})
+        if centroides.get('aproximados') or centroides.get('ausentes'):
+            logging.warning(f"Snapshot {snapshot['versao']} de {uf}: {centroides.get('aproximados', 0)} centroides "
+                            f"aproximados e {centroides.get('ausentes', 0)} ausentes até a sincronização com o IBGE")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany("""
+                INSERT OR IGNORE INTO cidades_sc
+                (codigo_ibge, nome, regiao, latitude, longitude, fonte, ultima_atualizacao, uf)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, linhas)
+            self._registrar_sincronizacao(conn.cursor(), f"snapshot:{snapshot['versao']}",
+                                          datetime.fromisoformat(snapshot['gerado_em']), uf)
+            conn.commit()
+        invalidar_catalogo(self.db_path)
+        logging.info(f"{len(linhas)} cidades de {uf} carregadas do snapshot {snapshot['versao']}")
+        return len(linhas)
+    
+    def exportar_snapshot(self, caminho: str, versao: str = None, uf: str = 'SC') -> int:
+        """Grava as cidades locais de uma UF como snapshot compactado para distribuição"""
+        campos = ['codigo_ibge', 'nome', 'regiao', 'latitude', 'longitude']
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(f"""
+                SELECT {', '.join(campos)} FROM cidades_sc WHERE uf = ? ORDER BY codigo_ibge
+            """, (uf,)).fetchall()
+        agora = datetime.now()
+        # Coordenadas zeradas significam "desconhecidas" no cadastro
+        municipios = [[codigo, nome, regiao, lat or None, lon or None] for codigo, nome, regiao, lat, lon in rows]
+        snapshot = {
+            'formato': FORMATO_SNAPSHOT,
+            'versao': versao or agora.strftime('%Y.%m.%d'),
+            'uf': uf,
+            'gerado_em': agora.strftime('%Y-%m-%d %H:%M:%S'),
+            'campos': campos,
+            'centroides': self._origem_centroides(municipios),
+            'municipios': municipios,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with gzip.open(caminho, 'wt', encoding='utf-8') as arquivo:
+            json.dump(snapshot, arquivo, ensure_ascii=False, separators=(',', ':'))
+        return len(rows)
+    
+    def _origem_centroides(self, municipios: List[list]) -> Dict[str, int]:
+        """
+        Quantos municípios têm centroide do IBGE, só a coordenada aproximada
+        de COORDENADAS_APROXIMADAS (a API de localidades nem sempre informa o
+        centroide) ou nenhuma coordenada
+        """
+        origem = {'ibge': 0, 'aproximados': 0, 'ausentes': 0}
+        for _, nome, _, lat, lon in municipios:
+            aproximada = self._get_coordenadas_aproximadas(nome)
+            if not (lat and lon):
+                origem['ausentes'] += 1
+            elif (aproximada['latitude'], aproximada['longitude']) == (lat, lon):
+                origem['aproximados'] += 1
+            else:
+                origem['ibge'] += 1
+        return origem
+    
+    def garantir_cidades_locais(self) -> bool:
+        """Garante um catálogo local: UFs sem cidades no banco importam o snapshot distribuído"""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                if regiao and regiao != "Todas as regiões":
-                    cursor.execute("""
-                        SELECT nome, regiao, latitude, longitude, populacao
-                        FROM cidades_sc 
-                        WHERE regiao = ?
-                        ORDER BY nome
-                    """, (regiao,))
-                else:
-                    cursor.execute("""
-                        SELECT nome, regiao, latitude, longitude, populacao
-                        FROM cidades_sc 
-                        ORDER BY nome
-                    """)
-                
-                cidades = []
-                for row in cursor.fetchall():
-                    cidades.append({
-                        'nome': row[0],
-                        'regiao': row[1],
-                        'latitude': row[2],
-                        'longitude': row[3],
-                        'populacao': row[4]
-                    })
-                
-                return cidades
-                
+                presentes = {row[0] for row in conn.execute("SELECT DISTINCT uf FROM cidades_sc")}
+            for uf in self.ufs:
+                if uf not in presentes and os.path.exists(caminho_snapshot(uf)):
+                    if self.importar_snapshot(caminho_snapshot(uf)) > 0:
+                        presentes.add(uf)
+            return bool(presentes)
         except Exception as e:
-            logging.error(f"Erro ao buscar cidades por região: {e}")
-            return []
+            logging.error(f"Erro ao carregar snapshot de cidades: {e}")
+            return False
+    
+    def get_catalogo(self) -> CatalogoCidades:
+        """Catálogo em memória compartilhado por todos os serviços do mesmo banco"""
+        return get_catalogo(self.db_path, self.catalogo_ttl)
+    
+    def get_cidades_por_regiao(self, regiao: str = None) -> List[Dict]:
+        """Retorna cidades filtradas por região"""
+        catalogo = self.get_catalogo()
+        if regiao and regiao != "Todas as regiões":
+            return list(catalogo.por_regiao.get(regiao, []))
+        return list(catalogo.cidades)
+    
+    def get_cidades_por_uf(self, uf: str) -> List[Dict]:
+        """Retorna as cidades de uma UF"""
+        return list(self.get_catalogo().por_uf.get(uf.upper(), []))
     
     def get_todas_cidades(self) -> List[str]:
         """Retorna lista de todas as cidades ordenadas alfabeticamente"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT nome FROM cidades_sc ORDER BY nome")
-                
-                return [row[0] for row in cursor.fetchall()]
-                
-        except Exception as e:
-            logging.error(f"Erro ao buscar todas as cidades: {e}")
-            return []
+        return list(self.get_catalogo().nomes)
     
     def get_regioes_disponiveis(self) -> List[str]:
         """Retorna lista de regiões disponíveis"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT DISTINCT regiao FROM cidades_sc ORDER BY regiao")
-                
-                return [row[0] for row in cursor.fetchall()]
-                
-        except Exception as e:
-            logging.error(f"Erro ao buscar regiões: {e}")
-            return []
+        return list(self.get_catalogo().regioes)
     
-    def buscar_cidade_por_nome(self, nome: str) -> Optional[Dict]:
-        """Busca uma cidade específica por nome"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT nome, regiao, latitude, longitude, populacao
-                    FROM cidades_sc 
-                    WHERE nome LIKE ?
-                    LIMIT 1
-                """, (f"%{nome}%",))
-                
-                row = cursor.fetchone()
-                if row:
-                    return {
-                        'nome': row[0],
-                        'regiao': row[1],
-                        'latitude': row[2],
-                        'longitude': row[3],
-                        'populacao': row[4]
-                    }
-                
-                return None
-                
-        except Exception as e:
-            logging.error(f"Erro ao buscar cidade por nome: {e}")
+    def get_indice_busca(self) -> IndiceBuscaCidades:
+        """Índice de busca sem acentos sobre o catálogo local"""
+        return self.get_catalogo().indice_busca
+    
+    def buscar_cidades(self, texto: str, regiao: str = None, limite: Optional[int] = 20) -> List[str]:
+        """Busca cidades por prefixo, palavra ou aproximação, das mais relevantes para as menos"""
+        if regiao == "Todas as regiões":
+            regiao = None
+        return self.get_indice_busca().buscar(texto, regiao, limite)
+    
+    def buscar_cidade_por_nome(self, nome: str, uf: str = None) -> Optional[Dict]:
+        """Busca uma cidade específica por nome (aceita variações de acento e erros de digitação)"""
+        catalogo = self.get_catalogo()
+        cidade = catalogo.cidade(nome, uf)
+        if cidade is None:
+            nome_encontrado = catalogo.indice_busca.melhor(nome)
+            cidade = catalogo.cidade(nome_encontrado, uf) if nome_encontrado else None
+        return dict(cidade) if cidade else None
+    
+    def get_cidade_por_codigo(self, codigo_ibge) -> Optional[Dict]:
+        """Busca uma cidade pelo código IBGE"""
+        cidade = self.get_catalogo().por_codigo.get(str(codigo_ibge))
+        return dict(cidade) if cidade else None
+    
+    def municipio_mais_proximo(self, lat: float, lon: float) -> Optional[Dict]:
+        """Município cujo centroide é o mais próximo da coordenada, com a distância em km"""
+        resultado = self.get_catalogo().indice_proximidade.mais_proximo(lat, lon)
+        if resultado is None:
             return None
+        cidade, distancia = resultado
+        return dict(cidade, distancia_km=distancia)
+    
+    def associar_imoveis(self, imoveis: Iterable[Dict],
+                         limite_divergencia_km: float = DISTANCIA_DIVERGENCIA_KM) -> List[Dict]:
+        """
+        Associa cada imóvel (dict com id, cidade, latitude, longitude) ao município mais próximo
+
+        Consulta todos os imóveis em lote. Retorna, por imóvel com coordenadas,
+        o município mais próximo, a distância até o centroide e `divergente`:
+        True quando a cidade digitada não existe no cadastro ou o centroide
+        dela está a mais de `limite_divergencia_km` do imóvel (imóveis perto
+        da divisa podem legitimamente estar mais perto do centroide vizinho);
+        None quando a cidade digitada não tem centroide e não há como
+        comparar. Só municípios com centroide concorrem a mais próximo.
+        """
+        catalogo = self.get_catalogo()
+        imoveis = [i for i in imoveis if i.get('latitude') is not None and i.get('longitude') is not None]
+        proximos = catalogo.indice_proximidade.mais_proximos_lote(
+            [(i['latitude'], i['longitude']) for i in imoveis])
+        
+        associacoes = []
+        for imovel, proximo in zip(imoveis, proximos):
+            if proximo is None:
+                continue
+            cidade, distancia = proximo
+            informada = catalogo.cidade(imovel.get('cidade') or '', imovel.get('estado'))
+            if informada is None:
+                divergente = True
+            elif informada is cidade:
+                divergente = False
+            elif tem_centroide(informada):
+                distancia_informada = distancia_km(imovel['latitude'], imovel['longitude'],
+                                                   informada['latitude'], informada['longitude'])
+                divergente = distancia_informada > distancia + limite_divergencia_km
+            else:
+                # Sem centroide da cidade digitada: nem confere nem diverge
+                divergente = None
+            associacoes.append({
+                'imovel_id': imovel.get('id'),
+                'cidade_informada': imovel.get('cidade'),
+                'municipio': cidade['nome'],
+                'codigo_ibge': cidade['codigo_ibge'],
+                'uf': cidade.get('uf'),
+                'distancia_km': distancia,
+                'divergente': divergente,
+            })
+        return associacoes
+    
+    def associar_imoveis_cadastrados(self, limite_divergencia_km: float = DISTANCIA_DIVERGENCIA_KM) -> List[Dict]:
+        """Associação de todos os imóveis com coordenadas do banco (ver associar_imoveis)"""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute("""
+                SELECT id, cidade, estado, latitude, longitude FROM imoveis
+                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+            """).fetchall()
+        campos = ('id', 'cidade', 'estado', 'latitude', 'longitude')
+        return self.associar_imoveis((dict(zip(campos, row)) for row in rows), limite_divergencia_km)
     
     def get_estatisticas(self) -> Dict:
         """Retorna estatísticas das cidades"""
@@ -530,18 +954,26 @@ class CidadeService:
                 """)
                 cidades_por_regiao = dict(cursor.fetchall())
                 
-                # Última atualização
+                # Cidades por UF
+                cursor.execute("SELECT uf, COUNT(*) FROM cidades_sc GROUP BY uf ORDER BY uf")
+                cidades_por_uf = dict(cursor.fetchall())
+                
+                # Última sincronização de cada UF; a mais antiga vale para o conjunto
                 cursor.execute("""
-                    SELECT MAX(ultima_atualizacao) 
-                    FROM cidades_sc
+                    SELECT uf, ultima_sincronizacao, versao_fonte
+                    FROM cidades_sincronizacao ORDER BY ultima_sincronizacao
                 """)
-                ultima_atualizacao = cursor.fetchone()[0]
+                sincronizacoes = {uf: {'ultima_atualizacao': quando, 'fonte': fonte}
+                                  for uf, quando, fonte in cursor.fetchall()}
+                mais_antiga = next(iter(sincronizacoes.values()), {})
                 
                 return {
                     'total_cidades': total_cidades,
                     'cidades_por_regiao': cidades_por_regiao,
-                    'ultima_atualizacao': ultima_atualizacao,
-                    'fonte': 'ibge'
+                    'cidades_por_uf': cidades_por_uf,
+                    'sincronizacao_por_uf': sincronizacoes,
+                    'ultima_atualizacao': mais_antiga.get('ultima_atualizacao'),
+                    'fonte': mais_antiga.get('fonte') or 'ibge'
                 }
                 
         except Exception as e:
@@ -1,20 +1,30 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Serviço de exportação para PDF e Excel
+Serviço de exportação para PDF, Excel, CSV/TSV e Parquet/Arrow
 """
 
+import io
 import os
+import csv
+import gzip
+import json
+import time
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import chain, islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from models.imovel import Imovel
 from models.database import DatabaseManager
+from services.indicador_service import IndicadorService, montar_colunas, compilar_formula, CAMPOS_CALCULO
+from services.catalogo_cidades import get_catalogo
+from services.agregacao_service import AgregacaoService
 from utils.formatacao import formatar_moeda
 import logging
 
 try:
     from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer, PageBreak
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.units import inch
     from reportlab.lib import colors
@@ -26,26 +36,266 @@ except ImportError:
 
 try:
     import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
     from openpyxl.utils import get_column_letter
     OPENPYXL_AVAILABLE = True
 except ImportError:
     OPENPYXL_AVAILABLE = False
     logging.warning("OpenPyXL não disponível - exportação Excel desabilitada")
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    logging.warning("PyArrow não disponível - exportação Parquet/Arrow desabilitada")
+
+# Cabeçalhos da planilha - Removido ID e endereço, reorganizada ordem
+CABECALHOS_EXCEL = [
+    'CEP', 'Cidade', 'Estado', 'Metragem', 'Quartos', 'Banheiros',
+    'Ano', 'Padrão', 'Custo Aquisição', 'Custos Reforma', 'Custos Transação',
+    'Custo Total', 'Preço Estimado', 'Margem', 'ROI (%)', 'Status'
+]
+
+# Campo do quadro de cada coluna fixa da planilha
+COLUNAS_EXCEL = [
+    'cep', 'cidade', 'estado', 'metragem', 'quartos', 'banheiros',
+    'ano', 'padrao_acabamento', 'custo_aquisicao', 'custos_reforma', 'custos_transacao',
+    'custo_total', 'preco_venda_estimado', 'margem', 'roi', 'status'
+]
+INDICE_ROI_EXCEL = COLUNAS_EXCEL.index('roi')
+
+# Estilo nomeado por coluna da planilha (1 = CEP)
+FORMATOS_EXCEL = {
+    4: 'decimal',
+    9: 'moeda', 10: 'moeda', 11: 'moeda', 12: 'moeda', 13: 'moeda', 14: 'moeda',
+    15: 'percentual',
+}
+
+# Imóveis calculados por vez na exportação (indicadores avaliados por lote)
+LOTE_EXPORTACAO = 1000
+
+# Linhas lidas antes de fixar as larguras das colunas da planilha
+AMOSTRA_LARGURAS_EXCEL = 200
+
+# Colunas lidas da tabela imoveis nas exportações em streaming
+COLUNAS_BANCO = [
+    'id', 'endereco', 'cidade', 'estado', 'cep', 'latitude', 'longitude',
+    'metragem', 'quartos', 'banheiros', 'ano', 'padrao_acabamento',
+    'custo_aquisicao', 'custos_reforma', 'custos_transacao',
+    'percentual_lucro_credor', 'status', 'data_criacao', 'data_atualizacao'
+]
+
+# Colunas do CSV/TSV (nomes de campo, para carga em outras ferramentas)
+COLUNAS_CSV = [
+    'id', 'cep', 'cidade', 'estado', 'metragem', 'quartos', 'banheiros', 'ano',
+    'padrao_acabamento', 'custo_aquisicao', 'custos_reforma', 'custos_transacao',
+    'status'
+] + CAMPOS_CALCULO
+
+# Buffer de escrita dos arquivos CSV/TSV
+BUFFER_CSV = 1024 * 1024
+
+# Tipo de cada coluna nos arquivos Parquet/Arrow ('categoria' = dicionário de textos)
+TIPOS_ARROW = {
+    'id': 'int64',
+    'cep': 'texto',
+    'cidade': 'categoria',
+    'estado': 'categoria',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'metragem': 'float64',
+    'quartos': 'int32',
+    'banheiros': 'int32',
+    'ano': 'int32',
+    'padrao_acabamento': 'categoria',
+    'custo_aquisicao': 'float64',
+    'custos_reforma': 'float64',
+    'custos_transacao': 'float64',
+    'percentual_lucro_credor': 'float64',
+    'status': 'categoria',
+    # Resultados do motor de cálculo
+    'preco_venda_estimado': 'float64',
+    'custo_total': 'float64',
+    'lucro_credor': 'float64',
+    'lucro_investidor': 'float64',
+    'preco_minimo': 'float64',
+    'margem': 'float64',
+    'roi': 'float64',
+    'vpl': 'float64',
+    'tir_anual': 'float64',
+    'payback_meses': 'float64',
+}
+
+# Linhas por row group do Parquet (lotes são acumulados até esse tamanho)
+LINHAS_GRUPO_PARQUET = 100000
+
+# Quadro colunar: um campo por lista, todas do mesmo tamanho
+Quadro = Dict[str, List[Any]]
+
+# Tabela de imóveis do PDF - Removido endereço, mantido apenas CEP
+CABECALHOS_PDF = [
+    'CEP', 'Cidade', 'Metragem', 'Custo Total',
+    'Preço Estimado', 'Margem', 'ROI (%)', 'Status'
+]
+LARGURAS_PDF = [1.5, 1, 0.8, 1.2, 1.2, 1, 0.6, 0.8]  # polegadas
+
+# Alturas fixas (pt) das linhas da tabela do PDF: dispensam a medição de cada célula
+ALTURA_CABECALHO_PDF = 28.0
+ALTURA_LINHA_PDF = 16.0
+
+
+# Formato de exportação pela extensão do arquivo
+FORMATOS_POR_EXTENSAO = {
+    '.pdf': 'PDF',
+    '.xlsx': 'Excel',
+    '.csv': 'CSV',
+    '.tsv': 'CSV',
+    '.gz': 'CSV',
+    '.parquet': 'Parquet',
+    '.arrows': 'Parquet',
+}
+
+
+def formato_do_arquivo(filepath: str) -> Optional[str]:
+    """Formato de exportação deduzido da extensão ("dados.csv.gz" -> "CSV")"""
+    return FORMATOS_POR_EXTENSAO.get(os.path.splitext(filepath.lower())[1])
+
+
+class ConjuntoExportacao:
+    """
+    Imóveis de uma exportação já calculados: quadro colunar com os campos,
+    os resultados do motor de cálculo e os indicadores personalizados.
+    Todos os formatos leem os mesmos lotes dele, sem recalcular.
+    """
+    
+    def __init__(self, quadro: Quadro, indicadores: List[Dict[str, Any]],
+                 valores_indicadores: Dict[str, List[Any]]):
+        self.quadro = quadro
+        self.indicadores = indicadores
+        self.valores_indicadores = valores_indicadores
+        self.linhas = len(next(iter(quadro.values()), []))
+        
+    def __len__(self):
+        return self.linhas
+        
+    def lotes(self, tamanho_lote: int = LOTE_EXPORTACAO) -> Iterator[Tuple[Quadro, Dict[str, List[Any]]]]:
+        for inicio in range(0, self.linhas, tamanho_lote):
+            fim = inicio + tamanho_lote
+            yield (
+                {campo: valores[inicio:fim] for campo, valores in self.quadro.items()},
+                {nome: valores[inicio:fim] for nome, valores in self.valores_indicadores.items()}
+            )
+            
+            
+# Origem aceita pelos exportadores: imóveis, quadro colunar, lotes de quadros ou conjunto calculado
+Origem = Union[Iterable[Imovel], Quadro, Iterable[Quadro], ConjuntoExportacao]
+
+
+class ExportacaoCancelada(Exception):
+    """Interrompe uma exportação em andamento quando cancelado() passa a retornar True"""
+
+
+def _verificar_cancelamento(cancelado: Callable[[], bool] = None):
+    if cancelado and cancelado():
+        raise ExportacaoCancelada()
+
+
+def _remover_parcial(filepath: str):
+    """Apaga o arquivo incompleto deixado por uma exportação cancelada"""
+    try:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+    except OSError as e:
+        logging.warning(f"Não foi possível remover {filepath}: {e}")
+
+
+if REPORTLAB_AVAILABLE:
+    class _TabelaSobDemanda:
+        """
+        Marcador da tabela de imóveis na story: a cada vez que chega à frente
+        da fila, vira uma tabela com as linhas que cabem no espaço restante da
+        página (cabeçalho no topo de cada página) e volta para trás dela
+        enquanto houver linhas
+        """
+        
+        def __init__(self, linhas: Iterator[List[str]], estilo: 'TableStyle',
+                     progresso: Callable[[int], None] = None):
+            self.linhas = linhas
+            self.estilo = estilo
+            self.progresso = progresso
+            self.processadas = 0
+            self._proxima = next(self.linhas, None)
+            self.larguras = [largura * inch for largura in LARGURAS_PDF]
+            
+        def expandir(self, disponivel: float) -> list:
+            if self._proxima is None:
+                return []
+            quantidade = int((disponivel - ALTURA_CABECALHO_PDF - 0.01) // ALTURA_LINHA_PDF)
+            if quantidade < 1:
+                return [PageBreak(), self]
+                
+            data = [CABECALHOS_PDF, self._proxima]
+            data.extend(islice(self.linhas, quantidade - 1))
+            self._proxima = next(self.linhas, None)
+            self.processadas += len(data) - 1
+            if self.progresso:
+                self.progresso(self.processadas)
+                
+            tabela = LongTable(data, colWidths=self.larguras, repeatRows=1,
+                               rowHeights=[ALTURA_CABECALHO_PDF] + [ALTURA_LINHA_PDF] * (len(data) - 1))
+            tabela.setStyle(self.estilo)
+            return [tabela, self] if self._proxima is not None else [tabela]
+            
+    class _ConteudoAdiado:
+        """Marcador de flowables montados só quando chegam à frente da fila (ex.: resumo final)"""
+        
+        def __init__(self, montar: Callable[[], list]):
+            self.montar = montar
+            
+    class _DocumentoSobDemanda(SimpleDocTemplate):
+        """Documento que expande os marcadores da story à medida que o layout avança"""
+        
+        def filterFlowables(self, flowables):
+            while flowables and isinstance(flowables[0], (_TabelaSobDemanda, _ConteudoAdiado)):
+                marcador = flowables[0]
+                if isinstance(marcador, _ConteudoAdiado):
+                    flowables[0:1] = marcador.montar()
+                else:
+                    frame = self.frame
+                    flowables[0:1] = marcador.expandir(frame._y - frame._y1p)
+            if not flowables:
+                flowables.append(Spacer(1, 0))
+
 class ExportService:
-    def __init__(self):
-        self.db_manager = DatabaseManager()
+    def __init__(self, db_manager: DatabaseManager = None, calculo_service=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.calculo_service = calculo_service
+        self.indicador_service = IndicadorService(self.db_manager)
+        self.agregacao_service = AgregacaoService(db_manager=self.db_manager)
+        self.ultima_exportacao: Dict[str, Any] = {}
+        
+    def export_to_pdf(self, imoveis: Origem, filepath: str, filtros: Dict[str, Any] = None,
+                      progresso: Callable[[int], None] = None, cancelado: Callable[[], bool] = None) -> bool:
+        """
+        Exporta dados para PDF
         
-    def export_to_pdf(self, imoveis: List[Imovel], filepath: str, filtros: Dict[str, Any] = None) -> bool:
-        """Exporta dados para PDF"""
+        A tabela de imóveis é montada página a página durante o layout, com
+        larguras, alturas e estilo definidos uma vez: cada página recebe uma
+        tabela com cabeçalho e só as linhas que cabem nela. O resumo é
+        agregado enquanto as linhas são geradas. progresso recebe o número
+        de imóveis já paginados; se cancelado() passar a retornar True, a
+        exportação para e o arquivo parcial é removido.
+        """
         if not REPORTLAB_AVAILABLE:
             logging.error("ReportLab não disponível para exportação PDF")
             return False
             
         try:
             # Criar documento PDF
-            doc = SimpleDocTemplate(filepath, pagesize=A4)
+            doc = _DocumentoSobDemanda(filepath, pagesize=A4)
             story = []
             
             # Estilos
@@ -80,231 +330,750 @@ class ExportService:
                     story.append(filtros_para)
                     story.append(Spacer(1, 20))
             
-            # Resumo
-            total_imoveis = len(imoveis)
-            story.append(Paragraph(f"Total de imóveis: {total_imoveis}", styles['Heading2']))
-            story.append(Spacer(1, 20))
+            # Resumo (o total só é conhecido de antemão quando a origem tem tamanho)
+            total = self._total_linhas(imoveis)
+            if total is not None:
+                story.append(Paragraph(f"Total de imóveis: {total}", styles['Heading2']))
+                story.append(Spacer(1, 20))
             
-            # Tabela de imóveis
-            if imoveis:
-                # Cabeçalhos - Removido endereço, mantido apenas CEP
-                headers = [
-                    'CEP', 'Cidade', 'Metragem', 'Custo Total', 
-                    'Preço Estimado', 'Margem', 'ROI (%)', 'Status'
-                ]
-                
-                # Dados
-                data = [headers]
-                for imovel in imoveis:
-                    # Calcular valores
-                    custo_total = imovel.get_custo_total()
-                    preco_estimado = self._calcular_preco_estimado(imovel)
-                    margem = preco_estimado - custo_total
-                    roi = (margem / custo_total * 100) if custo_total > 0 else 0
-                    
-                    row = [
-                        imovel.cep,  # Removido endereço, mantido apenas CEP
-                        imovel.cidade,
-                        f"{imovel.metragem:.1f} m²",
-                        formatar_moeda(custo_total),
-                        formatar_moeda(preco_estimado),
-                        formatar_moeda(margem),
-                        f"{roi:.1f}%",
-                        imovel.status.replace('_', ' ').title()
-                    ]
-                    data.append(row)
-                
-                # Criar tabela
-                table = Table(data, colWidths=[1.5*inch, 1*inch, 0.8*inch, 1.2*inch, 1.2*inch, 1*inch, 0.6*inch, 0.8*inch])
-                
-                # Estilo da tabela
-                table_style = TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('FONTSIZE', (0, 1), (-1, -1), 8),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ])
-                
-                table.setStyle(table_style)
-                story.append(table)
-                
-                # Resumo financeiro
-                story.append(Spacer(1, 30))
-                story.append(Paragraph("Resumo Financeiro", styles['Heading2']))
-                
-                total_custo = sum(imovel.get_custo_total() for imovel in imoveis)
-                total_preco_estimado = sum(self._calcular_preco_estimado(imovel) for imovel in imoveis)
-                total_margem = total_preco_estimado - total_custo
-                roi_medio = (total_margem / total_custo * 100) if total_custo > 0 else 0
-                
-                resumo_data = [
-                    ['Total Custo', 'Total Preço\nEstimado', 'Total Margem', 'ROI Médio'],
-                    [
-                        formatar_moeda(total_custo),
-                        formatar_moeda(total_preco_estimado),
-                        formatar_moeda(total_margem),
-                        f"{roi_medio:.1f}%"
-                    ]
-                ]
-                
-                # Ajustar larguras das colunas: expandir "Total Preço Estimado" e reduzir 5% "ROI Médio"
-                resumo_table = Table(resumo_data, colWidths=[1.4*inch, 2.0*inch, 1.4*inch, 1.425*inch])
-                resumo_style = TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 11),  # Reduzir fonte do cabeçalho para 11
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('FONTSIZE', (0, 1), (-1, -1), 10),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ('WORDWRAP', (0, 0), (-1, -1), True),  # Permitir quebra de linha
-                ])
-                
-                resumo_table.setStyle(resumo_style)
-                story.append(resumo_table)
+            # Tabela de imóveis, gerada sob demanda; o resumo é agregado durante a geração
+            agregador = self.agregacao_service.novo_agregador(['regiao'])
+            tabela = _TabelaSobDemanda(self._linhas_pdf(imoveis, agregador, cancelado), self._estilo_tabela_pdf(), progresso)
+            if tabela._proxima is not None:
+                story.append(tabela)
+                story.append(_ConteudoAdiado(lambda: self._resumo_pdf(agregador.resultado(), styles)))
             
             # Gerar PDF
             doc.build(story)
             return True
             
+        except ExportacaoCancelada:
+            logging.info("Exportação PDF cancelada")
+            _remover_parcial(filepath)
+            return False
         except Exception as e:
             logging.error(f"Erro ao exportar para PDF: {e}")
             return False
             
-    def export_to_excel(self, imoveis: List[Imovel], filepath: str, filtros: Dict[str, Any] = None) -> bool:
-        """Exporta dados para Excel"""
+    def _linhas_pdf(self, origem: Origem, agregador,
+                    cancelado: Callable[[], bool] = None) -> Iterator[List[str]]:
+        """Linhas formatadas da tabela do PDF, lidas dos lotes calculados e somadas ao agregador"""
+        for quadro, _ in self._lotes(origem, [], cancelado):
+            n = len(quadro['custo_total'])
+            vazia = [None] * n
+            for cep, cidade, metragem, custo_total, preco_estimado, margem, roi, status in zip(
+                    *(quadro.get(campo, vazia) for campo in ('cep', 'cidade', 'metragem', 'custo_total',
+                                                              'preco_venda_estimado', 'margem', 'roi', 'status'))):
+                agregador.adicionar({
+                    'cidade': cidade,
+                    'metragem': metragem,
+                    'custo_total': custo_total,
+                    'preco_venda_estimado': preco_estimado,
+                    'margem': margem
+                })
+                yield [
+                    cep,
+                    cidade,
+                    f"{metragem or 0:.1f} m²",
+                    formatar_moeda(custo_total or 0),
+                    formatar_moeda(preco_estimado or 0),
+                    formatar_moeda(margem or 0),
+                    f"{roi or 0:.1f}%",
+                    (status or '').replace('_', ' ').title()
+                ]
+                
+    @staticmethod
+    def _estilo_tabela_pdf() -> 'TableStyle':
+        """Estilo da tabela de imóveis, montado uma vez e compartilhado por todas as páginas"""
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ])
+        
+    def _resumo_pdf(self, resumo: Dict[str, Any], styles) -> list:
+        """Resumo financeiro e por região ao final do relatório"""
+        story = []
+        
+        # Resumo financeiro
+        story.append(Spacer(1, 30))
+        story.append(Paragraph("Resumo Financeiro", styles['Heading2']))
+        
+        total_custo = resumo['total']['total_custo']
+        total_preco_estimado = resumo['total']['total_preco_estimado']
+        total_margem = resumo['total']['total_margem']
+        roi_medio = resumo['total']['roi_ponderado']
+        
+        resumo_data = [
+            ['Total Custo', 'Total Preço\nEstimado', 'Total Margem', 'ROI Médio'],
+            [
+                formatar_moeda(total_custo),
+                formatar_moeda(total_preco_estimado),
+                formatar_moeda(total_margem),
+                f"{roi_medio:.1f}%"
+            ]
+        ]
+        
+        # Ajustar larguras das colunas: expandir "Total Preço Estimado" e reduzir 5% "ROI Médio"
+        resumo_table = Table(resumo_data, colWidths=[1.4*inch, 2.0*inch, 1.4*inch, 1.425*inch])
+        resumo_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),  # Reduzir fonte do cabeçalho para 11
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('WORDWRAP', (0, 0), (-1, -1), True),  # Permitir quebra de linha
+        ])
+        
+        resumo_table.setStyle(resumo_style)
+        story.append(resumo_table)
+        
+        # Resumo por região
+        story.append(Spacer(1, 20))
+        story.append(Paragraph("Resumo por Região", styles['Heading2']))
+        
+        regiao_data = [['Região', 'Imóveis', 'Total Custo', 'Total Margem', 'ROI Ponderado']]
+        for regiao, valores in resumo['grupos']['regiao'].items():
+            regiao_data.append([
+                regiao,
+                str(valores['quantidade']),
+                formatar_moeda(valores['total_custo']),
+                formatar_moeda(valores['total_margem']),
+                f"{valores['roi_ponderado']:.1f}%"
+            ])
+        
+        regiao_table = Table(regiao_data, colWidths=[1.4*inch, 0.9*inch, 1.5*inch, 1.5*inch, 1.2*inch])
+        regiao_table.setStyle(resumo_style)
+        story.append(regiao_table)
+        return story
+        
+    def export_to_excel(self, imoveis: Origem, filepath: str, filtros: Dict[str, Any] = None,
+                        indicadores: List[Dict[str, Any]] = None, progresso: Callable[[int], None] = None,
+                        cancelado: Callable[[], bool] = None) -> bool:
+        """
+        Exporta dados para Excel (indicadores personalizados viram colunas extras)
+        
+        A planilha é gravada em modo write-only: as linhas são calculadas em
+        lotes e vão direto para o arquivo, sem manter o workbook em memória.
+        As larguras das colunas são estimadas pelas primeiras linhas.
+        progresso e cancelado funcionam como em export_to_pdf.
+        """
         if not OPENPYXL_AVAILABLE:
             logging.error("OpenPyXL não disponível para exportação Excel")
             return False
             
+        wb = None
         try:
-            # Criar workbook
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Imóveis"
+            wb = openpyxl.Workbook(write_only=True)
+            estilos = self._registrar_estilos_excel(wb)
+            ws = wb.create_sheet("Imóveis")
             
-            # Estilos
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            header_alignment = Alignment(horizontal="center", vertical="center")
-            
-            # Cabeçalhos - Removido ID e endereço, reorganizada ordem
-            headers = [
-                'CEP', 'Cidade', 'Estado', 'Metragem', 'Quartos', 'Banheiros',
-                'Ano', 'Padrão', 'Custo Aquisição', 'Custos Reforma', 'Custos Transação',
-                'Custo Total', 'Preço Estimado', 'Margem', 'ROI (%)', 'Status'
-            ]
+            # Indicadores personalizados: colunas extras após as fixas
+            indicadores = self._indicadores(imoveis, indicadores)
+            headers = CABECALHOS_EXCEL + [indicador['nome'] for indicador in indicadores]
             
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_alignment
-                
-            # Dados
-            for row, imovel in enumerate(imoveis, 2):
-                # Calcular valores
-                custo_total = imovel.get_custo_total()
-                preco_estimado = self._calcular_preco_estimado(imovel)
-                margem = preco_estimado - custo_total
-                roi = (margem / custo_total * 100) if custo_total > 0 else 0
-                
-                # Preencher linha - Removido ID e endereço, reorganizadas colunas
-                ws.cell(row=row, column=1, value=imovel.cep)  # CEP agora na coluna 1
-                ws.cell(row=row, column=2, value=imovel.cidade)  # Cidade agora na coluna 2
-                ws.cell(row=row, column=3, value=imovel.estado)  # Estado agora na coluna 3
-                ws.cell(row=row, column=4, value=imovel.metragem)  # Metragem agora na coluna 4
-                ws.cell(row=row, column=5, value=imovel.quartos)  # Quartos agora na coluna 5
-                ws.cell(row=row, column=6, value=imovel.banheiros)  # Banheiros agora na coluna 6
-                ws.cell(row=row, column=7, value=imovel.ano)  # Ano agora na coluna 7
-                ws.cell(row=row, column=8, value=imovel.padrao_acabamento)  # Padrão agora na coluna 8
-                ws.cell(row=row, column=9, value=imovel.custo_aquisicao)  # Custo Aquisição agora na coluna 9
-                ws.cell(row=row, column=10, value=imovel.custos_reforma)  # Custos Reforma agora na coluna 10
-                ws.cell(row=row, column=11, value=imovel.custos_transacao)  # Custos Transação agora na coluna 11
-                ws.cell(row=row, column=12, value=custo_total)  # Custo Total agora na coluna 12
-                ws.cell(row=row, column=13, value=preco_estimado)  # Preço Estimado agora na coluna 13
-                ws.cell(row=row, column=14, value=margem)  # Margem agora na coluna 14
-                ws.cell(row=row, column=15, value=roi)  # ROI agora na coluna 15
-                ws.cell(row=row, column=16, value=imovel.status)  # Status agora na coluna 16
-                
-                # Formatar valores monetários - Índices corrigidos após remoção do ID e endereço
-                for col in [9, 10, 11, 12, 13, 14]:
-                    cell = ws.cell(row=row, column=col)
-                    cell.number_format = 'R$ #.##0'  # Formato brasileiro: pontos como separador de milhares, sem centavos
-                    
-                # Formatar ROI - Corrigido índice
-                ws.cell(row=row, column=15).number_format = '0.0%'
-                
-                # Formatar metragem - Corrigido índice
-                ws.cell(row=row, column=4).number_format = '0.0'
-                
-            # Ajustar largura das colunas
-            for column in ws.columns:
-                max_length = 0
-                column_letter = get_column_letter(column[0].column)
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
+            # Uma célula estilizada por coluna formatada, reaproveitada em todas as linhas:
+            # append serializa a linha na hora, então só o valor muda entre linhas
+            celulas_estilizadas = {
+                col - 1: self._celula_excel(ws, None, estilos[formato])
+                for col, formato in FORMATOS_EXCEL.items() if col <= len(headers)
+            }
+            
+            linhas = self._linhas_excel(imoveis, indicadores, progresso, cancelado)
+            amostra = list(islice(linhas, AMOSTRA_LARGURAS_EXCEL))
+            
+            # No modo write-only as larguras precisam ser definidas antes da primeira linha
+            for col, largura in enumerate(self._larguras_excel(headers, amostra), 1):
+                ws.column_dimensions[get_column_letter(col)].width = largura
+            ws.freeze_panes = 'A2'
+            
+            ws.append([self._celula_excel(ws, header, 'cabecalho') for header in headers])
+            for linha in chain(amostra, linhas):
+                for col, cell in celulas_estilizadas.items():
+                    valor = linha[col]
+                    if valor is not None:
+                        cell.value = valor
+                        linha[col] = cell
+                ws.append(linha)
                 
             # Adicionar filtros
             if filtros:
                 ws2 = wb.create_sheet("Filtros")
-                ws2.cell(row=1, column=1, value="Filtros Aplicados")
-                ws2.cell(row=1, column=1).font = Font(bold=True)
-                
-                row = 3
+                ws2.append([self._celula_excel(ws2, "Filtros Aplicados", 'titulo')])
+                ws2.append([])
                 for key, value in filtros.items():
                     if value:
-                        ws2.cell(row=row, column=1, value=key)
-                        ws2.cell(row=row, column=2, value=str(value))
-                        row += 1
+                        ws2.append([key, str(value)])
                         
             # Salvar arquivo
             wb.save(filepath)
             return True
             
+        except ExportacaoCancelada:
+            logging.info("Exportação Excel cancelada")
+            # Salvar fecha as planilhas write-only e apaga os temporários do openpyxl
+            try:
+                wb.save(filepath)
+            except Exception:
+                pass
+            _remover_parcial(filepath)
+            return False
         except Exception as e:
             logging.error(f"Erro ao exportar para Excel: {e}")
             return False
             
-    def _calcular_preco_estimado(self, imovel: Imovel) -> float:
-        """Calcula preço estimado para exportação (versão simplificada)"""
+    def _registrar_estilos_excel(self, wb) -> Dict[str, str]:
+        """Registra os estilos nomeados uma vez no workbook; células só referenciam o nome"""
+        estilos = {
+            'cabecalho': NamedStyle(
+                name='cabecalho',
+                font=Font(bold=True, color="FFFFFF"),
+                fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+                alignment=Alignment(horizontal="center", vertical="center")
+            ),
+            'titulo': NamedStyle(name='titulo', font=Font(bold=True)),
+            # Formato brasileiro: pontos como separador de milhares, sem centavos
+            'moeda': NamedStyle(name='moeda', number_format='R$ #.##0'),
+            'percentual': NamedStyle(name='percentual', number_format='0.0%'),
+            'decimal': NamedStyle(name='decimal', number_format='0.0'),
+        }
+        for estilo in estilos.values():
+            wb.add_named_style(estilo)
+        return {nome: nome for nome in estilos}
+        
+    @staticmethod
+    def _celula_excel(ws, valor: Any, estilo: str) -> 'WriteOnlyCell':
+        cell = WriteOnlyCell(ws, value=valor)
+        cell.style = estilo
+        return cell
+        
+    def _linhas_excel(self, origem: Origem, indicadores: List[Dict[str, Any]],
+                      progresso: Callable[[int], None] = None,
+                      cancelado: Callable[[], bool] = None) -> Iterator[List[Any]]:
+        """Gera as linhas da planilha a partir dos lotes calculados"""
+        processados = 0
+        for quadro, avaliados in self._lotes(origem, indicadores, cancelado):
+            n = len(quadro['custo_total'])
+            vazia = [None] * n
+            colunas = [quadro.get(campo, vazia) for campo in COLUNAS_EXCEL]
+            colunas += [avaliados[indicador['nome']] for indicador in indicadores]
+            for linha in zip(*colunas):
+                linha = list(linha)
+                if linha[INDICE_ROI_EXCEL] is not None:
+                    linha[INDICE_ROI_EXCEL] /= 100  # formato '0.0%' multiplica por 100 na exibição
+                yield linha
+                
+            # Só volta aqui depois que as linhas do lote foram gravadas
+            processados += n
+            if progresso:
+                progresso(processados)
+                
+    @staticmethod
+    def _larguras_excel(headers: List[str], amostra: List[List[Any]]) -> List[int]:
+        """Largura de cada coluna pelo maior texto entre cabeçalho e linhas de amostra"""
+        larguras = [len(str(header)) for header in headers]
+        for linha in amostra:
+            for col, valor in enumerate(linha):
+                if valor is not None:
+                    larguras[col] = max(larguras[col], len(str(valor)))
+        return [min(largura + 2, 50) for largura in larguras]
+        
+    def lotes_do_banco(self, where: str = "", params: tuple = (),
+                       tamanho_lote: int = LOTE_EXPORTACAO) -> Iterator[Quadro]:
+        """Lê a tabela imoveis por um cursor em lotes, cada lote como quadro colunar"""
+        query = f"SELECT {', '.join(COLUNAS_BANCO)} FROM imoveis {where}"
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            while True:
+                lote = cursor.fetchmany(tamanho_lote)
+                if not lote:
+                    break
+                yield dict(zip(COLUNAS_BANCO, map(list, zip(*lote))))
+                
+    def lotes_filtrados(self, filtros: Dict[str, Any] = None,
+                        tamanho_lote: int = LOTE_EXPORTACAO) -> Iterator[Quadro]:
+        """
+        Lotes da tabela imoveis que atendem aos filtros do painel
+        
+        Cidade, estado e trecho de CEP vão para a consulta; região (pelo
+        catálogo de cidades) e fórmula são aplicadas a cada lote, a fórmula
+        sobre o quadro já calculado. Valores vazios ou "Todas as ..." não
+        filtram; chaves desconhecidas levantam ValueError.
+        """
+        filtros = {chave: valor for chave, valor in (filtros or {}).items()
+                   if valor and not str(valor).startswith("Todas as")}
+        desconhecidos = set(filtros) - {'cidade', 'estado', 'cep', 'regiao', 'formula'}
+        if desconhecidos:
+            raise ValueError(f"Filtros não suportados na exportação: {', '.join(sorted(desconhecidos))}")
+            
+        condicoes, params = [], []
+        for campo in ('cidade', 'estado'):
+            if campo in filtros:
+                condicoes.append(f"{campo} = ?")
+                params.append(filtros[campo])
+        if 'cep' in filtros:
+            condicoes.append("instr(replace(replace(cep, '-', ''), '.', ''), ?) > 0")
+            params.append(str(filtros['cep']).replace('-', '').replace('.', ''))
+        where = f"WHERE {' AND '.join(condicoes)} " if condicoes else ""
+        
+        catalogo = get_catalogo(self.db_manager.db_path) if 'regiao' in filtros else None
+        formula = compilar_formula(filtros['formula']) if 'formula' in filtros else None
+        for quadro in self.lotes_do_banco(where + "ORDER BY id", tuple(params), tamanho_lote):
+            mascaras = []
+            if catalogo is not None:
+                mascaras.append([catalogo.regiao_de(cidade) == filtros['regiao'] for cidade in quadro['cidade']])
+            if formula is not None:
+                quadro = self.calcular_colunas(quadro)
+                mascaras.append(formula.filtrar(quadro))
+            if mascaras:
+                mascara = [all(atende) for atende in zip(*mascaras)]
+                quadro = {campo: [valor for valor, ok in zip(valores, mascara) if ok]
+                          for campo, valores in quadro.items()}
+            if quadro['id']:
+                yield quadro
+                
+    def _get_calculo_service(self):
+        if self.calculo_service is None:
+            from services.calculo_service import get_calculo_service
+            self.calculo_service = get_calculo_service(self.db_manager)
+        return self.calculo_service
+        
+    def calcular_lote(self, imoveis: List[Imovel]) -> Quadro:
+        """
+        Quadro colunar dos imóveis com todos os resultados do motor de cálculo
+        (preço, custos, lucros, margem, ROI, VPL, TIR e payback) em uma única
+        rodada; linhas, resumos e indicadores de uma exportação saem dele
+        """
+        return montar_colunas(imoveis, self._get_calculo_service().calcular_lote(imoveis))
+        
+    def calcular_colunas(self, quadro: Quadro) -> Quadro:
+        """
+        Acrescenta a um quadro vindo do banco (ou de fora) os resultados do
+        motor de cálculo que faltam, calculados coluna a coluna, sem montar
+        um Imovel por linha
+        """
+        faltando = [campo for campo in CAMPOS_CALCULO if campo not in quadro]
+        if not faltando:
+            return quadro
+            
+        calculos = self._get_calculo_service().calcular_colunas(quadro)
+        for campo in faltando:
+            quadro[campo] = calculos[campo]
+        return quadro
+        
+    @staticmethod
+    def _fatiar_quadro(quadro: Quadro, tamanho_lote: int = LOTE_EXPORTACAO) -> Iterator[Quadro]:
+        n = len(next(iter(quadro.values()), []))
+        for inicio in range(0, n, tamanho_lote):
+            yield {campo: valores[inicio:inicio + tamanho_lote] for campo, valores in quadro.items()}
+            
+    @staticmethod
+    def _total_linhas(origem: Origem) -> Optional[int]:
+        """Número de imóveis da origem, quando conhecido sem percorrê-la"""
+        if isinstance(origem, dict):
+            return len(next(iter(origem.values()), []))
+        if isinstance(origem, (ConjuntoExportacao, list, tuple)):
+            return len(origem)
+        return None
+        
+    def _indicadores(self, origem: Origem, indicadores: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        if indicadores is not None:
+            return indicadores
+        if isinstance(origem, ConjuntoExportacao):
+            return origem.indicadores
+        return self.indicador_service.listar_indicadores()
+        
+    def _lotes(self, origem: Origem, indicadores: List[Dict[str, Any]],
+               cancelado: Callable[[], bool] = None) -> Iterator[Tuple[Quadro, Dict[str, List[Any]]]]:
+        """
+        Lotes (quadro calculado, valores dos indicadores) de qualquer origem
+        
+        Conjuntos já calculados só são fatiados; imóveis passam pelo motor de
+        cálculo de LOTE_EXPORTACAO em LOTE_EXPORTACAO e quadros recebem as
+        colunas calculadas que faltam. cancelado() é verificado a cada lote.
+        """
+        if isinstance(origem, ConjuntoExportacao):
+            for quadro, avaliados in origem.lotes():
+                _verificar_cancelamento(cancelado)
+                faltando = [indicador for indicador in indicadores if indicador['nome'] not in avaliados]
+                if faltando:
+                    avaliados = dict(avaliados, **self.indicador_service.avaliar_indicadores(faltando, quadro))
+                yield quadro, avaliados
+            return
+            
+        iterador = iter(self._fatiar_quadro(origem) if isinstance(origem, dict) else origem)
+        primeiro = next(iterador, None)
+        if primeiro is None:
+            return
+        iterador = chain([primeiro], iterador)
+        por_quadro = isinstance(primeiro, dict)
+        while True:
+            _verificar_cancelamento(cancelado)
+            if por_quadro:
+                lote = next(iterador, None)
+                if lote is None:
+                    return
+                quadro = self.calcular_colunas(dict(lote))
+            else:
+                lote = list(islice(iterador, LOTE_EXPORTACAO))
+                if not lote:
+                    return
+                quadro = self.calcular_lote(lote)
+            avaliados = self.indicador_service.avaliar_indicadores(indicadores, quadro) if indicadores else {}
+            yield quadro, avaliados
+            
+    def preparar_conjunto(self, origem: Origem, indicadores: List[Dict[str, Any]] = None,
+                          cancelado: Callable[[], bool] = None) -> ConjuntoExportacao:
+        """Calcula os imóveis (motor de cálculo e indicadores) uma vez para vários formatos"""
+        indicadores = self._indicadores(origem, indicadores)
+        quadro: Quadro = {}
+        valores = {indicador['nome']: [] for indicador in indicadores}
+        for lote, avaliados in self._lotes(origem, indicadores, cancelado):
+            for campo, coluna in lote.items():
+                quadro.setdefault(campo, []).extend(coluna)
+            for nome, coluna in valores.items():
+                coluna.extend(avaliados[nome])
+        return ConjuntoExportacao(quadro, indicadores, valores)
+        
+
+    def export_to_csv(self, origem: Origem, filepath: str,
+                      indicadores: List[Dict[str, Any]] = None, separador: str = None,
+                      compactar: bool = None, progresso: Callable[[int], None] = None,
+                      cancelado: Callable[[], bool] = None) -> bool:
+        """
+        Exporta para CSV/TSV em streaming
+        
+        A origem é um quadro colunar, uma sequência de lotes (ex.:
+        lotes_do_banco), imóveis ou um conjunto já calculado; colunas
+        calculadas e indicadores são avaliados lote a lote e escritos por um
+        buffer, opcionalmente em gzip. Separador e compactação são deduzidos
+        da extensão (.tsv, .gz) quando omitidos.
+        Linhas, duração e linhas/s ficam em ultima_exportacao; cancelado()
+        interrompe entre lotes e remove o arquivo parcial.
+        """
+        estatisticas = self._escrever_csv(origem, filepath, indicadores, separador, compactar,
+                                          progresso, cancelado)
+        if estatisticas is None:
+            return False
+        self.ultima_exportacao = estatisticas
+        return True
+        
+    def _escrever_csv(self, origem: Origem, filepath: str, indicadores: List[Dict[str, Any]] = None,
+                      separador: str = None, compactar: bool = None,
+                      progresso: Callable[[int], None] = None,
+                      cancelado: Callable[[], bool] = None) -> Optional[Dict[str, Any]]:
+        """export_to_csv sem estado compartilhado: retorna as estatísticas, ou None em falha"""
+        nome = filepath.lower()
+        if compactar is None:
+            compactar = nome.endswith('.gz')
+        if separador is None:
+            separador = '\t' if nome.endswith(('.tsv', '.tsv.gz')) else ','
+        indicadores = self._indicadores(origem, indicadores)
+        
         try:
-            # Fator de localização padrão
-            fator_localizacao = 1.0
+            inicio = time.perf_counter()
+            total = 0
+            if compactar:
+                binario = gzip.GzipFile(filepath, 'wb', compresslevel=6)
+                arquivo = io.TextIOWrapper(io.BufferedWriter(binario, BUFFER_CSV), encoding='utf-8', newline='')
+            else:
+                binario = None
+                arquivo = open(filepath, 'w', encoding='utf-8', newline='', buffering=BUFFER_CSV)
+            try:
+                writer = csv.writer(arquivo, delimiter=separador, lineterminator='\n')
+                writer.writerow(COLUNAS_CSV + [indicador['nome'] for indicador in indicadores])
+                for quadro, avaliados in self._lotes(origem, indicadores, cancelado):
+                    n = len(quadro['custo_total'])
+                    vazia = [None] * n
+                    writer.writerows(zip(*(quadro.get(coluna, vazia) for coluna in COLUNAS_CSV),
+                                         *(avaliados[indicador['nome']] for indicador in indicadores)))
+                    total += n
+                    if progresso:
+                        progresso(total)
+            finally:
+                arquivo.close()
+                if binario is not None:
+                    binario.close()
+                    
+            duracao = time.perf_counter() - inicio
+            estatisticas = {
+                'arquivo': filepath,
+                'linhas': total,
+                'segundos': duracao,
+                'linhas_por_segundo': total / duracao if duracao > 0 else float(total),
+            }
+            logging.info(f"{total} linhas exportadas para {filepath} em {duracao:.2f}s "
+                         f"({estatisticas['linhas_por_segundo']:.0f} linhas/s)")
+            return estatisticas
             
-            # Fator de padrão
-            fator_padrao = {
-                'baixo': 0.9,
-                'medio': 1.0,
-                'alto': 1.1
-            }.get(imovel.padrao_acabamento, 1.0)
+        except ExportacaoCancelada:
+            logging.info("Exportação CSV cancelada")
+            _remover_parcial(filepath)
+            return None
+        except Exception as e:
+            logging.error(f"Erro ao exportar para CSV: {e}")
+            return None
+            
+    def metadados_exportacao(self, filtros: Dict[str, Any] = None,
+                             indicadores: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Filtros, versões dos parâmetros globais e indicadores usados em uma exportação"""
+        parametros = {}
+        try:
+            for chave, valor, atualizado_em in self.db_manager.execute_query(
+                    "SELECT chave, valor, data_atualizacao FROM parametros_globais ORDER BY chave"):
+                parametros[chave] = {'valor': valor, 'atualizado_em': atualizado_em}
+        except Exception as e:
+            logging.warning(f"Parâmetros globais indisponíveis para os metadados: {e}")
+        return {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'filtros': {chave: valor for chave, valor in (filtros or {}).items() if valor},
+            'parametros': parametros,
+            'indicadores': [
+                {'nome': indicador['nome'], 'expressao': indicador['expressao'],
+                 'formato': indicador.get('formato', 'numero')}
+                for indicador in indicadores or []
+            ],
+        }
+        
+    @staticmethod
+    def _esquema_arrow(indicadores: List[Dict[str, Any]], metadados: Dict[str, Any]) -> 'pa.Schema':
+        tipos = {
+            'int64': pa.int64(),
+            'int32': pa.int32(),
+            'float64': pa.float64(),
+            'texto': pa.string(),
+            'categoria': pa.dictionary(pa.int32(), pa.string()),
+        }
+        campos = [pa.field(coluna, tipos[tipo]) for coluna, tipo in TIPOS_ARROW.items()]
+        campos += [
+            pa.field(indicador['nome'], pa.float64(), metadata={
+                'expressao': indicador['expressao'],
+                'formato': indicador.get('formato', 'numero'),
+            })
+            for indicador in indicadores
+        ]
+        return pa.schema(campos, metadata={
+            f"imoveis.{chave}": json.dumps(valor, ensure_ascii=False, default=str)
+            for chave, valor in metadados.items()
+        })
+        
+    def _lote_arrow(self, quadro: Quadro, avaliados: Dict[str, List[Any]],
+                    esquema: 'pa.Schema') -> 'pa.RecordBatch':
+        """Converte um lote calculado (quadro e indicadores) em record batch tipado"""
+        n = len(quadro['custo_total'])
+        vazia = [None] * n
+        
+        arrays = []
+        for campo in esquema:
+            valores = quadro.get(campo.name, vazia) if campo.name in TIPOS_ARROW else avaliados.get(campo.name, vazia)
+            tipo = TIPOS_ARROW.get(campo.name, 'float64')
+            if tipo in ('int64', 'int32'):
+                valores = [int(v) if v is not None else None for v in valores]
+            elif tipo == 'float64':
+                # Indicadores podem produzir textos/booleanos: só números viram valores
+                valores = [float(v) if isinstance(v, (int, float)) else None for v in valores]
+            else:
+                valores = [str(v) if v is not None else None for v in valores]
+            if tipo == 'categoria':
+                arrays.append(pa.array(valores, pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(valores, campo.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=esquema)
+        
+    def export_to_parquet(self, filepath: str, origem: Origem = None,
+                          filtros: Dict[str, Any] = None, indicadores: List[Dict[str, Any]] = None,
+                          compressao: str = 'zstd', linhas_por_grupo: int = LINHAS_GRUPO_PARQUET,
+                          progresso: Callable[[int], None] = None, cancelado: Callable[[], bool] = None) -> bool:
+        """
+        Exporta imóveis e indicadores para Parquet (ou fluxo Arrow IPC, em .arrows)
+        
+        A origem padrão é a tabela imoveis com os filtros aplicados
+        (lotes_filtrados), lida por cursor em lotes; uma origem informada já
+        deve vir filtrada, e filtros só a descreve nos metadados. Cada lote vira um record batch tipado (textos repetitivos como
+        dicionário) e o Parquet é escrito em row groups de linhas_por_grupo,
+        com filtros, parâmetros e indicadores nos metadados do arquivo.
+        """
+        estatisticas = self._escrever_parquet(filepath, origem, filtros, indicadores, compressao,
+                                              linhas_por_grupo, progresso, cancelado)
+        if estatisticas is None:
+            return False
+        self.ultima_exportacao = estatisticas
+        return True
+        
+    def _escrever_parquet(self, filepath: str, origem: Origem = None,
+                          filtros: Dict[str, Any] = None, indicadores: List[Dict[str, Any]] = None,
+                          compressao: str = 'zstd', linhas_por_grupo: int = LINHAS_GRUPO_PARQUET,
+                          progresso: Callable[[int], None] = None,
+                          cancelado: Callable[[], bool] = None) -> Optional[Dict[str, Any]]:
+        """export_to_parquet sem estado compartilhado: retorna as estatísticas, ou None em falha"""
+        if not PYARROW_AVAILABLE:
+            logging.error("PyArrow não disponível para exportação Parquet")
+            return None
             
-            # Preço base (valor padrão)
-            preco_base_m2 = 5000.0
+        if origem is None:
+            origem = self.lotes_filtrados(filtros)
+        indicadores = self._indicadores(origem, indicadores)
+        
+        try:
+            inicio = time.perf_counter()
+            esquema = self._esquema_arrow(indicadores, self.metadados_exportacao(filtros, indicadores))
+            total = 0
             
-            preco_estimado = preco_base_m2 * imovel.metragem * fator_localizacao * fator_padrao
-            return round(preco_estimado, 2)
+            if filepath.lower().endswith('.arrows'):
+                # Formato de fluxo: cada lote pode trazer o próprio dicionário das categorias
+                with pa.ipc.new_stream(filepath, esquema) as writer:
+                    for quadro, avaliados in self._lotes(origem, indicadores, cancelado):
+                        batch = self._lote_arrow(quadro, avaliados, esquema)
+                        writer.write_batch(batch)
+                        total += batch.num_rows
+                        if progresso:
+                            progresso(total)
+            else:
+                categorias = [coluna for coluna, tipo in TIPOS_ARROW.items() if tipo == 'categoria']
+                with pq.ParquetWriter(filepath, esquema, compression=compressao,
+                                      use_dictionary=categorias) as writer:
+                    # Lotes acumulados até completar um row group: poucos grupos grandes
+                    pendentes, linhas_pendentes = [], 0
+                    for quadro, avaliados in self._lotes(origem, indicadores, cancelado):
+                        batch = self._lote_arrow(quadro, avaliados, esquema)
+                        pendentes.append(batch)
+                        linhas_pendentes += batch.num_rows
+                        total += batch.num_rows
+                        if linhas_pendentes >= linhas_por_grupo:
+                            writer.write_table(pa.Table.from_batches(pendentes, esquema),
+                                               row_group_size=linhas_por_grupo)
+                            pendentes, linhas_pendentes = [], 0
+                        if progresso:
+                            progresso(total)
+                    if pendentes:
+                        writer.write_table(pa.Table.from_batches(pendentes, esquema),
+                                           row_group_size=linhas_por_grupo)
+                        
+            duracao = time.perf_counter() - inicio
+            estatisticas = {
+                'arquivo': filepath,
+                'linhas': total,
+                'segundos': duracao,
+                'linhas_por_segundo': total / duracao if duracao > 0 else float(total),
+            }
+            logging.info(f"{total} linhas exportadas para {filepath} em {duracao:.2f}s")
+            return estatisticas
             
+        except ExportacaoCancelada:
+            logging.info("Exportação Parquet cancelada")
+            _remover_parcial(filepath)
+            return None
         except Exception as e:
-            logging.error(f"Erro ao calcular preço estimado: {e}")
-            return 0.0
+            logging.error(f"Erro ao exportar para Parquet: {e}")
+            return None
             
+    def exportar_varios(self, origem: Origem, destinos: Iterable[Union[str, Tuple[str, str]]],
+                        filtros: Dict[str, Any] = None, indicadores: List[Dict[str, Any]] = None,
+                        max_paralelo: int = None, manifesto: str = None,
+                        progresso: Callable[[str, int], None] = None,
+                        cancelado: Callable[[], bool] = None) -> Dict[str, Any]:
+        """
+        Exporta os mesmos imóveis para vários arquivos de uma vez
+        
+        Destinos são caminhos (formato pela extensão, ver FORMATOS_POR_EXTENSAO)
+        ou tuplas (formato, caminho). O motor de cálculo e os indicadores
+        rodam uma única vez (preparar_conjunto) e os formatos são escritos em
+        paralelo, em threads que leem o mesmo conjunto sem copiá-lo.
+        progresso(formato, linhas) vem das threads de escrita.
+        
+        Retorna o manifesto: metadados, tempo do cálculo, tempo total e, por
+        arquivo, formato, sucesso, segundos, bytes e as estatísticas do
+        exportador (linhas e linhas/s, no CSV e no Parquet); gravado em JSON
+        quando manifesto é um caminho. ultima_exportacao não é alterada.
+        """
+        inicio = time.perf_counter()
+        alvos = [destino if isinstance(destino, tuple) else (formato_do_arquivo(destino), destino)
+                 for destino in destinos]
+        resultado: Dict[str, Any] = {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'linhas': 0,
+            'cancelada': False,
+            'calculo_segundos': 0.0,
+            'total_segundos': 0.0,
+            'arquivos': [],
+        }
+        
+        try:
+            conjunto = self.preparar_conjunto(origem, indicadores, cancelado)
+        except ExportacaoCancelada:
+            logging.info("Exportação múltipla cancelada durante o cálculo")
+            resultado['cancelada'] = True
+            resultado['total_segundos'] = time.perf_counter() - inicio
+            return resultado
+        resultado['linhas'] = len(conjunto)
+        resultado['calculo_segundos'] = time.perf_counter() - inicio
+        resultado['metadados'] = self.metadados_exportacao(filtros, conjunto.indicadores)
+        
+        exportadores = {
+            'PDF': lambda arquivo, acompanhar: self.export_to_pdf(
+                conjunto, arquivo, filtros, progresso=acompanhar, cancelado=cancelado),
+            'Excel': lambda arquivo, acompanhar: self.export_to_excel(
+                conjunto, arquivo, filtros, progresso=acompanhar, cancelado=cancelado),
+            # CSV e Parquet devolvem as próprias estatísticas: as threads não
+            # disputam ultima_exportacao
+            'CSV': lambda arquivo, acompanhar: self._escrever_csv(
+                conjunto, arquivo, progresso=acompanhar, cancelado=cancelado),
+            'Parquet': lambda arquivo, acompanhar: self._escrever_parquet(
+                arquivo, conjunto, filtros, progresso=acompanhar, cancelado=cancelado),
+        }
+        
+        def exportar(alvo: Tuple[str, str]) -> Dict[str, Any]:
+            formato, arquivo = alvo
+            acompanhar = (lambda linhas: progresso(formato, linhas)) if progresso else None
+            inicio_arquivo = time.perf_counter()
+            exportador = exportadores.get(formato)
+            if exportador is None:
+                logging.error(f"Formato de exportação desconhecido para {arquivo}: {formato}")
+                sucesso = False
+            else:
+                try:
+                    sucesso = exportador(arquivo, acompanhar)
+                except Exception as e:
+                    logging.error(f"Erro ao exportar {formato} para {arquivo}: {e}")
+                    sucesso = False
+            estatisticas = sucesso if isinstance(sucesso, dict) else {}
+            return {
+                'formato': formato,
+                'arquivo': arquivo,
+                'sucesso': bool(sucesso),
+                'segundos': time.perf_counter() - inicio_arquivo,
+                'bytes': os.path.getsize(arquivo) if sucesso and os.path.exists(arquivo) else None,
+                'linhas': estatisticas.get('linhas'),
+                'linhas_por_segundo': estatisticas.get('linhas_por_segundo'),
+            }
+            
+        if alvos:
+            with ThreadPoolExecutor(max_workers=max_paralelo or len(alvos)) as executor:
+                resultado['arquivos'] = list(executor.map(exportar, alvos))
+        resultado['cancelada'] = bool(cancelado and cancelado())
+        resultado['total_segundos'] = time.perf_counter() - inicio
+        
+        if manifesto:
+            try:
+                with open(manifesto, 'w', encoding='utf-8') as arquivo:
+                    json.dump(resultado, arquivo, ensure_ascii=False, indent=2, default=str)
+            except OSError as e:
+                logging.error(f"Erro ao gravar manifesto {manifesto}: {e}")
+        return resultado
+        
     def get_export_formats(self) -> List[str]:
         """Retorna formatos de exportação disponíveis"""
         formats = []
@@ -315,6 +1084,11 @@ class ExportService:
         if OPENPYXL_AVAILABLE:
             formats.append("Excel")
             
+        formats.append("CSV")
+        
+        if PYARROW_AVAILABLE:
+            formats.append("Parquet")
+        
         return formats
         
     def get_available_formats(self) -> List[str]:
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serviço de fluxo de caixa: saídas e entradas datadas, VPL e TIR do portfólio
+"""
+
+import operator
+from datetime import datetime, date
+from typing import List, Dict, Any, Optional, Tuple
+from models.imovel import Imovel
+from models.parametros import ParametrosGlobais
+import logging
+
+
+def adicionar_meses(data_base: date, meses: int) -> date:
+    """Soma meses a uma data, ajustando o dia para o fim do mês quando necessário"""
+    ano = data_base.year + (data_base.month - 1 + meses) // 12
+    mes = (data_base.month - 1 + meses) % 12 + 1
+    dias_no_mes = [31, 29 if ano % 4 == 0 and (ano % 100 != 0 or ano % 400 == 0) else 28,
+                   31, 30, 31, 30, 31, 31, 30, 31, 30, 31][mes - 1]
+    return date(ano, mes, min(data_base.day, dias_no_mes))
+
+
+def taxa_anual_para_mensal(taxa_anual_percentual: float) -> float:
+    """Converte uma taxa anual em % para taxa mensal equivalente (fração)"""
+    return (1 + taxa_anual_percentual / 100) ** (1 / 12) - 1
+
+
+def _colunas(fluxos: List[List[float]]) -> List[Tuple[int, int, List[float]]]:
+    """
+    Fluxos transpostos em colunas (primeiro mês, último mês, valor de cada
+    linha): só meses em que alguma linha tem lançamento, e meses seguidos com
+    os mesmos valores (as parcelas da reforma) juntos em uma coluna só. O
+    solver avança todas as linhas juntas percorrendo as colunas, sem laço por
+    imóvel.
+    """
+    horizonte = max((len(f) for f in fluxos), default=0)
+    linhas = [f if len(f) == horizonte else list(f) + [0.0] * (horizonte - len(f)) for f in fluxos]
+    colunas: List[Tuple[int, int, List[float]]] = []
+    for t, valores in enumerate(zip(*linhas)):
+        if not any(valores):
+            continue
+        valores = list(valores)
+        if colunas and colunas[-1][1] == t - 1 and colunas[-1][2] == valores:
+            colunas[-1] = (colunas[-1][0], t, colunas[-1][2])
+        else:
+            colunas.append((t, t, valores))
+    return colunas
+
+
+def _filtrar_colunas(colunas: List[Tuple[int, int, List[float]]],
+                     posicoes: List[int]) -> List[Tuple[int, int, List[float]]]:
+    """Mantém nas colunas só as linhas das posições informadas"""
+    return [(inicio, fim, [valores[k] for k in posicoes]) for inicio, fim, valores in colunas]
+
+
+def _vpl_e_derivada_lote(colunas: List[Tuple[int, int, List[float]]],
+                         taxas: List[float]) -> Tuple[List[float], List[float]]:
+    """
+    VPL e sua derivada em relação à taxa de todas as linhas, coluna a coluna
+
+    Horner em f = 1/(1+taxa), do último mês com lançamento para o primeiro:
+    o VPL é o polinômio P(f) e a derivada é P'(f) * df/dtaxa = -P'(f) * f².
+    Uma coluna de n meses iguais entra como c * (1 + f + ... + f^(n-1)).
+    """
+    m = len(taxas)
+    if not colunas:
+        return [0.0] * m, [0.0] * m
+    fatores = [1 / (1 + taxa) for taxa in taxas]
+    potencias, somas = {}, {}
+
+    def potencia(g):
+        # f^g e g·f^(g-1) por linha, para saltar g meses
+        if g not in potencias:
+            fg = [f ** g for f in fatores]
+            potencias[g] = (fg, [g * p / f for p, f in zip(fg, fatores)])
+        return potencias[g]
+
+    def soma(n):
+        # S(f) = 1 + f + ... + f^(n-1) = (1 - f^n) / (1 - f) e S'(f), com
+        # 1 - f = taxa·f; perto de taxa zero, a série de Taylor em f = 1
+        if n not in somas:
+            fn, dfn = potencia(n)
+            a, b = n * (n - 1) / 2, n * (n - 1) * (n - 2) / 3
+            somas[n] = (
+                [(1 - p) / (taxa * f) if taxa > 1e-6 or taxa < -1e-6 else n + a * (f - 1)
+                 for p, taxa, f in zip(fn, taxas, fatores)],
+                [(1 - p - q * taxa * f) / (taxa * f) ** 2 if taxa > 1e-3 or taxa < -1e-3 else a + b * (f - 1)
+                 for p, q, taxa, f in zip(fn, dfn, taxas, fatores)]
+            )
+        return somas[n]
+
+    mes, fim, valores = colunas[-1]
+    if fim > mes:
+        sn, dsn = soma(fim - mes + 1)
+        vpls = [c * s for c, s in zip(valores, sn)]
+        derivadas = [c * ds for c, ds in zip(valores, dsn)]
+    else:
+        vpls = list(valores)
+        derivadas = [0.0] * m
+    for inicio, fim, valores in reversed(colunas[:-1]):
+        salto = mes - inicio
+        if fim > inicio:
+            fg, dg = potencia(salto)
+            sn, dsn = soma(fim - inicio + 1)
+            derivadas = [d * p + v * q + c * ds
+                         for d, p, v, q, c, ds in zip(derivadas, fg, vpls, dg, valores, dsn)]
+            vpls = [v * p + c * s for v, p, c, s in zip(vpls, fg, valores, sn)]
+        elif salto == 1:
+            derivadas = [d * f + v for d, f, v in zip(derivadas, fatores, vpls)]
+            vpls = [v * f + c for v, f, c in zip(vpls, fatores, valores)]
+        else:
+            fg, dg = potencia(salto)
+            derivadas = [d * p + v * q for d, p, v, q in zip(derivadas, fg, vpls, dg)]
+            vpls = [v * p + c for v, p, c in zip(vpls, fg, valores)]
+        mes = inicio
+    if mes:
+        fg, dg = potencia(mes)
+        derivadas = [d * p + v * q for d, p, v, q in zip(derivadas, fg, vpls, dg)]
+        vpls = [v * p for v, p in zip(vpls, fg)]
+    return vpls, [-d * f * f for d, f in zip(derivadas, fatores)]
+
+
+def calcular_vpl_lote(fluxos: List[List[float]], taxa_mensal: float) -> List[float]:
+    """Calcula o VPL de vários fluxos mensais de uma vez, com os descontos de cada mês calculados uma vez"""
+    horizonte = max((len(f) for f in fluxos), default=0)
+    descontos = [(1 + taxa_mensal) ** -t for t in range(horizonte)]
+    return [sum(map(operator.mul, fluxo, descontos)) for fluxo in fluxos]
+
+
+def calcular_tir_lote(fluxos: List[List[float]], tolerancia: float = 1e-9,
+                      max_iteracoes: int = 100) -> List[Optional[float]]:
+    """
+    Calcula a TIR mensal de vários fluxos ao mesmo tempo
+
+    Cada iteração avalia VPL e derivada de todas as linhas ativas em uma
+    passada pelas colunas e avança todas juntas: o passo de Newton de cada
+    linha é aceito quando cai dentro do intervalo que contém a raiz, senão
+    ela faz um passo de bisseção. Uma máscara de convergência tira das
+    colunas as linhas que terminaram. Linhas sem troca de sinal no fluxo
+    (sem TIR definida) retornam None.
+    """
+    n = len(fluxos)
+    tirs: List[Optional[float]] = [None] * n
+    colunas = _colunas(fluxos)
+
+    # Saídas e entradas de cada linha com o mês médio de cada lado: sem troca
+    # de sinal não há TIR; com ela, (entradas/saídas)^(1/prazo) - 1 é o ponto
+    # de partida, perto da raiz para fluxos de aquisição, reforma e venda
+    saidas, meses_saidas = [0.0] * n, [0.0] * n
+    entradas, meses_entradas = [0.0] * n, [0.0] * n
+    for inicio, fim, valores in colunas:
+        meses = fim - inicio + 1
+        meio = (inicio + fim) / 2
+        saidas = [s - c * meses if c < 0 else s for s, c in zip(saidas, valores)]
+        meses_saidas = [t - c * meses * meio if c < 0 else t for t, c in zip(meses_saidas, valores)]
+        entradas = [e + c * meses if c > 0 else e for e, c in zip(entradas, valores)]
+        meses_entradas = [t + c * meses * meio if c > 0 else t for t, c in zip(meses_entradas, valores)]
+    linhas = [i for i, (s, e) in enumerate(zip(saidas, entradas)) if s > 0 and e > 0]
+    if not linhas:
+        return tirs
+    prazos = [meses_entradas[i] / entradas[i] - meses_saidas[i] / saidas[i] for i in linhas]
+    partidas = [(entradas[i] / saidas[i]) ** (1 / prazo) - 1 if prazo >= 1 else 0.01
+                for i, prazo in zip(linhas, prazos)]
+
+    # Posições k alinhadas com `linhas`: colunas, taxas e intervalos por linha ativa
+    if len(linhas) < n:
+        colunas = _filtrar_colunas(colunas, linhas)
+    m = len(linhas)
+    inferior = [-0.99] * m
+    superior = [1.0] * m
+
+    # Ajustar os intervalos para que contenham uma troca de sinal
+    vpl_inferior, _ = _vpl_e_derivada_lote(colunas, inferior)
+    vpl_superior, _ = _vpl_e_derivada_lote(colunas, superior)
+    for _ in range(10):
+        fora = [k for k in range(m) if vpl_superior[k] * vpl_inferior[k] > 0]
+        if not fora:
+            break
+        for k in fora:
+            superior[k] *= 2
+        vpls, _ = _vpl_e_derivada_lote(_filtrar_colunas(colunas, fora), [superior[k] for k in fora])
+        for k, vpl in zip(fora, vpls):
+            vpl_superior[k] = vpl
+    validos = [k for k in range(m) if vpl_superior[k] * vpl_inferior[k] <= 0]
+
+    linhas = [linhas[k] for k in validos]
+    colunas = _filtrar_colunas(colunas, validos) if len(validos) < m else colunas
+    inferior = [inferior[k] for k in validos]
+    superior = [superior[k] for k in validos]
+    sinal_inferior = [vpl_inferior[k] > 0 for k in validos]
+    taxas = [min(max(partidas[k], inf), sup) for k, inf, sup in zip(validos, inferior, superior)]
+
+    for _ in range(max_iteracoes):
+        if not linhas:
+            break
+        vpls, derivadas = _vpl_e_derivada_lote(colunas, taxas)
+
+        # Estreitar os intervalos mantendo a troca de sinal
+        abaixo = [(vpl > 0) == sinal for vpl, sinal in zip(vpls, sinal_inferior)]
+        inferior = [taxa if a else inf for taxa, a, inf in zip(taxas, abaixo, inferior)]
+        superior = [sup if a else taxa for taxa, a, sup in zip(taxas, abaixo, superior)]
+
+        # Passo de Newton, ou bisseção quando ele sai do intervalo
+        novas = [taxa - vpl / derivada if derivada else taxa
+                 for taxa, vpl, derivada in zip(taxas, vpls, derivadas)]
+        novas = [nova if inf < nova < sup else (inf + sup) / 2
+                 for nova, inf, sup in zip(novas, inferior, superior)]
+
+        # Máscara de convergência: linhas convergidas saem das colunas
+        convergidas = [-tolerancia < vpl < tolerancia or -tolerancia < nova - taxa < tolerancia
+                       for vpl, nova, taxa in zip(vpls, novas, taxas)]
+        if any(convergidas):
+            continuam = []
+            for k, convergida in enumerate(convergidas):
+                if not convergida:
+                    continuam.append(k)
+                else:
+                    tirs[linhas[k]] = taxas[k] if abs(vpls[k]) < tolerancia else novas[k]
+            linhas = [linhas[k] for k in continuam]
+            colunas = _filtrar_colunas(colunas, continuam)
+            novas = [novas[k] for k in continuam]
+            inferior = [inferior[k] for k in continuam]
+            superior = [superior[k] for k in continuam]
+            sinal_inferior = [sinal_inferior[k] for k in continuam]
+        taxas = novas
+
+    # Linhas que não convergiram ficam com a melhor aproximação
+    for i, taxa in zip(linhas, taxas):
+        tirs[i] = taxa
+
+    return tirs
+
+
+class FluxoCaixaService:
+    def __init__(self, parametros: ParametrosGlobais = None):
+        self.parametros = parametros or ParametrosGlobais()
+
+    def _data_base(self, imovel: Imovel) -> date:
+        """Data de aquisição usada como mês zero do fluxo"""
+        valor = imovel.data_criacao
+        if isinstance(valor, datetime):
+            return valor.date()
+        if isinstance(valor, date):
+            return valor
+        if isinstance(valor, str) and valor:
+            try:
+                return datetime.fromisoformat(valor).date()
+            except ValueError:
+                pass
+        return date.today()
+
+    def gerar_fluxo_mensal(self, imovel: Imovel, preco_venda: float) -> List[float]:
+        """Gera o fluxo mensal de um imóvel (mês 0 = aquisição, último mês = venda)"""
+        return self.gerar_fluxo(imovel.custo_aquisicao, imovel.custos_transacao,
+                                imovel.custos_reforma, preco_venda)
+
+    def gerar_fluxo(self, custo_aquisicao: float, custos_transacao: float,
+                    custos_reforma: float, preco_venda: float) -> List[float]:
+        """Fluxo mensal a partir dos custos e do preço de venda, sem um Imovel"""
+        prazo_reforma = max(int(self.parametros.prazo_reforma_meses), 0)
+        prazo_venda = max(int(self.parametros.prazo_venda_meses), prazo_reforma, 1)
+
+        fluxo = [0.0] * (prazo_venda + 1)
+        fluxo[0] -= (custo_aquisicao or 0.0) + (custos_transacao or 0.0)
+
+        # Reforma distribuída igualmente nos meses seguintes à aquisição
+        custos_reforma = custos_reforma or 0.0
+        if prazo_reforma > 0:
+            parcela = custos_reforma / prazo_reforma
+            for mes in range(1, prazo_reforma + 1):
+                fluxo[mes] -= parcela
+        else:
+            fluxo[0] -= custos_reforma
+
+        fluxo[prazo_venda] += preco_venda
+        return fluxo
+
+    def gerar_fluxos_datados(self, imovel: Imovel, preco_venda: float) -> List[Dict[str, Any]]:
+        """Retorna os lançamentos do fluxo de caixa com data e descrição"""
+        fluxo = self.gerar_fluxo_mensal(imovel, preco_venda)
+        data_base = self._data_base(imovel)
+        prazo_reforma = max(int(self.parametros.prazo_reforma_meses), 0)
+        ultimo_mes = len(fluxo) - 1
+
+        lancamentos = []
+        for mes, valor in enumerate(fluxo):
+            if not valor:
+                continue
+            if mes == 0:
+                descricao = "Aquisição e custos de transação"
+            elif mes == ultimo_mes:
+                descricao = "Venda" if mes > prazo_reforma else "Reforma e venda"
+            else:
+                descricao = "Reforma"
+            lancamentos.append({
+                'mes': mes,
+                'data': adicionar_meses(data_base, mes),
+                'valor': valor,
+                'descricao': descricao
+            })
+        return lancamentos
+
+    def calcular_payback_lote(self, fluxos: List[List[float]]) -> List[float]:
+        """Primeiro mês em que o fluxo acumulado deixa de ser negativo"""
+        paybacks = []
+        for fluxo in fluxos:
+            acumulado = 0.0
+            payback = float('inf')
+            for mes, valor in enumerate(fluxo):
+                acumulado += valor
+                if acumulado >= 0 and mes > 0:
+                    payback = float(mes)
+                    break
+            paybacks.append(payback)
+        return paybacks
+
+    def calcular_indicadores_lote(self, imoveis: List[Imovel],
+                                  precos_venda: List[float]) -> List[Dict[str, Any]]:
+        """Calcula VPL, TIR e payback para todo o portfólio de uma vez"""
+        try:
+            fluxos = [
+                self.gerar_fluxo_mensal(imovel, preco)
+                for imovel, preco in zip(imoveis, precos_venda)
+            ]
+            return self._indicadores_dos_fluxos(fluxos)
+
+        except Exception as e:
+            logging.error(f"Erro ao calcular fluxo de caixa do portfólio: {e}")
+            return [self._indicadores_padrao() for _ in imoveis]
+
+    def calcular_indicadores_colunas(self, custos_aquisicao: List[float], custos_transacao: List[float],
+                                     custos_reforma: List[float],
+                                     precos_venda: List[float]) -> List[Dict[str, Any]]:
+        """VPL, TIR e payback a partir de colunas de custos e preços, sem objetos Imovel"""
+        try:
+            fluxos = [
+                self.gerar_fluxo(aquisicao, transacao, reforma, preco)
+                for aquisicao, transacao, reforma, preco
+                in zip(custos_aquisicao, custos_transacao, custos_reforma, precos_venda)
+            ]
+            return self._indicadores_dos_fluxos(fluxos)
+
+        except Exception as e:
+            logging.error(f"Erro ao calcular fluxo de caixa do portfólio: {e}")
+            return [self._indicadores_padrao() for _ in precos_venda]
+
+    def _indicadores_dos_fluxos(self, fluxos: List[List[float]]) -> List[Dict[str, Any]]:
+        """VPL, TIR e payback de vários fluxos em uma única rodada do solver"""
+        taxa_mensal = taxa_anual_para_mensal(self.parametros.taxa_desconto_anual)
+        vpls = calcular_vpl_lote(fluxos, taxa_mensal)
+        tirs = calcular_tir_lote(fluxos)
+        paybacks = self.calcular_payback_lote(fluxos)
+
+        resultados = []
+        for vpl, tir, payback in zip(vpls, tirs, paybacks):
+            resultados.append({
+                'vpl': vpl,
+                'tir_mensal': tir,
+                'tir_anual': ((1 + tir) ** 12 - 1) * 100 if tir is not None else None,
+                'payback_meses': payback
+            })
+        return resultados
+
+    @staticmethod
+    def _indicadores_padrao() -> Dict[str, Any]:
+        return {'vpl': 0.0, 'tir_mensal': None, 'tir_anual': None, 'payback_meses': float('inf')}
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serviço de histórico de preços: série temporal somente de inserção com
+consultas por instante, por intervalo, reamostragem e projeção por cidade
+"""
+
+import math
+import sqlite3
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from models.imovel import Imovel
+from models.database import DatabaseManager
+
+# Prefixo do timestamp ISO que define cada período de reamostragem
+_PERIODOS = {
+    'ano': 4,    # AAAA
+    'mes': 7,    # AAAA-MM
+    'dia': 10,   # AAAA-MM-DD
+    'hora': 13,  # AAAA-MM-DD HH
+}
+
+
+# Soma os pontos novos ao agregado diário de cada cidade (imoveis_historico_diario)
+_ACUMULAR_DIA = """
+    INSERT INTO imoveis_historico_diario
+    (cidade, dia, pontos, soma_preco, minimo_preco, maximo_preco, soma_custo, soma_metragem)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (cidade, dia) DO UPDATE SET
+        pontos = pontos + excluded.pontos,
+        soma_preco = soma_preco + excluded.soma_preco,
+        minimo_preco = MIN(minimo_preco, excluded.minimo_preco),
+        maximo_preco = MAX(maximo_preco, excluded.maximo_preco),
+        soma_custo = soma_custo + excluded.soma_custo,
+        soma_metragem = soma_metragem + excluded.soma_metragem
+"""
+
+
+def _formatar_instante(instante) -> str:
+    """Normaliza datas para o formato ISO usado na tabela (ordenável como texto)"""
+    if instante is None:
+        instante = datetime.now()
+    if isinstance(instante, datetime):
+        return instante.strftime('%Y-%m-%d %H:%M:%S.%f')
+    return str(instante)
+
+
+def _dia_inicial(inicio) -> Optional[str]:
+    """Dia em que começa um intervalo, ou None se o início cortar o dia ao meio"""
+    if inicio is None:
+        return ''
+    texto = _formatar_instante(inicio)
+    return texto[:10] if not texto[10:].strip(' T:.0') else None
+
+
+def _agregar_por_dia(linhas: List[tuple]) -> List[tuple]:
+    """Pontos do histórico resumidos por (cidade, dia) no formato de _ACUMULAR_DIA"""
+    dias: Dict[tuple, list] = {}
+    for _, registrado_em, cidade, metragem, preco, custo, _ in linhas:
+        chave = (cidade, registrado_em[:10])
+        dia = dias.get(chave)
+        if dia is None:
+            dias[chave] = [1, preco, preco, preco, custo, metragem]
+        else:
+            dia[0] += 1
+            dia[1] += preco
+            dia[2] = min(dia[2], preco)
+            dia[3] = max(dia[3], preco)
+            dia[4] += custo
+            dia[5] += metragem
+    return [chave + tuple(valores) for chave, valores in dias.items()]
+
+
+class HistoricoService:
+    def __init__(self, db_manager: DatabaseManager = None, calculo_service=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.calculo_service = calculo_service
+
+    def _get_calculo_service(self):
+        if self.calculo_service is None:
+            from services.calculo_service import get_calculo_service
+            self.calculo_service = get_calculo_service(self.db_manager)
+        return self.calculo_service
+
+    def _linha(self, imovel: Imovel, calculos: Dict[str, Any], registrado_em: str) -> tuple:
+        return (
+            imovel.id, registrado_em, imovel.cidade, imovel.metragem,
+            calculos['preco_venda_estimado'], calculos['custo_total'], imovel.status
+        )
+
+    def registrar(self, imovel: Imovel, calculos: Dict[str, Any] = None, registrado_em=None) -> int:
+        """Acrescenta um ponto ao histórico do imóvel"""
+        return self.registrar_lote([imovel], [calculos] if calculos else None, registrado_em)
+
+    def registrar_lote(self, imoveis: List[Imovel], calculos: List[Dict[str, Any]] = None,
+                       registrado_em=None) -> int:
+        """
+        Acrescenta um ponto para cada imóvel em uma única transação
+
+        O histórico é somente de inserção: um imóvel que já tem ponto no mesmo
+        instante mantém o ponto existente e o conflito vai para o log.
+        Retorna quantos pontos foram gravados.
+        """
+        imoveis = [imovel for imovel in imoveis if imovel.id is not None]
+        if not imoveis:
+            return 0
+        try:
+            if calculos is None:
+                calculo_service = self._get_calculo_service()
+                calculos = [calculo_service.calcular_valores_base(imovel) for imovel in imoveis]
+            instante = _formatar_instante(registrado_em)
+            query = """
+                INSERT INTO imoveis_historico
+                (imovel_id, registrado_em, cidade, metragem, preco_estimado, custo_total, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """
+            linhas = [self._linha(i, c, instante) for i, c in zip(imoveis, calculos)]
+            with self.db_manager.get_connection() as conn:
+                try:
+                    conn.executemany(query, linhas)
+                    gravadas = linhas
+                except sqlite3.IntegrityError:
+                    # Desfaz o lote e grava linha a linha para separar os conflitos
+                    conn.rollback()
+                    gravadas, conflitos = [], []
+                    for linha in linhas:
+                        try:
+                            conn.execute(query, linha)
+                            gravadas.append(linha)
+                        except sqlite3.IntegrityError:
+                            conflitos.append(linha[0])
+                    logging.warning(f"Histórico já tem ponto em {instante} para os imóveis {conflitos}; "
+                                    f"pontos existentes mantidos")
+                # Mesma transação: o agregado diário nunca diverge dos pontos
+                conn.executemany(_ACUMULAR_DIA, _agregar_por_dia(gravadas))
+            return len(gravadas)
+        except Exception as e:
+            logging.error(f"Erro ao registrar histórico de preços: {e}")
+            return 0
+
+    def consultar_intervalo(self, imovel_id: int, inicio=None, fim=None) -> List[Dict[str, Any]]:
+        """Retorna os pontos de um imóvel entre dois instantes (inclusive)"""
+        query = """
+            SELECT registrado_em, preco_estimado, custo_total, status
+            FROM imoveis_historico
+            WHERE imovel_id = ? AND registrado_em >= ? AND registrado_em <= ?
+            ORDER BY registrado_em
+        """
+        params = (imovel_id, _formatar_instante(inicio) if inicio else '', _formatar_instante(fim))
+        try:
+            return [
+                {'registrado_em': r[0], 'preco_estimado': r[1], 'custo_total': r[2], 'status': r[3]}
+                for r in self.db_manager.execute_query(query, params)
+            ]
+        except Exception as e:
+            logging.error(f"Erro ao consultar histórico do imóvel {imovel_id}: {e}")
+            return []
+
+    def valor_em(self, imovel_id: int, instante) -> Optional[Dict[str, Any]]:
+        """Retorna o último ponto registrado até o instante informado"""
+        query = """
+            SELECT registrado_em, preco_estimado, custo_total, status
+            FROM imoveis_historico
+            WHERE imovel_id = ? AND registrado_em <= ?
+            ORDER BY registrado_em DESC
+            LIMIT 1
+        """
+        try:
+            results = self.db_manager.execute_query(query, (imovel_id, _formatar_instante(instante)))
+            if results:
+                r = results[0]
+                return {'registrado_em': r[0], 'preco_estimado': r[1], 'custo_total': r[2], 'status': r[3]}
+            return None
+        except Exception as e:
+            logging.error(f"Erro ao consultar histórico do imóvel {imovel_id}: {e}")
+            return None
+
+    def portfolio_em(self, instante) -> List[Dict[str, Any]]:
+        """Retorna o estado de cada imóvel no instante informado"""
+        # Varredura com saltos pela chave (imovel_id, registrado_em): a CTE pula
+        # de um imóvel para o próximo e, para cada um, o último ponto até o
+        # instante é uma busca no índice. Custa O(imóveis · log n), não O(pontos)
+        query = """
+            WITH RECURSIVE imovel(id) AS (
+                SELECT MIN(imovel_id) FROM imoveis_historico
+                UNION ALL
+                SELECT (SELECT MIN(imovel_id) FROM imoveis_historico WHERE imovel_id > imovel.id)
+                FROM imovel
+                WHERE imovel.id IS NOT NULL
+            )
+            SELECT h.imovel_id, h.registrado_em, h.cidade, h.preco_estimado, h.custo_total, h.status
+            FROM imovel
+            JOIN imoveis_historico h ON h.imovel_id = imovel.id AND h.registrado_em = (
+                SELECT MAX(registrado_em) FROM imoveis_historico
+                WHERE imovel_id = imovel.id AND registrado_em <= :instante
+            )
+            ORDER BY h.imovel_id
+        """
+        try:
+            return [
+                {'imovel_id': r[0], 'registrado_em': r[1], 'cidade': r[2],
+                 'preco_estimado': r[3], 'custo_total': r[4], 'status': r[5]}
+                for r in self.db_manager.execute_query(query, {'instante': _formatar_instante(instante)})
+            ]
+        except Exception as e:
+            logging.error(f"Erro ao consultar portfólio histórico: {e}")
+            return []
+
+    def reamostrar(self, periodo: str = 'mes', imovel_id: int = None, cidade: str = None,
+                   inicio=None, fim=None) -> List[Dict[str, Any]]:
+        """
+        Agrega o histórico por período (ano, mes, dia ou hora) direto no banco
+
+        Sem imóvel, em períodos de um dia ou mais e com o intervalo começando
+        no início de um dia e indo até hoje, lê o agregado diário por cidade;
+        nos demais casos lê os pontos pelos índices de imóvel ou de cidade.
+        """
+        if periodo not in _PERIODOS:
+            raise ValueError(f"Período deve ser um de: {', '.join(_PERIODOS)}")
+        tamanho = _PERIODOS[periodo]
+
+        dia_inicial = _dia_inicial(inicio)
+        if imovel_id is None and periodo != 'hora' and fim is None and dia_inicial is not None:
+            return self._reamostrar_diario(tamanho, cidade, dia_inicial)
+
+        condicoes = ["registrado_em >= ?", "registrado_em <= ?"]
+        params = [_formatar_instante(inicio) if inicio else '', _formatar_instante(fim)]
+        if imovel_id is not None:
+            condicoes.insert(0, "imovel_id = ?")
+            params.insert(0, imovel_id)
+        elif cidade is not None:
+            condicoes.insert(0, "cidade = ?")
+            params.insert(0, cidade)
+
+        query = f"""
+            SELECT substr(registrado_em, 1, {tamanho}) AS periodo,
+                   COUNT(*), AVG(preco_estimado), MIN(preco_estimado), MAX(preco_estimado),
+                   AVG(custo_total), SUM(preco_estimado) / SUM(metragem)
+            FROM imoveis_historico
+            WHERE {' AND '.join(condicoes)}
+            GROUP BY periodo
+            ORDER BY periodo
+        """
+        try:
+            return [
+                {'periodo': r[0], 'pontos': r[1], 'preco_medio': r[2], 'preco_minimo': r[3],
+                 'preco_maximo': r[4], 'custo_medio': r[5], 'preco_m2': r[6]}
+                for r in self.db_manager.execute_query(query, tuple(params))
+            ]
+        except Exception as e:
+            logging.error(f"Erro ao reamostrar histórico: {e}")
+            return []
+
+    def _reamostrar_diario(self, tamanho: int, cidade: Optional[str], dia_inicial: str) -> List[Dict[str, Any]]:
+        """Reamostragem a partir do agregado diário (imoveis_historico_diario)"""
+        condicoes = ["dia >= ?", "dia <= ?"]
+        params = [dia_inicial, datetime.now().strftime('%Y-%m-%d')]
+        if cidade is not None:
+            condicoes.insert(0, "cidade = ?")
+            params.insert(0, cidade)
+
+        query = f"""
+            SELECT substr(dia, 1, {tamanho}) AS periodo,
+                   SUM(pontos), SUM(soma_preco) / SUM(pontos), MIN(minimo_preco), MAX(maximo_preco),
+                   SUM(soma_custo) / SUM(pontos), SUM(soma_preco) / SUM(soma_metragem)
+            FROM imoveis_historico_diario
+            WHERE {' AND '.join(condicoes)}
+            GROUP BY periodo
+            ORDER BY periodo
+        """
+        try:
+            return [
+                {'periodo': r[0], 'pontos': r[1], 'preco_medio': r[2], 'preco_minimo': r[3],
+                 'preco_maximo': r[4], 'custo_medio': r[5], 'preco_m2': r[6]}
+                for r in self.db_manager.execute_query(query, tuple(params))
+            ]
+        except Exception as e:
+            logging.error(f"Erro ao reamostrar histórico: {e}")
+            return []
+
+    def projetar_valorizacao(self, meses: int = 12, cidade: str = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Projeta a valorização do preço por m² de cada cidade
+
+        Usa a série mensal de preço/m² e ajusta uma reta ao logaritmo dos
+        valores (crescimento composto). Cidades com menos de dois meses de
+        histórico ficam sem projeção.
+        """
+        condicao = "WHERE cidade = ?" if cidade else ""
+        query = f"""
+            SELECT cidade, substr(dia, 1, 7) AS mes, SUM(soma_preco) / SUM(soma_metragem)
+            FROM imoveis_historico_diario
+            {condicao}
+            GROUP BY cidade, mes
+            ORDER BY cidade, mes
+        """
+        try:
+            results = self.db_manager.execute_query(query, (cidade,) if cidade else None)
+        except Exception as e:
+            logging.error(f"Erro ao projetar valorização: {e}")
+            return {}
+
+        series: Dict[str, List[tuple]] = {}
+        for nome, mes, preco_m2 in results:
+            if preco_m2 and preco_m2 > 0:
+                ano, numero_mes = mes.split('-')
+                series.setdefault(nome, []).append((int(ano) * 12 + int(numero_mes), preco_m2))
+
+        projecoes = {}
+        for nome, pontos in series.items():
+            if len(pontos) < 2:
+                continue
+            xs = [p[0] for p in pontos]
+            ys = [math.log(p[1]) for p in pontos]
+            media_x = sum(xs) / len(xs)
+            media_y = sum(ys) / len(ys)
+            variancia = sum((x - media_x) ** 2 for x in xs)
+            if not variancia:
+                continue
+            inclinacao = sum((x - media_x) * (y - media_y) for x, y in zip(xs, ys)) / variancia
+            preco_atual = pontos[-1][1]
+            projecoes[nome] = {
+                'meses_historico': len(pontos),
+                'preco_m2_atual': preco_atual,
+                'valorizacao_anual': (math.exp(inclinacao * 12) - 1) * 100,
+                'preco_m2_projetado': preco_atual * math.exp(inclinacao * meses),
+            }
+        return projecoes
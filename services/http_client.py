@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Infraestrutura para chamadas HTTP externas (API do IBGE)
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class LimitadorTaxa:
+    """
+    Balde de fichas (token bucket) compartilhado entre threads
+
+    Libera até `taxa` requisições por segundo em regime, permitindo rajadas
+    de até `capacidade` requisições quando o balde está cheio.
+    """
+
+    def __init__(self, taxa: float, capacidade: int = None):
+        if taxa <= 0:
+            raise ValueError("A taxa deve ser maior que zero")
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade or max(1, int(taxa)))
+        self._fichas = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self, timeout: float = None) -> bool:
+        """Bloqueia até haver uma ficha disponível; retorna False se o timeout expirar"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return True
+                espera = (1 - self._fichas) / self.taxa
+            if limite is not None:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                espera = min(espera, restante)
+            time.sleep(espera)
+
+
+class CircuitoAbertoError(requests.ConnectionError):
+    """Chamada recusada sem tocar a rede porque o serviço está marcado como indisponível"""
+
+
+class DisjuntorCircuito:
+    """
+    Disjuntor (circuit breaker) para um serviço externo
+
+    Fechado: as chamadas passam e falhas consecutivas são contadas. Ao atingir
+    `limite_falhas` o circuito abre e recusa chamadas até o fim da espera, que
+    dobra (até `espera_maxima`) a cada nova abertura seguida. Passada a espera,
+    fica meio-aberto: uma única chamada de teste decide se fecha ou reabre.
+    """
+
+    FECHADO = 'fechado'
+    ABERTO = 'aberto'
+    MEIO_ABERTO = 'meio_aberto'
+
+    def __init__(self, limite_falhas: int = 3, espera_inicial: float = 5.0,
+                 espera_maxima: float = 300.0, fator: float = 2.0,
+                 relogio: Callable[[], float] = time.monotonic):
+        self.limite_falhas = max(1, limite_falhas)
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.fator = fator
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self.estado = self.FECHADO
+        self.falhas_consecutivas = 0
+        self._espera = espera_inicial
+        self._reabrir_em = 0.0
+        self._teste_em_andamento = False
+        self.aberturas = 0
+        self.recuperacoes = 0
+        self.chamadas_bloqueadas = 0
+
+    def permitir(self) -> bool:
+        """Informa se uma chamada pode ir à rede agora"""
+        with self._lock:
+            if self.estado == self.ABERTO and self._relogio() >= self._reabrir_em:
+                self.estado = self.MEIO_ABERTO
+                self._teste_em_andamento = False
+            if self.estado == self.FECHADO:
+                return True
+            if self.estado == self.MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            self.chamadas_bloqueadas += 1
+            return False
+
+    def registrar_sucesso(self):
+        with self._lock:
+            if self.estado != self.FECHADO:
+                self.recuperacoes += 1
+                logging.info("Serviço externo respondeu novamente; circuito fechado")
+            self.estado = self.FECHADO
+            self.falhas_consecutivas = 0
+            self._espera = self.espera_inicial
+            self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas_consecutivas += 1
+            if self.estado == self.MEIO_ABERTO:
+                # Teste falhou: reabrir com espera maior (backoff exponencial)
+                self._espera = min(self._espera * self.fator, self.espera_maxima)
+                self._abrir()
+            elif self.estado == self.FECHADO and self.falhas_consecutivas >= self.limite_falhas:
+                self._abrir()
+
+    def _abrir(self):
+        self.estado = self.ABERTO
+        self.aberturas += 1
+        self._reabrir_em = self._relogio() + self._espera
+        self._teste_em_andamento = False
+        logging.warning(f"Serviço externo indisponível; novas chamadas recusadas por {self._espera:.0f}s")
+
+    def metricas(self) -> Dict[str, Any]:
+        """Estado atual e contadores de aberturas e recuperações"""
+        with self._lock:
+            return {
+                'estado': self.estado,
+                'falhas_consecutivas': self.falhas_consecutivas,
+                'aberturas': self.aberturas,
+                'recuperacoes': self.recuperacoes,
+                'chamadas_bloqueadas': self.chamadas_bloqueadas,
+                'espera_atual': self._espera,
+                'segundos_para_teste': max(0.0, self._reabrir_em - self._relogio())
+                if self.estado == self.ABERTO else 0.0,
+            }
+
+
+# Um disjuntor por host, compartilhado por todos os clientes do processo
+_disjuntores: Dict[str, DisjuntorCircuito] = {}
+_disjuntores_lock = threading.Lock()
+
+
+def get_disjuntor(host: str) -> DisjuntorCircuito:
+    """Retorna o disjuntor compartilhado de um host"""
+    with _disjuntores_lock:
+        if host not in _disjuntores:
+            _disjuntores[host] = DisjuntorCircuito()
+        return _disjuntores[host]
+
+
+class RespostaHTTP(NamedTuple):
+    dados: Any
+    nao_modificado: bool  # True quando o servidor respondeu 304 e o cache foi usado
+    versao: Optional[str] = None  # ETag ou Last-Modified do recurso, quando informados
+
+
+class ClienteHTTP:
+    """
+    Cliente HTTP reaproveitável: sessão com pool de conexões, compressão e
+    requisições condicionais (ETag / Last-Modified) com cache em disco
+
+    Cada URL vira um arquivo JSON no diretório de cache com o corpo e os
+    validadores da última resposta; uma resposta 304 devolve o corpo salvo.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, pool_maxsize: int = 10,
+                 timeout: float = 10.0, disjuntor: DisjuntorCircuito = None):
+        self.cache_dir = cache_dir
+        self._disjuntor = disjuntor
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(1, pool_maxsize))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+        })
+        self.estatisticas = {'requisicoes': 0, 'nao_modificados': 0, 'bytes_recebidos': 0}
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _caminho_cache(self, url: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _ler_cache(self, url: str) -> Optional[Dict[str, Any]]:
+        caminho = self._caminho_cache(url)
+        if not caminho or not os.path.exists(caminho):
+            return None
+        try:
+            with open(caminho, 'r', encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Cache HTTP ilegível para {url}: {e}")
+            return None
+
+    def _gravar_cache(self, url: str, entrada: Dict[str, Any]):
+        caminho = self._caminho_cache(url)
+        if not caminho:
+            return
+        # Escrita atômica: outra thread nunca lê um arquivo pela metade
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                json.dump(entrada, arquivo, ensure_ascii=False)
+            os.replace(temporario, caminho)
+        except OSError as e:
+            logging.warning(f"Não foi possível gravar cache HTTP de {url}: {e}")
+
+    def disjuntor(self, url: str) -> DisjuntorCircuito:
+        """Disjuntor que protege as chamadas para o host da URL"""
+        return self._disjuntor or get_disjuntor(urlsplit(url).netloc)
+
+    def online(self, url: str, timeout: float = 1.0) -> bool:
+        """
+        Sonda rápida de conectividade: resolve o host e abre uma conexão TCP
+
+        Sem rede, falha em milissegundos (ou no timeout curto) em vez de
+        esperar o timeout completo de uma requisição HTTP.
+        """
+        disjuntor = self.disjuntor(url)
+        if not disjuntor.permitir():
+            return False
+        partes = urlsplit(url)
+        porta = partes.port or (443 if partes.scheme == 'https' else 80)
+        try:
+            with socket.create_connection((partes.hostname, porta), timeout=timeout):
+                pass
+            disjuntor.registrar_sucesso()
+            return True
+        except OSError as e:
+            logging.warning(f"Sem conexão com {partes.hostname}: {e}")
+            disjuntor.registrar_falha()
+            return False
+
+    def get_json(self, url: str, timeout: float = None) -> RespostaHTTP:
+        """Busca um recurso JSON, revalidando a cópia em cache quando houver"""
+        disjuntor = self.disjuntor(url)
+        if not disjuntor.permitir():
+            raise CircuitoAbertoError(f"Circuito aberto para {urlsplit(url).netloc}")
+
+        entrada = self._ler_cache(url)
+        headers = {}
+        if entrada:
+            if entrada.get('etag'):
+                headers['If-None-Match'] = entrada['etag']
+            if entrada.get('last_modified'):
+                headers['If-Modified-Since'] = entrada['last_modified']
+
+        # Toda chamada liberada registra sucesso ou falha, inclusive a de teste do
+        # meio-aberto: sem isso o disjuntor ficaria esperando um teste que não volta
+        sucesso = False
+        try:
+            response = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+            with self._lock:
+                self.estatisticas['requisicoes'] += 1
+                self.estatisticas['bytes_recebidos'] += len(response.content)
+
+            if response.status_code == 304 and entrada:
+                with self._lock:
+                    self.estatisticas['nao_modificados'] += 1
+                sucesso = True
+                return RespostaHTTP(entrada['dados'], True, entrada.get('etag') or entrada.get('last_modified'))
+
+            response.raise_for_status()
+            dados = response.json()
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                self._gravar_cache(url, {'etag': etag, 'last_modified': last_modified, 'dados': dados})
+            sucesso = True
+            return RespostaHTTP(dados, False, etag or last_modified)
+        except requests.HTTPError as e:
+            # Erros do servidor contam como indisponibilidade; 4xx são respostas válidas
+            sucesso = e.response is not None and e.response.status_code < 500
+            raise
+        finally:
+            if sucesso:
+                disjuntor.registrar_sucesso()
+            else:
+                disjuntor.registrar_falha()
+
+    def fechar(self):
+        """Encerra as conexões mantidas pela sessão"""
+        self.session.close()
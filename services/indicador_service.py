@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serviço de indicadores personalizados: fórmulas seguras sobre campos do imóvel
+e resultados de cálculo, compiladas uma vez e avaliadas coluna a coluna
+"""
+
+import ast
+import math
+import operator
+import logging
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Callable
+from models.imovel import Imovel
+from models.database import DatabaseManager
+from utils.formatacao import formatar_moeda, formatar_percentual
+
+# Campos disponíveis nas fórmulas
+CAMPOS_IMOVEL = [
+    'id', 'cidade', 'estado', 'cep', 'latitude', 'longitude', 'metragem',
+    'quartos', 'banheiros', 'ano', 'padrao_acabamento', 'custo_aquisicao',
+    'custos_reforma', 'custos_transacao', 'percentual_lucro_credor', 'status'
+]
+CAMPOS_CALCULO = [
+    'preco_venda_estimado', 'custo_total', 'lucro_credor', 'lucro_investidor',
+    'preco_minimo', 'margem', 'roi', 'vpl', 'tir_anual', 'payback_meses'
+]
+CAMPOS_DISPONIVEIS = set(CAMPOS_IMOVEL) | set(CAMPOS_CALCULO)
+# Campos de texto: valem em comparações, nunca como operandos de contas
+CAMPOS_TEXTO = {'cidade', 'estado', 'cep', 'padrao_acabamento', 'status'}
+
+# Maior módulo aceito em operandos e resultados de contas; acima disso (ou
+# não finito) o valor vira ausente, sem inteiros gigantes nem estouro
+LIMITE_VALOR = 1e15
+
+FORMATOS = ['numero', 'moeda', 'percentual']
+
+
+def _dividir(a, b):
+    """Divisão que retorna None em vez de erro quando o divisor é zero"""
+    return a / b if b else None
+
+
+def _numero(valor) -> Optional[float]:
+    """Operando de conta como float; textos, não finitos e valores fora do limite viram None"""
+    if not isinstance(valor, (int, float)):
+        return None
+    try:
+        valor = float(valor)
+    except OverflowError:
+        return None
+    return valor if math.isfinite(valor) and -LIMITE_VALOR <= valor <= LIMITE_VALOR else None
+
+
+def _aritmetica(funcao):
+    """Restringe uma operação a números em float dentro do limite, também no resultado"""
+    def aplicar(*valores):
+        numeros = [_numero(valor) for valor in valores]
+        if None in numeros:
+            return None
+        return _numero(funcao(*numeros))
+    return aplicar
+
+
+_OPERADORES_BINARIOS = {
+    ast.Add: _aritmetica(operator.add),
+    ast.Sub: _aritmetica(operator.sub),
+    ast.Mult: _aritmetica(operator.mul),
+    ast.Div: _aritmetica(_dividir),
+    ast.Mod: _aritmetica(lambda a, b: a % b if b else None),
+    ast.Pow: _aritmetica(lambda a, b: a ** b if abs(b) <= 10 else None),
+}
+
+_OPERADORES_UNARIOS = {
+    ast.USub: _aritmetica(operator.neg),
+    ast.UAdd: _aritmetica(operator.pos),
+    ast.Not: operator.not_,
+}
+
+_COMPARADORES = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+_FUNCOES = {
+    'abs': _aritmetica(abs),
+    'min': min,
+    'max': max,
+    'round': _aritmetica(lambda valor, casas=0: round(valor, int(casas))),
+}
+
+# Cada nó compilado recebe as colunas e o número de linhas e devolve uma lista
+Avaliador = Callable[[Dict[str, List[Any]], int], List[Any]]
+
+
+def _aplicar(funcao, *colunas):
+    """Aplica uma função elemento a elemento, propagando valores ausentes"""
+    resultado = []
+    for valores in zip(*colunas):
+        if any(v is None for v in valores):
+            resultado.append(None)
+        else:
+            try:
+                resultado.append(funcao(*valores))
+            except (TypeError, ValueError, OverflowError, ZeroDivisionError):
+                resultado.append(None)
+    return resultado
+
+
+class FormulaCompilada:
+    def __init__(self, expressao: str, avaliador: Avaliador, campos: set):
+        self.expressao = expressao
+        self.campos = campos
+        self._avaliador = avaliador
+
+    def avaliar(self, colunas: Dict[str, List[Any]]) -> List[Any]:
+        """Avalia a fórmula para todas as linhas das colunas de uma vez"""
+        n = len(next(iter(colunas.values()), []))
+        return self._avaliador(colunas, n)
+
+    def filtrar(self, colunas: Dict[str, List[Any]]) -> List[bool]:
+        """Avalia a fórmula como condição, tratando valores ausentes como falso"""
+        return [bool(valor) for valor in self.avaliar(colunas)]
+
+    def __repr__(self) -> str:
+        return f"<FormulaCompilada('{self.expressao}')>"
+
+
+class _Compilador:
+    def __init__(self):
+        self.campos = set()
+
+    def compilar(self, no: ast.AST) -> Avaliador:
+        metodo = getattr(self, f"_compilar_{type(no).__name__}", None)
+        if metodo is None:
+            raise ValueError(f"Construção não permitida na fórmula: {type(no).__name__}")
+        return metodo(no)
+
+    def _compilar_Expression(self, no):
+        return self.compilar(no.body)
+
+    def _compilar_Constant(self, no):
+        if not isinstance(no.value, (int, float, str, bool)) and no.value is not None:
+            raise ValueError(f"Constante não permitida: {no.value!r}")
+        valor = no.value
+        return lambda colunas, n: [valor] * n
+
+    def _compilar_Name(self, no):
+        if no.id not in CAMPOS_DISPONIVEIS:
+            raise ValueError(f"Campo desconhecido na fórmula: {no.id}")
+        self.campos.add(no.id)
+        nome = no.id
+
+        def avaliar(colunas, n):
+            coluna = colunas.get(nome)
+            return coluna if coluna is not None else [None] * n
+        return avaliar
+
+    @staticmethod
+    def _exigir_numero(no):
+        """Rejeita na compilação textos (constantes ou campos de texto) usados em contas"""
+        if isinstance(no, ast.Constant) and isinstance(no.value, str) \
+                or isinstance(no, ast.Name) and no.id in CAMPOS_TEXTO:
+            raise ValueError(f"Texto não pode ser usado em contas: {ast.unparse(no)}")
+
+    def _compilar_BinOp(self, no):
+        funcao = _OPERADORES_BINARIOS.get(type(no.op))
+        if funcao is None:
+            raise ValueError(f"Operador não permitido: {type(no.op).__name__}")
+        self._exigir_numero(no.left)
+        self._exigir_numero(no.right)
+        esquerda = self.compilar(no.left)
+        direita = self.compilar(no.right)
+        return lambda colunas, n: _aplicar(funcao, esquerda(colunas, n), direita(colunas, n))
+
+    def _compilar_UnaryOp(self, no):
+        funcao = _OPERADORES_UNARIOS.get(type(no.op))
+        if funcao is None:
+            raise ValueError(f"Operador não permitido: {type(no.op).__name__}")
+        if not isinstance(no.op, ast.Not):
+            self._exigir_numero(no.operand)
+        operando = self.compilar(no.operand)
+        return lambda colunas, n: _aplicar(funcao, operando(colunas, n))
+
+    def _compilar_Compare(self, no):
+        comparadores = []
+        for op in no.ops:
+            funcao = _COMPARADORES.get(type(op))
+            if funcao is None:
+                raise ValueError(f"Comparação não permitida: {type(op).__name__}")
+            comparadores.append(funcao)
+        termos = [self.compilar(no.left)] + [self.compilar(c) for c in no.comparators]
+
+        def avaliar(colunas, n):
+            valores = [termo(colunas, n) for termo in termos]
+            resultado = [True] * n
+            for i, funcao in enumerate(comparadores):
+                parcial = _aplicar(funcao, valores[i], valores[i + 1])
+                resultado = [r and bool(p) for r, p in zip(resultado, parcial)]
+            return resultado
+        return avaliar
+
+    def _compilar_BoolOp(self, no):
+        termos = [self.compilar(v) for v in no.values]
+        e_logico = isinstance(no.op, ast.And)
+
+        def avaliar(colunas, n):
+            valores = [termo(colunas, n) for termo in termos]
+            if e_logico:
+                return [all(linha) for linha in zip(*valores)]
+            return [any(linha) for linha in zip(*valores)]
+        return avaliar
+
+    def _compilar_IfExp(self, no):
+        condicao = self.compilar(no.test)
+        entao = self.compilar(no.body)
+        senao = self.compilar(no.orelse)
+
+        def avaliar(colunas, n):
+            return [
+                a if c else b
+                for c, a, b in zip(condicao(colunas, n), entao(colunas, n), senao(colunas, n))
+            ]
+        return avaliar
+
+    def _compilar_Call(self, no):
+        if not isinstance(no.func, ast.Name) or no.func.id not in _FUNCOES or no.keywords:
+            raise ValueError("Função não permitida na fórmula")
+        funcao = _FUNCOES[no.func.id]
+        argumentos = [self.compilar(a) for a in no.args]
+        if not argumentos:
+            raise ValueError(f"Função {no.func.id} precisa de argumentos")
+        return lambda colunas, n: _aplicar(funcao, *[a(colunas, n) for a in argumentos])
+
+
+@lru_cache(maxsize=256)
+def compilar_formula(expressao: str) -> FormulaCompilada:
+    """Valida e compila uma fórmula; o resultado fica em cache pelo texto da expressão"""
+    expressao = expressao.strip()
+    if not expressao:
+        raise ValueError("Fórmula vazia")
+    if len(expressao) > 500:
+        raise ValueError("Fórmula muito longa")
+    try:
+        arvore = ast.parse(expressao, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Fórmula inválida: {e.msg}")
+
+    compilador = _Compilador()
+    avaliador = compilador.compilar(arvore)
+    return FormulaCompilada(expressao, avaliador, compilador.campos)
+
+
+def montar_colunas(imoveis: List[Imovel], calculos: List[Dict[str, Any]] = None) -> Dict[str, List[Any]]:
+    """Monta as colunas (um campo por lista) a partir dos imóveis e seus cálculos"""
+    colunas = {campo: [getattr(imovel, campo, None) for imovel in imoveis] for campo in CAMPOS_IMOVEL}
+    if calculos:
+        for campo in CAMPOS_CALCULO:
+            colunas[campo] = [calculo.get(campo) for calculo in calculos]
+    return colunas
+
+
+def formatar_valor(valor: Any, formato: str) -> str:
+    """Formata o valor de um indicador para exibição"""
+    if valor is None:
+        return "-"
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        return str(valor)
+    if formato == 'moeda':
+        return formatar_moeda(valor)
+    if formato == 'percentual':
+        return formatar_percentual(valor)
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+class IndicadorService:
+    def __init__(self, db_manager: DatabaseManager = None):
+        self.db_manager = db_manager or DatabaseManager()
+
+    def listar_indicadores(self) -> List[Dict[str, Any]]:
+        """Retorna os indicadores personalizados ativos, na ordem de criação"""
+        try:
+            query = """
+                SELECT nome, expressao, formato
+                FROM indicadores_personalizados
+                WHERE ativo = 1
+                ORDER BY id
+            """
+            results = self.db_manager.execute_query(query)
+            return [
+                {'nome': nome, 'expressao': expressao, 'formato': formato}
+                for nome, expressao, formato in results
+            ]
+        except Exception as e:
+            logging.error(f"Erro ao listar indicadores personalizados: {e}")
+            return []
+
+    def salvar_indicador(self, nome: str, expressao: str, formato: str = 'numero'):
+        """Valida a fórmula e salva (ou substitui) um indicador personalizado"""
+        nome = nome.strip()
+        if not nome:
+            raise ValueError("Nome do indicador é obrigatório")
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato deve ser um de: {', '.join(FORMATOS)}")
+        compilar_formula(expressao)
+
+        query = """
+            INSERT INTO indicadores_personalizados (nome, expressao, formato, ativo)
+            VALUES (?, ?, ?, 1)
+            ON CONFLICT(nome) DO UPDATE SET
+                expressao = excluded.expressao,
+                formato = excluded.formato,
+                ativo = 1
+        """
+        self.db_manager.execute_query(query, (nome, expressao.strip(), formato))
+
+    def remover_indicador(self, nome: str):
+        """Desativa um indicador personalizado"""
+        query = "UPDATE indicadores_personalizados SET ativo = 0 WHERE nome = ?"
+        self.db_manager.execute_query(query, (nome,))
+
+    def avaliar_indicadores(self, indicadores: List[Dict[str, Any]],
+                            colunas: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+        """Avalia vários indicadores sobre as mesmas colunas"""
+        resultados = {}
+        n = len(next(iter(colunas.values()), []))
+        for indicador in indicadores:
+            try:
+                formula = compilar_formula(indicador['expressao'])
+                resultados[indicador['nome']] = formula.avaliar(colunas)
+            except ValueError as e:
+                logging.warning(f"Indicador '{indicador['nome']}' ignorado: {e}")
+                resultados[indicador['nome']] = [None] * n
+        return resultados
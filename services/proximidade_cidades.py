@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Município mais próximo de uma coordenada: árvore KD sobre os centroides do
+cadastro de cidades, com consultas em lote agrupadas por célula de grade
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+RAIO_TERRA_KM = 6371.0088
+
+# Divisões do lado da célula média por município na grade das consultas em lote
+SUBDIVISAO_CELULA = 3
+
+
+def distancia_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distância de grande círculo (haversine) em km"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat = p2 - p1
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlon / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def tem_centroide(cidade: Dict[str, Any]) -> bool:
+    """Município com centroide conhecido (coordenadas ausentes ou zeradas são desconhecidas)"""
+    return bool(cidade.get('latitude')) and bool(cidade.get('longitude'))
+
+
+class ArvoreKD:
+    """
+    Árvore KD 2D implícita: o nó do intervalo [lo, hi) é o elemento do meio,
+    com o eixo de corte alternando a cada nível; sem objetos por nó
+    """
+
+    def __init__(self, pontos: Sequence[Tuple[float, float]]):
+        n = len(pontos)
+        self.xs = [0.0] * n
+        self.ys = [0.0] * n
+        self.indices = [0] * n
+        pilha = [(0, n, 0, list(range(n)))]
+        while pilha:
+            lo, hi, eixo, itens = pilha.pop()
+            if lo >= hi:
+                continue
+            itens.sort(key=lambda i: pontos[i][eixo])
+            meio = (hi - lo) // 2
+            pos = lo + meio
+            self.xs[pos], self.ys[pos] = pontos[itens[meio]]
+            self.indices[pos] = itens[meio]
+            pilha.append((lo, pos, 1 - eixo, itens[:meio]))
+            pilha.append((pos + 1, hi, 1 - eixo, itens[meio + 1:]))
+
+    def __len__(self):
+        return len(self.indices)
+
+    def mais_proximo(self, x: float, y: float) -> Tuple[int, float]:
+        """(índice do ponto mais próximo, distância ao quadrado)"""
+        xs, ys = self.xs, self.ys
+        melhor_d, melhor_pos = math.inf, -1
+        pilha = [(0, len(xs), 0, 0.0)]
+        while pilha:
+            lo, hi, eixo, limite = pilha.pop()
+            if limite >= melhor_d:
+                continue
+            while lo < hi:
+                pos = (lo + hi) >> 1
+                dx = x - xs[pos]
+                dy = y - ys[pos]
+                d = dx * dx + dy * dy
+                if d < melhor_d:
+                    melhor_d, melhor_pos = d, pos
+                corte = dx if eixo == 0 else dy
+                # Desce primeiro pelo lado do ponto; o outro lado só se puder ter algo mais perto
+                if corte < 0:
+                    pilha.append((pos + 1, hi, 1 - eixo, corte * corte))
+                    hi = pos
+                else:
+                    pilha.append((lo, pos, 1 - eixo, corte * corte))
+                    lo = pos + 1
+                eixo = 1 - eixo
+        return (self.indices[melhor_pos], melhor_d) if melhor_pos >= 0 else (-1, math.inf)
+
+    def no_retangulo(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        """Índices dos pontos dentro do retângulo"""
+        xs, ys = self.xs, self.ys
+        encontrados = []
+        pilha = [(0, len(xs), 0)]
+        while pilha:
+            lo, hi, eixo = pilha.pop()
+            if lo >= hi:
+                continue
+            pos = (lo + hi) >> 1
+            x, y = xs[pos], ys[pos]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                encontrados.append(self.indices[pos])
+            valor, minimo, maximo = (x, x0, x1) if eixo == 0 else (y, y0, y1)
+            if minimo <= valor:
+                pilha.append((lo, pos, 1 - eixo))
+            if valor <= maximo:
+                pilha.append((pos + 1, hi, 1 - eixo))
+        return encontrados
+
+
+class IndiceProximidade:
+    """
+    Municípios indexados pelos centroides em projeção equirretangular
+    (x = lon * cos(latitude média), y = lat), em que a distância euclidiana
+    acompanha a distância real na escala de um estado
+
+    Em lote, os pontos são agrupados em células de grade: a árvore é
+    consultada uma vez por célula para obter os poucos municípios que podem
+    ser o mais próximo de algum ponto dela, e cada ponto só compara esses
+    candidatos (nenhum, quando a célula tem um candidato só).
+
+    Municípios sem centroide ficam fora da árvore, em `sem_centroide`: nunca
+    são devolvidos como o mais próximo, e quem consulta precisa tratá-los à
+    parte (o snapshot distribuído não tem centroide para todos).
+    """
+
+    def __init__(self, cidades: Iterable[Dict[str, Any]]):
+        cidades = list(cidades)
+        self.cidades = [c for c in cidades if tem_centroide(c)]
+        self.sem_centroide = [c for c in cidades if not tem_centroide(c)]
+        if self.cidades:
+            lat_media = sum(c['latitude'] for c in self.cidades) / len(self.cidades)
+        else:
+            lat_media = 0.0
+        self._escala = math.cos(math.radians(lat_media))
+        self._lats = [c['latitude'] for c in self.cidades]
+        self._lons = [c['longitude'] for c in self.cidades]
+        self._pontos = [(lon * self._escala, lat) for lat, lon in zip(self._lats, self._lons)]
+        self.arvore = ArvoreKD(self._pontos)
+
+        # Células com ~1/9 da área média por município: a maioria tem 1 a 3 candidatos
+        if len(self._pontos) > 1:
+            xs, ys = zip(*self._pontos)
+            area = max(max(xs) - min(xs), 1e-6) * max(max(ys) - min(ys), 1e-6)
+            self.lado_celula = math.sqrt(area / len(self._pontos)) / SUBDIVISAO_CELULA
+        else:
+            self.lado_celula = 1.0
+        self._candidatas: Dict[Tuple[int, int], List[Tuple[float, float, int]]] = {}
+
+    def __len__(self):
+        return len(self.cidades)
+
+    def _resultado(self, indice: int, lat: float, lon: float) -> Tuple[Dict[str, Any], float]:
+        cidade = self.cidades[indice]
+        return cidade, distancia_km(lat, lon, cidade['latitude'], cidade['longitude'])
+
+    def mais_proximo(self, lat: float, lon: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        """(município mais próximo, distância em km), ou None sem municípios com centroide"""
+        if not self.cidades or lat is None or lon is None:
+            return None
+        indice, _ = self.arvore.mais_proximo(lon * self._escala, lat)
+        return self._resultado(indice, lat, lon)
+
+    def _candidatas_celula(self, celula: Tuple[int, int]) -> List[Tuple[float, float, int]]:
+        candidatas = self._candidatas.get(celula)
+        if candidatas is None:
+            lado = self.lado_celula
+            x0, y0 = celula[0] * lado, celula[1] * lado
+            x1, y1 = x0 + lado, y0 + lado
+            # O mais próximo do centro limita a distância máxima de qualquer ponto da célula
+            indice, _ = self.arvore.mais_proximo((x0 + x1) / 2, (y0 + y1) / 2)
+            px, py = self._pontos[indice]
+            raio = math.sqrt(max((px - x) ** 2 + (py - y) ** 2 for x in (x0, x1) for y in (y0, y1)))
+            candidatas = self._candidatas[celula] = [
+                (*self._pontos[i], i) for i in self.arvore.no_retangulo(x0 - raio, y0 - raio, x1 + raio, y1 + raio)
+            ]
+        return candidatas
+
+    def mais_proximos_lote(self, pontos: Sequence[Tuple[float, float]]) -> List[Optional[Tuple[Dict[str, Any], float]]]:
+        """Município mais próximo e distância (km) para cada (lat, lon); None nas coordenadas ausentes"""
+        resultado: List[Optional[Tuple[Dict[str, Any], float]]] = [None] * len(pontos)
+        if not self.cidades:
+            return resultado
+
+        escala, lado, floor = self._escala, self.lado_celula, math.floor
+        por_celula: Dict[Tuple[int, int], List[int]] = {}
+        for k, (lat, lon) in enumerate(pontos):
+            if lat is None or lon is None:
+                continue
+            celula = (floor(lon * escala / lado), floor(lat / lado))
+            indices = por_celula.get(celula)
+            if indices is None:
+                por_celula[celula] = [k]
+            else:
+                indices.append(k)
+
+        # Distância equirretangular com o cosseno da latitude média do par:
+        # difere da haversine em menos de 0,1% nas distâncias até o centroide
+        km_por_grau = math.radians(RAIO_TERRA_KM)
+        meio_grau = math.pi / 360
+        cos, sqrt = math.cos, math.sqrt
+        cidades, lats, lons = self.cidades, self._lats, self._lons
+        for celula, indices in por_celula.items():
+            candidatas = self._candidatas_celula(celula)
+            unica = candidatas[0][2] if len(candidatas) == 1 else None
+            for k in indices:
+                lat, lon = pontos[k]
+                indice = unica
+                if indice is None:
+                    x = lon * escala
+                    melhor_d = math.inf
+                    for cx, cy, i in candidatas:
+                        d = (cx - x) * (cx - x) + (cy - lat) * (cy - lat)
+                        if d < melhor_d:
+                            melhor_d, indice = d, i
+                clat = lats[indice]
+                dlon = (lons[indice] - lon) * cos((clat + lat) * meio_grau)
+                resultado[k] = (cidades[indice], km_por_grau * sqrt(dlon * dlon + (clat - lat) ** 2))
+        return resultado
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Classificação de coordenadas em mesorregiões e microrregiões do IBGE
+
+As fronteiras vêm de arquivos GeoJSON locais (data/regioes_<uf>.geojson.gz)
+e ficam em um índice espacial de grade sobre as caixas envolventes: cada
+consulta só testa ponto-no-polígono contra as poucas regiões cuja caixa
+cobre a célula do ponto.
+"""
+
+import os
+import gzip
+import json
+import math
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Níveis da divisão regional do IBGE
+MESORREGIAO = 'mesorregiao'
+MICRORREGIAO = 'microrregiao'
+
+# Lado da célula da grade, em graus (~28 km): poucas regiões por célula
+TAMANHO_CELULA = 0.25
+
+DIRETORIO_MALHAS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+Anel = List[Tuple[float, float]]
+Caixa = Tuple[float, float, float, float]
+
+
+def caminho_malha(uf: str) -> str:
+    """Arquivo com as fronteiras das meso/microrregiões de uma UF"""
+    return os.path.join(DIRETORIO_MALHAS, f"regioes_{uf.lower()}.geojson.gz")
+
+
+def _caixa(pontos: Iterable[Tuple[float, float]]) -> Caixa:
+    lons, lats = zip(*pontos)
+    return min(lons), min(lats), max(lons), max(lats)
+
+
+def _dentro_anel(lon: float, lat: float, anel: Anel) -> bool:
+    """Ray casting (regra par-ímpar) sobre um anel fechado de (lon, lat)"""
+    dentro = False
+    x1, y1 = anel[-1]
+    for x2, y2 in anel:
+        if (y2 > lat) != (y1 > lat) and lon < (x1 - x2) * (lat - y2) / (y1 - y2) + x2:
+            dentro = not dentro
+        x1, y1 = x2, y2
+    return dentro
+
+
+class Regiao:
+    """Região com seus polígonos (anel externo + buracos) e caixas envolventes"""
+
+    def __init__(self, codigo: str, nome: str, nivel: str, poligonos: List[List[Anel]],
+                 mesorregiao: Optional[str] = None):
+        self.codigo = codigo
+        self.nome = nome
+        self.nivel = nivel
+        self.mesorregiao = mesorregiao
+        self.poligonos = [(_caixa(aneis[0]), aneis) for aneis in poligonos if aneis and aneis[0]]
+        self.caixa = _caixa(canto for caixa, _ in self.poligonos
+                            for canto in ((caixa[0], caixa[1]), (caixa[2], caixa[3])))
+
+    def contem(self, lon: float, lat: float) -> bool:
+        for (x0, y0, x1, y1), aneis in self.poligonos:
+            if x0 <= lon <= x1 and y0 <= lat <= y1:
+                # Dentro do anel externo e fora de todos os buracos
+                if sum(_dentro_anel(lon, lat, anel) for anel in aneis) % 2:
+                    return True
+        return False
+
+    def __repr__(self):
+        return f"Regiao({self.nivel}, {self.codigo}, {self.nome!r})"
+
+
+class IndiceEspacial:
+    """Grade regular de células -> regiões cuja caixa envolvente toca a célula"""
+
+    def __init__(self, regioes: Iterable[Regiao], tamanho_celula: float = TAMANHO_CELULA):
+        self.regioes = list(regioes)
+        self.tamanho_celula = tamanho_celula
+        self._celulas: Dict[Tuple[int, int], List[Regiao]] = {}
+        for regiao in self.regioes:
+            x0, y0, x1, y1 = regiao.caixa
+            for i in range(self._coluna(x0), self._coluna(x1) + 1):
+                for j in range(self._coluna(y0), self._coluna(y1) + 1):
+                    self._celulas.setdefault((i, j), []).append(regiao)
+
+    def __len__(self):
+        return len(self.regioes)
+
+    def _coluna(self, valor: float) -> int:
+        return math.floor(valor / self.tamanho_celula)
+
+    def candidatas(self, lon: float, lat: float) -> List[Regiao]:
+        return self._celulas.get((self._coluna(lon), self._coluna(lat)), [])
+
+    def localizar(self, lon: float, lat: float) -> Optional[Regiao]:
+        for regiao in self.candidatas(lon, lat):
+            if regiao.contem(lon, lat):
+                return regiao
+        return None
+
+    def localizar_lote(self, pontos: Sequence[Tuple[float, float]]) -> List[Optional[Regiao]]:
+        """
+        Localiza vários (lat, lon) de uma vez
+
+        Coordenadas repetidas são resolvidas uma vez só, os pontos são agrupados
+        por célula (candidatas calculadas uma vez por célula) e, dentro da célula,
+        a última região encontrada é testada primeiro.
+        """
+        por_celula: Dict[Tuple[int, int], Dict[Tuple[float, float], None]] = {}
+        for ponto in pontos:
+            if ponto[0] is None or ponto[1] is None:
+                continue
+            lat, lon = ponto
+            por_celula.setdefault((self._coluna(lon), self._coluna(lat)), {})[(lat, lon)] = None
+
+        encontradas: Dict[Tuple[float, float], Optional[Regiao]] = {}
+        for celula, coordenadas in por_celula.items():
+            candidatas = self._celulas.get(celula, [])
+            ultima = None
+            for lat, lon in coordenadas:
+                regiao = None
+                if ultima is not None and ultima.contem(lon, lat):
+                    regiao = ultima
+                else:
+                    for candidata in candidatas:
+                        if candidata is not ultima and candidata.contem(lon, lat):
+                            regiao = ultima = candidata
+                            break
+                encontradas[(lat, lon)] = regiao
+        return [encontradas.get((ponto[0], ponto[1])) for ponto in pontos]
+
+
+class ClassificadorRegioes:
+    """Índices de mesorregiões e microrregiões de uma malha regional"""
+
+    def __init__(self, regioes: Iterable[Regiao]):
+        regioes = list(regioes)
+        self.mesorregioes = IndiceEspacial(r for r in regioes if r.nivel == MESORREGIAO)
+        self.microrregioes = IndiceEspacial(r for r in regioes if r.nivel == MICRORREGIAO)
+
+    @staticmethod
+    def _resultado(meso: Optional[Regiao], micro: Optional[Regiao]) -> Dict[str, Optional[str]]:
+        return {
+            'mesorregiao': meso.nome if meso else (micro.mesorregiao if micro else None),
+            'microrregiao': micro.nome if micro else None,
+        }
+
+    def classificar(self, lat: float, lon: float) -> Dict[str, Optional[str]]:
+        """Mesorregião e microrregião do ponto (None fora da malha)"""
+        return self._resultado(self.mesorregioes.localizar(lon, lat), self.microrregioes.localizar(lon, lat))
+
+    def classificar_lote(self, pontos: Sequence[Tuple[float, float]]) -> List[Dict[str, Optional[str]]]:
+        """Classifica uma sequência de (lat, lon) em uma chamada; None nas coordenadas ausentes"""
+        pontos = list(pontos)
+        mesos = self.mesorregioes.localizar_lote(pontos)
+        micros = self.microrregioes.localizar_lote(pontos)
+        return [self._resultado(meso, micro) for meso, micro in zip(mesos, micros)]
+
+
+def _poligonos(geometria: Dict) -> List[List[Anel]]:
+    if geometria['type'] == 'Polygon':
+        partes = [geometria['coordinates']]
+    elif geometria['type'] == 'MultiPolygon':
+        partes = geometria['coordinates']
+    else:
+        return []
+    return [[[(float(x), float(y)) for x, y, *_ in anel] for anel in poligono] for poligono in partes]
+
+
+def carregar_malha(caminho: str) -> ClassificadorRegioes:
+    """
+    Lê um GeoJSON (opcionalmente .gz) de regiões
+
+    Cada feição traz em properties: nivel (mesorregiao/microrregiao), codigo,
+    nome e, nas microrregiões, o nome da mesorregiao a que pertencem.
+    """
+    abrir = gzip.open if caminho.endswith('.gz') else open
+    with abrir(caminho, 'rt', encoding='utf-8') as arquivo:
+        colecao = json.load(arquivo)
+    regioes = []
+    for feicao in colecao.get('features', []):
+        propriedades = feicao.get('properties') or {}
+        poligonos = _poligonos(feicao.get('geometry') or {'type': None})
+        if poligonos and propriedades.get('nivel') in (MESORREGIAO, MICRORREGIAO):
+            regioes.append(Regiao(str(propriedades.get('codigo', '')), propriedades.get('nome', ''),
+                                  propriedades['nivel'], poligonos, propriedades.get('mesorregiao')))
+    return ClassificadorRegioes(regioes)
+
+
+_classificadores: Dict[str, Optional[ClassificadorRegioes]] = {}
+_classificadores_lock = threading.Lock()
+
+
+def get_classificador(uf: str = 'SC', caminho: str = None) -> Optional[ClassificadorRegioes]:
+    """Classificador compartilhado da UF, ou None se a malha não estiver disponível"""
+    chave = os.path.abspath(caminho or caminho_malha(uf))
+    with _classificadores_lock:
+        if chave not in _classificadores:
+            try:
+                _classificadores[chave] = carregar_malha(chave) if os.path.exists(chave) else None
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logging.error(f"Malha regional inválida em {chave}: {e}")
+                _classificadores[chave] = None
+        return _classificadores[chave]
+
+
+def invalidar_classificadores():
+    """Descarta as malhas carregadas (ex.: depois de baixar uma nova)"""
+    with _classificadores_lock:
+        _classificadores.clear()
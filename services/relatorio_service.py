@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Geração em lote de relatórios por cidade ou região, sem interface
+
+A carteira é lida uma vez do banco e dividida em partições; cada partição
+vira um conjunto de arquivos (PDF, Excel, CSV...) gerado por
+ExportService.exportar_varios em um pool de processos. Um índice JSON na
+pasta de saída guarda a impressão digital dos dados de cada partição, e as
+que não mudaram desde a última execução são reaproveitadas.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models.database import DatabaseManager
+from services.busca_cidades import normalizar
+from services.calculo_service import CalculoService
+from services.catalogo_cidades import get_catalogo
+from services.export_service import ExportService, Quadro
+
+PARTICIONAMENTOS = ('cidade', 'regiao')
+
+# Campos que identificam uma partição: a mesma cidade pode existir em várias UFs
+CAMPOS_PARTICAO = {'cidade': ('cidade', 'estado'), 'regiao': ('regiao',)}
+
+FORMATOS_RELATORIO = ('pdf', 'xlsx')
+
+ARQUIVO_INDICE = "indice.json"
+
+# Consultas do que, além dos imóveis, muda o conteúdo dos relatórios; só
+# valores, sem datas: o DatabaseManager regrava os padrões a cada abertura
+CONSULTAS_PARAMETROS = (
+    "SELECT chave, valor FROM parametros_globais ORDER BY chave",
+    "SELECT DISTINCT cidade, bairro, cep, fator_localizacao FROM localizacao_indices ORDER BY 1, 2, 3, 4",
+    "SELECT nome, expressao, formato, ativo FROM indicadores_personalizados ORDER BY nome",
+)
+
+
+def nome_arquivo(particao: str) -> str:
+    """Nome de arquivo seguro para a partição ("São José/SC" -> "sao-jose-sc")"""
+    return re.sub(r'[^a-z0-9]+', '-', normalizar(particao)).strip('-') or 'sem-nome'
+
+
+def rotulo(chave: Tuple[Optional[str], ...]) -> str:
+    """Nome da partição no índice e no progresso (("Itajaí", "SC") -> "Itajaí/SC")"""
+    return '/'.join(str(parte) for parte in chave if parte) or 'Sem nome'
+
+
+def nomes_arquivos(rotulos: List[str]) -> Dict[str, str]:
+    """
+    Nome de arquivo de cada partição, sem colisões: rótulos que viram o
+    mesmo nome ("Itajaí/SC" e "Itajai/SC") recebem sufixos -2, -3... na
+    ordem alfabética dos rótulos, estável entre execuções
+    """
+    nomes: Dict[str, str] = {}
+    usados = set()
+    for particao in sorted(rotulos):
+        base = nome = nome_arquivo(particao)
+        sufixo = 2
+        while nome in usados:
+            nome = f"{base}-{sufixo}"
+            sufixo += 1
+        usados.add(nome)
+        nomes[particao] = nome
+    return nomes
+
+
+def _gerar_particao(db_path: str, filtros: Dict[str, Any], quadro: Quadro,
+                    destinos: List[str]) -> Dict[str, Any]:
+    """Gera os arquivos de uma partição; roda em um processo do pool"""
+    # Motor de cálculo do próprio banco: preços com os mesmos parâmetros e
+    # índices que entram na impressão digital da partição
+    db_manager = DatabaseManager(db_path)
+    service = ExportService(db_manager, CalculoService(db_manager))
+    # Um arquivo por vez: o paralelismo já está entre as partições
+    return service.exportar_varios(quadro, destinos, filtros=filtros, max_paralelo=1)
+
+
+class RelatorioService:
+    def __init__(self, db_manager: DatabaseManager = None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.export_service = ExportService(self.db_manager)
+
+    def impressao_parametros(self) -> str:
+        """Impressão digital de parâmetros, índices de localização e indicadores"""
+        resumo = hashlib.sha256()
+        for consulta in CONSULTAS_PARAMETROS:
+            try:
+                linhas = self.db_manager.execute_query(consulta)
+            except Exception as e:
+                logging.warning(f"Consulta indisponível para a impressão digital ({consulta}): {e}")
+                linhas = []
+            resumo.update(json.dumps([consulta, [list(linha) for linha in linhas or []]],
+                                     default=str).encode('utf-8'))
+        return resumo.hexdigest()
+
+    def particionar(self, por: str = 'cidade') -> Dict[Tuple[Optional[str], ...], Quadro]:
+        """
+        Imóveis do banco divididos por (cidade, UF) ou (região,), como quadros
+        colunares; as chaves seguem CAMPOS_PARTICAO
+        """
+        if por not in PARTICIONAMENTOS:
+            raise ValueError(f"Particionamento inválido: {por} (use {', '.join(PARTICIONAMENTOS)})")
+        catalogo = get_catalogo(self.db_manager.db_path) if por == 'regiao' else None
+
+        regioes: Dict[str, str] = {}
+        particoes: Dict[Tuple[Optional[str], ...], Quadro] = {}
+        for lote in self.export_service.lotes_do_banco("ORDER BY id"):
+            if catalogo is None:
+                chaves = [(cidade, estado or None) for cidade, estado in zip(lote['cidade'], lote['estado'])]
+            else:
+                for cidade in set(lote['cidade']) - regioes.keys():
+                    regioes[cidade] = catalogo.regiao_de(cidade)
+                chaves = [(regioes[cidade],) for cidade in lote['cidade']]
+            colunas = list(lote.items())
+            for posicao, chave in enumerate(chaves):
+                quadro = particoes.get(chave)
+                if quadro is None:
+                    quadro = particoes[chave] = {campo: [] for campo, _ in colunas}
+                for campo, valores in colunas:
+                    quadro[campo].append(valores[posicao])
+        return particoes
+
+    @staticmethod
+    def impressao_particao(quadro: Quadro, parametros: str) -> str:
+        """Impressão digital dos dados de uma partição (inclui data_atualizacao de cada imóvel)"""
+        resumo = hashlib.sha256(parametros.encode('utf-8'))
+        for campo in sorted(quadro):
+            resumo.update(json.dumps([campo, quadro[campo]], default=str).encode('utf-8'))
+        return resumo.hexdigest()
+
+    @staticmethod
+    def carregar_indice(caminho: str) -> Dict[str, Any]:
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Índice de relatórios ilegível ({caminho}), gerando tudo: {e}")
+            return {}
+
+    def gerar(self, pasta: str, por: str = 'cidade', formatos: Tuple[str, ...] = FORMATOS_RELATORIO,
+              processos: int = None, forcar: bool = False,
+              progresso: Callable[[str, bool], None] = None) -> Dict[str, Any]:
+        """
+        Gera os relatórios de todas as partições em pasta e grava o índice
+
+        O índice é chaveado pelo rótulo da partição ("Itajaí/SC") e cada uma
+        tem o próprio nome de arquivo (nomes_arquivos), mesmo quando rótulos
+        diferentes viram o mesmo nome. Partições cuja impressão digital e
+        arquivos batem com o índice anterior são puladas (forcar=True gera tudo). As demais vão para um pool de
+        `processos` processos, as maiores primeiro. progresso(partição,
+        reaproveitada) é chamado a cada partição concluída. Retorna o índice.
+        """
+        inicio = time.perf_counter()
+        os.makedirs(pasta, exist_ok=True)
+        caminho_indice = os.path.join(pasta, ARQUIVO_INDICE)
+        anterior = self.carregar_indice(caminho_indice)
+        anteriores = anterior.get('particoes', {}) if anterior.get('particionamento') == por else {}
+
+        parametros = self.impressao_parametros()
+        particoes = {rotulo(chave): (chave, quadro) for chave, quadro in self.particionar(por).items()}
+        arquivos_particao = nomes_arquivos(list(particoes))
+        entradas: Dict[str, Dict[str, Any]] = {}
+        pendentes = []
+        for particao, (chave, quadro) in particoes.items():
+            impressao = self.impressao_particao(quadro, parametros)
+            filtros = dict(zip(CAMPOS_PARTICAO[por], chave))
+            destinos = [os.path.join(pasta, f"{arquivos_particao[particao]}.{formato}") for formato in formatos]
+            entrada = anteriores.get(particao)
+            if not forcar and entrada and entrada.get('impressao') == impressao \
+                    and sorted(a['arquivo'] for a in entrada.get('arquivos', [])) == sorted(destinos) \
+                    and all(a['sucesso'] and os.path.exists(a['arquivo']) for a in entrada['arquivos']):
+                entradas[particao] = dict(entrada, reaproveitada=True)
+                if progresso:
+                    progresso(particao, True)
+            else:
+                pendentes.append((particao, filtros, quadro, impressao, destinos))
+
+        pendentes.sort(key=lambda pendente: len(pendente[2]['id']), reverse=True)
+        if pendentes:
+            with ProcessPoolExecutor(max_workers=processos) as executor:
+                futuros = {
+                    executor.submit(_gerar_particao, self.db_manager.db_path, filtros, quadro, destinos):
+                        (particao, impressao, len(quadro['id']))
+                    for particao, filtros, quadro, impressao, destinos in pendentes
+                }
+                for futuro in as_completed(futuros):
+                    particao, impressao, linhas = futuros[futuro]
+                    try:
+                        manifesto = futuro.result()
+                        arquivos = manifesto['arquivos']
+                        segundos = manifesto['total_segundos']
+                    except Exception as e:
+                        logging.error(f"Erro ao gerar relatórios de {particao}: {e}")
+                        arquivos, segundos = [], 0.0
+                    sucesso = bool(arquivos) and all(a['sucesso'] for a in arquivos)
+                    entradas[particao] = {
+                        # Sem impressão digital a partição é refeita na próxima execução
+                        'impressao': impressao if sucesso else None,
+                        'linhas': linhas,
+                        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+                        'segundos': segundos,
+                        'reaproveitada': False,
+                        'arquivos': arquivos,
+                    }
+                    if progresso:
+                        progresso(particao, False)
+
+        indice = {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'particionamento': por,
+            'formatos': list(formatos),
+            'segundos': time.perf_counter() - inicio,
+            'particoes': {particao: entradas[particao] for particao in sorted(entradas)},
+        }
+        temporario = caminho_indice + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(indice, arquivo, ensure_ascii=False, indent=2, default=str)
+        os.replace(temporario, caminho_indice)
+        return indice
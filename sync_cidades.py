@@ -1,44 +1,92 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Script para sincronizar cidades de Santa Catarina com a API do IBGE
+Script para sincronizar cidades (Santa Catarina por padrão) com a API do IBGE
 """
 
 import sys
 import os
+import time
+import argparse
 import logging
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def main():
+def parse_args(argv=None):
+    """Lê as opções de linha de comando"""
+    parser = argparse.ArgumentParser(description="Sincroniza as cidades de uma ou mais UFs com a API do IBGE")
+    parser.add_argument("--ufs", default="SC",
+                        help="UFs a sincronizar, separadas por vírgula (padrão: SC; ex.: SC,PR,RS)")
+    parser.add_argument("--concorrencia", type=int, default=8,
+                        help="Número máximo de requisições simultâneas (padrão: 8)")
+    parser.add_argument("--taxa", type=float, default=20.0,
+                        help="Limite de requisições por segundo (padrão: 20)")
+    parser.add_argument("--timeout", type=float, default=5.0,
+                        help="Timeout de cada requisição em segundos (padrão: 5)")
+    parser.add_argument("--api-base", default=None,
+                        help="URL base da API de localidades (ex.: servidor local para benchmark)")
+    parser.add_argument("--exportar-snapshot", metavar="CAMINHO", default=None,
+                        help="Grava o catálogo local da primeira UF como snapshot compactado e sai (sem rede)")
+    parser.add_argument("--baixar-malhas", action="store_true",
+                        help="Baixa as fronteiras das meso/microrregiões de cada UF para a classificação por polígonos")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Função principal para sincronizar cidades"""
+    args = parse_args(argv)
+    ufs = [uf.strip().upper() for uf in args.ufs.split(',') if uf.strip()]
     try:
-        print("🌐 Iniciando sincronização de cidades de Santa Catarina...")
+        print(f"🌐 Iniciando sincronização de cidades ({', '.join(ufs)})...")
         print("=" * 60)
         
         # Importar o serviço de cidades
-        from services.cidade_service import CidadeService
+        from services.cidade_service import CidadeService, IBGE_API_BASE
         
         # Criar instância do serviço
-        cidade_service = CidadeService()
+        cidade_service = CidadeService(
+            api_base=args.api_base or IBGE_API_BASE,
+            max_concorrencia=args.concorrencia,
+            requisicoes_por_segundo=args.taxa,
+            timeout=args.timeout,
+            ufs=ufs
+        )
+        
+        if args.exportar_snapshot:
+            total = cidade_service.exportar_snapshot(args.exportar_snapshot, uf=ufs[0])
+            print(f"📦 Snapshot com {total} cidades gravado em {args.exportar_snapshot}")
+            return total > 0
         
         print("📡 Conectando com API do IBGE...")
         
+        if args.baixar_malhas:
+            for uf in ufs:
+                total = cidade_service.baixar_malha_regioes(uf)
+                print(f"🗺️  Malha regional de {uf}: {total} meso/microrregiões")
+        
         # Sincronizar cidades (forçar atualização)
+        inicio = time.perf_counter()
         sucesso = cidade_service.sincronizar_cidades(forcar_atualizacao=True)
+        duracao = time.perf_counter() - inicio
         
         if sucesso:
-            print("✅ Cidades sincronizadas com sucesso!")
+            print(f"✅ Cidades sincronizadas com sucesso em {duracao:.2f}s!")
             
             # Obter estatísticas
             stats = cidade_service.get_estatisticas()
             
             print(f"\n📊 Estatísticas:")
             print(f"   Total de cidades: {stats.get('total_cidades', 0)}")
+            for uf, count in stats.get('cidades_por_uf', {}).items():
+                print(f"   {uf}: {count} cidades")
             print(f"   Fonte: {stats.get('fonte', 'N/A')}")
             print(f"   Última atualização: {stats.get('ultima_atualizacao', 'N/A')}")
             
+            rede = cidade_service.get_metricas_rede()
+            print(f"   Requisições HTTP: {rede['requisicoes']} ({rede['nao_modificados']} não modificadas)")
+            print(f"   Disjuntor da API: {rede['disjuntor']['estado']} "
+                  f"({rede['disjuntor']['aberturas']} aberturas, {rede['disjuntor']['recuperacoes']} recuperações)")
+            
             if 'cidades_por_regiao' in stats:
                 print(f"\n🗺️  Cidades por região:")
                 for regiao, count in stats['cidades_por_regiao'].items():
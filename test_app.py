@@ -144,6 +144,7 @@ def test_calculos():
             print(f"    - Custo total: {formatar_moeda(resultado.get('custo_total', 0))}")
             print(f"    - Margem: {formatar_moeda(resultado.get('margem', 0))}")
             print(f"    - ROI: {resultado.get('roi', 0):.1f}%")
+            print(f"    - VPL: {formatar_moeda(resultado.get('vpl', 0))}")
         else:
             print("  ❌ Cálculos falharam")
             return False
@@ -155,6 +156,1199 @@ def test_calculos():
         print(f"❌ Erro nos cálculos: {e}")
         return False
 
+def test_calculo_compartilhado():
+    """Testa o serviço de cálculo compartilhado entre threads"""
+    print("\n🔒 Testando serviço de cálculo compartilhado...")
+    
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+        from models.imovel import Imovel
+        from services.calculo_service import get_calculo_service
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            servicos = list(executor.map(lambda _: get_calculo_service(), range(16)))
+        if len({id(servico) for servico in servicos}) != 1:
+            print("  ❌ Mais de uma instância do serviço de cálculo")
+            return False
+        print("  ✅ Instância única entre threads")
+        
+        service = servicos[0]
+        service.limpar_cache()
+        imoveis = [
+            Imovel(endereco=f"Rua {i}", cidade=cidade, estado="SC", metragem=80.0,
+                   custo_aquisicao=200000.0)
+            for i, cidade in enumerate(["Joinville", "Blumenau", "Criciúma", "Chapecó"] * 25)
+        ]
+        esperado = [c['preco_venda_estimado'] for c in service.calcular_lote(imoveis)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            lotes = list(executor.map(lambda _: service.calcular_lote(imoveis), range(8)))
+        if any([c['preco_venda_estimado'] for c in lote] != esperado for lote in lotes):
+            print("  ❌ Resultados divergentes entre threads")
+            return False
+        print("  ✅ Cálculos concorrentes consistentes")
+        
+        print("✅ Serviço de cálculo compartilhado funcionando!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no serviço de cálculo compartilhado: {e}")
+        return False
+
+def test_calculo_colunar():
+    """Testa o cálculo coluna a coluna contra o motor por imóvel"""
+    print("\n📐 Testando cálculo colunar...")
+    
+    import tempfile
+    import time
+    from models.database import DatabaseManager
+    from models.imovel import Imovel
+    from services.calculo_service import CalculoService
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        db = DatabaseManager(os.path.join(pasta, "calculo.db"))
+        db.execute_query("INSERT INTO localizacao_indices (cidade, bairro, cep, fator_localizacao) "
+                         "VALUES ('Blumenau', 'Centro', '89010000', 1.5)")
+        service = CalculoService(db)
+        n = 20000
+        cidades = ('Blumenau', 'Joinville', 'Cidade Sem Índice', 'Chapecó')
+        quadro = {
+            'id': list(range(1, n + 1)),
+            'cidade': [cidades[i % 4] for i in range(n)],
+            'estado': ['SC'] * n,
+            'cep': [('89010000', None, '')[i % 3] for i in range(n)],
+            'metragem': [40.0 + i % 120 for i in range(n)],
+            'padrao_acabamento': [('baixo', 'medio', 'alto')[i % 3] for i in range(n)],
+            'custo_aquisicao': [150000.0 + i * 7 for i in range(n)],
+            'custos_reforma': [(None, 0.0, 25000.0)[i % 3] for i in range(n)],
+            'custos_transacao': [8000.0] * n,
+            'percentual_lucro_credor': [(None, 12.5)[i % 2] for i in range(n)],
+        }
+        # Linhas inválidas ficam sem cálculo, como no caminho por imóvel
+        quadro['metragem'][5] = 0
+        quadro['padrao_acabamento'][6] = 'luxo'
+        
+        inicio = time.perf_counter()
+        colunas = service.calcular_colunas(quadro)
+        tempo_colunar = time.perf_counter() - inicio
+        
+        inicio = time.perf_counter()
+        imoveis, posicoes = [], []
+        for posicao, valores in enumerate(zip(*quadro.values())):
+            dados = {campo: valor for campo, valor in zip(quadro, valores) if valor is not None}
+            try:
+                imoveis.append(Imovel(endereco='-', **dados))
+                posicoes.append(posicao)
+            except ValueError:
+                pass
+        calculos = service.calcular_lote(imoveis)
+        tempo_por_imovel = time.perf_counter() - inicio
+        
+        assert posicoes == [i for i in range(n) if i not in (5, 6)]
+        assert all(colunas[campo][i] is None for campo in colunas for i in (5, 6))
+        for posicao, calculo in zip(posicoes, calculos):
+            for campo, valor in calculo.items():
+                assert colunas[campo][posicao] == valor, (posicao, campo, colunas[campo][posicao], valor)
+        # Primeira linha: Blumenau com o CEP do índice inserido acima (fator 1,5)
+        assert colunas['preco_venda_estimado'][0] == round(
+            service.parametros.preco_base_m2 * 40.0 * 1.5 * service.parametros.get_fator_padrao('baixo'), 2)
+        print(f"  ✅ {n} linhas idênticas ao motor por imóvel")
+        print(f"  ✅ {n / tempo_colunar:.0f} linhas/s colunar vs {n / tempo_por_imovel:.0f} linhas/s por imóvel")
+        assert tempo_colunar < tempo_por_imovel, "Cálculo colunar mais lento que o por imóvel"
+    
+    print("✅ Cálculo colunar funcionando!")
+
+def _tir_por_linha(fluxo, tolerancia=1e-9):
+    """Solver anterior, para comparação: Newton com bisseção resolvendo um fluxo por vez"""
+    if not (any(v < 0 for v in fluxo) and any(v > 0 for v in fluxo)):
+        return None
+    
+    def avaliar(taxa):
+        fator = 1 / (1 + taxa)
+        desconto, vpl, derivada = 1.0, 0.0, 0.0
+        for t, valor in enumerate(fluxo):
+            if valor:
+                vpl += valor * desconto
+                derivada -= t * valor * desconto * fator
+            desconto *= fator
+        return vpl, derivada
+    
+    inferior, superior = -0.99, 1.0
+    vpl_inferior = avaliar(inferior)[0]
+    for _ in range(10):
+        if avaliar(superior)[0] * vpl_inferior <= 0:
+            break
+        superior *= 2
+    else:
+        return None
+    taxa = 0.01
+    for _ in range(100):
+        vpl, derivada = avaliar(taxa)
+        if abs(vpl) < tolerancia:
+            return taxa
+        if (vpl > 0) == (vpl_inferior > 0):
+            inferior = taxa
+        else:
+            superior = taxa
+        nova = taxa - vpl / derivada if derivada else None
+        if nova is None or not inferior < nova < superior:
+            nova = (inferior + superior) / 2
+        if abs(nova - taxa) < tolerancia:
+            return nova
+        taxa = nova
+    return taxa
+
+def test_fluxo_caixa():
+    """Testa o fluxo de caixa datado, VPL e TIR do portfólio"""
+    print("\n💸 Testando fluxo de caixa, VPL e TIR...")
+    
+    import time
+    import random
+    from services.fluxo_caixa_service import calcular_vpl_lote, calcular_tir_lote
+    
+    # Fluxos com TIR conhecida: -100 hoje, +110 em 12 meses => 10% ao ano
+    fluxos = [
+        [-100.0] + [0.0] * 11 + [110.0],
+        [-1000.0, 300.0, 400.0, 500.0],
+        [-100.0, -50.0],  # Sem troca de sinal: TIR indefinida
+    ]
+    tirs = calcular_tir_lote(fluxos)
+    
+    tir_anual = (1 + tirs[0]) ** 12 - 1
+    assert abs(tir_anual - 0.10) < 1e-6, f"TIR incorreta: {tir_anual:.6f}"
+    print(f"  ✅ TIR anual: {tir_anual * 100:.2f}%")
+    
+    vpl_na_tir = calcular_vpl_lote([fluxos[1]], tirs[1])[0]
+    assert abs(vpl_na_tir) < 1e-6, f"VPL na TIR deveria ser zero: {vpl_na_tir}"
+    print("  ✅ VPL zero na TIR")
+    
+    assert tirs[2] is None, "Fluxo sem troca de sinal não deveria ter TIR"
+    print("  ✅ Fluxo sem troca de sinal sem TIR")
+    
+    # Benchmark: portfólio de aquisição, reforma parcelada e venda, em lote x um fluxo por vez
+    aleatorio = random.Random(26)
+    portfolio = []
+    for _ in range(20000):
+        custo, reforma = aleatorio.uniform(1e5, 5e5), aleatorio.uniform(0, 1e5)
+        fluxo = [-custo] + [-reforma / 6] * 6 + [0.0] * 5 + [aleatorio.uniform(0.5, 2.0) * (custo + reforma)]
+        portfolio.append(fluxo)
+    inicio = time.perf_counter()
+    em_lote = calcular_tir_lote(portfolio)
+    tempo_lote = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    por_linha = [_tir_por_linha(fluxo) for fluxo in portfolio]
+    tempo_linha = time.perf_counter() - inicio
+    
+    diferenca = max(abs(a - b) for a, b in zip(em_lote, por_linha))
+    assert diferenca < 1e-9, f"TIR em lote diverge do solver por linha: {diferenca}"
+    assert tempo_lote < tempo_linha, f"Lote ({tempo_lote:.3f}s) não foi mais rápido que por linha ({tempo_linha:.3f}s)"
+    print(f"  ✅ TIR de {len(portfolio)} fluxos: lote {tempo_lote:.3f}s x por linha {tempo_linha:.3f}s "
+          f"({tempo_linha / tempo_lote:.1f}x)")
+    
+    print("✅ Fluxo de caixa funcionando!")
+
+def test_indicadores():
+    """Testa fórmulas de indicadores personalizados"""
+    print("\n📐 Testando indicadores personalizados...")
+    
+    import time
+    from models.imovel import Imovel
+    from services.indicador_service import compilar_formula, montar_colunas
+    
+    imoveis = [
+        Imovel(endereco="Rua A, 1", cidade="Joinville", estado="SC", metragem=100.0,
+               custo_aquisicao=300000.0),
+        Imovel(endereco="Rua B, 2", cidade="Blumenau", estado="SC", metragem=50.0,
+               custo_aquisicao=0.0),
+    ]
+    calculos = [{'preco_venda_estimado': 500000.0, 'custo_total': 300000.0},
+                {'preco_venda_estimado': 250000.0, 'custo_total': 0.0}]
+    colunas = montar_colunas(imoveis, calculos)
+    
+    # Compilada uma vez e reaproveitada pelo texto da expressão
+    formula = compilar_formula("preco_venda_estimado / metragem")
+    assert compilar_formula("preco_venda_estimado / metragem") is formula, "Fórmula não foi reaproveitada do cache"
+    assert formula.avaliar(colunas) == [5000.0, 5000.0], f"Valor incorreto: {formula.avaliar(colunas)}"
+    print("  ✅ Preço por m² calculado em lote")
+    
+    # Divisão por zero vira valor ausente
+    razao = compilar_formula("custo_total / preco_venda_estimado * 100").avaliar(colunas)
+    razao_inversa = compilar_formula("preco_venda_estimado / custo_total").avaliar(colunas)
+    assert razao[1] == 0.0 and razao_inversa[1] is None, \
+        f"Tratamento de divisão incorreto: {razao}, {razao_inversa}"
+    print("  ✅ Divisão por zero tratada")
+    
+    assert compilar_formula("metragem >= 80 and cidade == 'Joinville'").filtrar(colunas) == [True, False], \
+        "Filtro por fórmula incorreto"
+    print("  ✅ Filtro por fórmula")
+    
+    for expressao in ["__import__('os')", "metragem.__class__", "open('x')", "desconhecido + 1",
+                      "cidade * 200000000", "'x' * 99999999", "-status"]:
+        try:
+            compilar_formula(expressao)
+        except ValueError:
+            continue
+        raise AssertionError(f"Expressão insegura aceita: {expressao}")
+    print("  ✅ Expressões inseguras e contas com texto rejeitadas")
+    
+    # Contas em float limitadas: potências encadeadas não constroem inteiros gigantes
+    inicio = time.perf_counter()
+    explosivas = [
+        compilar_formula("((((((((9**10)**10)**10)**10)**10)**10)**10)**10)").avaliar(colunas),
+        compilar_formula("999999999999999999999999999999 * metragem").avaliar(colunas),
+        compilar_formula("(0 - metragem) ** 0.5").avaliar(colunas),
+    ]
+    assert time.perf_counter() - inicio < 0.1, "Avaliação de potências demorou demais"
+    assert all(valor is None for valores in explosivas for valor in valores), f"Valores fora do limite: {explosivas}"
+    assert compilar_formula("round(metragem / 3, 2)").avaliar(colunas) == [33.33, 16.67]
+    print("  ✅ Valores enormes, não finitos ou complexos viram ausentes")
+    
+    print("✅ Indicadores personalizados funcionando!")
+
+def test_agregacao():
+    """Testa a agregação do portfólio por grupos"""
+    print("\n🧾 Testando agregação do portfólio...")
+    
+    try:
+        from services.agregacao_service import AgregacaoService
+        
+        regioes = {'Joinville': 'Norte', 'Criciúma': 'Sul'}
+        service = AgregacaoService(regiao_por_cidade=lambda cidade: regioes.get(cidade, 'Central'))
+        
+        colunas = {
+            'cidade': ['Joinville', 'Joinville', 'Criciúma'],
+            'status': ['em_analise', 'comprado', 'em_analise'],
+            'padrao_acabamento': ['medio', 'alto', 'medio'],
+            'metragem': [100.0, 50.0, 80.0],
+            'custo_total': [100000.0, 300000.0, 200000.0],
+            'preco_venda_estimado': [150000.0, 330000.0, 180000.0],
+            'margem': [50000.0, 30000.0, -20000.0],
+        }
+        resumo = service.agregar(service.linhas_de_colunas(colunas))
+        
+        if resumo['total']['quantidade'] != 3 or resumo['total']['total_margem'] != 60000.0:
+            print(f"  ❌ Total incorreto: {resumo['total']}")
+            return False
+        print("  ✅ Totais gerais")
+        
+        norte = resumo['grupos']['regiao']['Norte']
+        # ROI ponderado pelo custo: 80.000 / 400.000
+        if norte['quantidade'] != 2 or abs(norte['roi_ponderado'] - 20.0) > 1e-9:
+            print(f"  ❌ Grupo Norte incorreto: {norte}")
+            return False
+        print("  ✅ ROI ponderado por região")
+        
+        if set(resumo['grupos']['status']) != {'em_analise', 'comprado'}:
+            print("  ❌ Agrupamento por status incorreto")
+            return False
+        print("  ✅ Agrupamentos por status e padrão na mesma passada")
+        
+        print("✅ Agregação funcionando!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro na agregação: {e}")
+        return False
+
+def test_historico():
+    """Testa o histórico de preços e a projeção de valorização"""
+    print("\n📈 Testando histórico de preços...")
+    
+    import tempfile
+    from datetime import datetime
+    from models.database import DatabaseManager
+    from models.imovel import Imovel
+    from services.historico_service import HistoricoService
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        service = HistoricoService(db_manager=DatabaseManager(os.path.join(pasta, "historico.db")))
+        imovel = Imovel(id=1, endereco="Rua A", cidade="Joinville", estado="SC",
+                        metragem=100.0, custo_aquisicao=300000.0)
+        
+        # Preço/m² crescendo 1% ao mês durante um ano
+        for mes in range(1, 13):
+            preco = 500000.0 * 1.01 ** (mes - 1)
+            gravados = service.registrar(imovel, {'preco_venda_estimado': preco, 'custo_total': 300000.0},
+                                         datetime(2024, mes, 15))
+            assert gravados == 1, f"Ponto de {mes:02d}/2024 não gravado"
+        
+        # Somente inserção: o ponto repetido não sobrescreve o existente
+        outro = Imovel(id=2, endereco="Rua B", cidade="Blumenau", estado="SC",
+                       metragem=50.0, custo_aquisicao=200000.0)
+        gravados = service.registrar_lote(
+            [imovel, outro],
+            [{'preco_venda_estimado': 1.0, 'custo_total': 1.0},
+             {'preco_venda_estimado': 250000.0, 'custo_total': 200000.0}],
+            datetime(2024, 1, 15))
+        assert gravados == 1, f"Conflito deveria gravar só o imóvel novo, gravou {gravados}"
+        ponto = service.valor_em(1, datetime(2024, 1, 31))
+        assert ponto['preco_estimado'] == 500000.0, f"Ponto existente foi sobrescrito: {ponto}"
+        print("  ✅ Conflitos preservam o ponto existente")
+        
+        assert len(service.consultar_intervalo(1, datetime(2024, 3, 1), datetime(2024, 5, 31))) == 3, \
+            "Consulta por intervalo incorreta"
+        print("  ✅ Consulta por intervalo")
+        
+        ponto = service.valor_em(1, datetime(2024, 6, 30))
+        assert ponto and ponto['registrado_em'].startswith('2024-06-15'), f"Valor no instante incorreto: {ponto}"
+        print("  ✅ Valor em um instante")
+        
+        anual = service.reamostrar('ano', imovel_id=1)
+        assert len(anual) == 1 and anual[0]['pontos'] == 12, f"Reamostragem incorreta: {anual}"
+        print("  ✅ Reamostragem anual")
+        
+        projecao = service.projetar_valorizacao(12)['Joinville']
+        assert projecao['meses_historico'] == 12, f"Série mensal incorreta: {projecao}"
+        esperado = (1.01 ** 12 - 1) * 100
+        assert abs(projecao['valorizacao_anual'] - esperado) < 1e-6, f"Valorização projetada incorreta: {projecao}"
+        print(f"  ✅ Valorização anual projetada: {projecao['valorizacao_anual']:.2f}%")
+        
+        # Agregado diário (sem fim) x pontos (com fim explícito) dão a mesma série
+        diario = service.reamostrar('mes', cidade='Joinville')
+        pontos = service.reamostrar('mes', cidade='Joinville', fim=datetime(2030, 1, 1))
+        assert diario == pontos, f"Agregado diário diverge dos pontos: {diario} x {pontos}"
+        total = service.reamostrar('ano')
+        assert len(total) == 1 and total[0]['pontos'] == 13, f"Reamostragem da carteira incorreta: {total}"
+        print("  ✅ Agregado diário acompanha as inserções")
+    
+    print("✅ Histórico de preços funcionando!")
+
+def test_historico_volume():
+    """Mede as consultas da carteira sobre milhões de pontos de histórico"""
+    print("\n🗄️ Testando histórico de preços com milhões de pontos...")
+    
+    import tempfile
+    import time
+    from datetime import datetime
+    from models.database import DatabaseManager
+    from models.imovel import Imovel
+    from services.historico_service import HistoricoService
+    
+    imoveis, dias = 10000, [f"2023-{mes:02d}-{dia:02d}" for mes in range(1, 9) for dia in range(1, 26)]
+    
+    def pontos():
+        for imovel in range(imoveis):
+            hora = f" {imovel // 3600 % 24:02d}:{imovel // 60 % 60:02d}:{imovel % 60:02d}.000000"
+            for n, dia in enumerate(dias):
+                yield (imovel, dia + hora, f"Cidade {imovel % 50}", 100.0,
+                       400000.0 + imovel * (1 + n / 1000), 300000.0, 'em_analise')
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "historico.db")
+        # Carga em massa de um histórico antigo, sem o agregado diário
+        with DatabaseManager(caminho).get_connection() as conn:
+            conn.execute("DROP TABLE imoveis_historico_diario")
+            conn.execute("DROP INDEX idx_historico_cidade_tempo")
+            conn.executemany("INSERT INTO imoveis_historico VALUES (?, ?, ?, ?, ?, ?, ?)", pontos())
+            conn.execute("CREATE INDEX idx_historico_cidade_tempo ON imoveis_historico(cidade, registrado_em)")
+        total = imoveis * len(dias)
+        
+        # Reabrir o banco monta o agregado diário a partir dos pontos
+        service = HistoricoService(db_manager=DatabaseManager(caminho))
+        conn = service.db_manager.get_connection()
+        
+        def medir(consulta):
+            inicio = time.perf_counter()
+            resultado = consulta()
+            return resultado, time.perf_counter() - inicio
+        
+        instante = '2023-05-10 12:00:00'
+        portfolio, tempo = medir(lambda: service.portfolio_em(instante))
+        referencia, tempo_varredura = medir(lambda: conn.execute("""
+            SELECT imovel_id, MAX(registrado_em), cidade, preco_estimado, custo_total, status
+            FROM imoveis_historico WHERE registrado_em <= ? GROUP BY imovel_id
+        """, (instante,)).fetchall())
+        assert [tuple(p.values()) for p in portfolio] == referencia, "Portfólio no instante diverge da varredura"
+        assert tempo < tempo_varredura, f"Portfólio ({tempo:.3f}s) não foi mais rápido que a varredura ({tempo_varredura:.3f}s)"
+        print(f"  ✅ Portfólio em um instante: {tempo:.3f}s x varredura {tempo_varredura:.3f}s")
+        
+        mensal, tempo = medir(lambda: service.reamostrar('mes'))
+        referencia, tempo_varredura = medir(lambda: conn.execute("""
+            SELECT substr(registrado_em, 1, 7) AS periodo, COUNT(*), SUM(preco_estimado) / SUM(metragem)
+            FROM imoveis_historico GROUP BY periodo ORDER BY periodo
+        """).fetchall())
+        assert [(m['periodo'], m['pontos']) for m in mensal] == [r[:2] for r in referencia], \
+            "Reamostragem mensal diverge da varredura"
+        assert all(abs(m['preco_m2'] - r[2]) < 1e-6 for m, r in zip(mensal, referencia))
+        assert tempo < tempo_varredura, f"Reamostragem ({tempo:.3f}s) não foi mais rápida que a varredura ({tempo_varredura:.3f}s)"
+        print(f"  ✅ Reamostragem mensal da carteira: {tempo:.3f}s x varredura {tempo_varredura:.3f}s")
+        
+        projecoes, tempo = medir(lambda: service.projetar_valorizacao(12))
+        assert len(projecoes) == 50, f"Projeção deveria cobrir 50 cidades: {len(projecoes)}"
+        assert tempo < tempo_varredura, f"Projeção ({tempo:.3f}s) não foi mais rápida que a varredura ({tempo_varredura:.3f}s)"
+        print(f"  ✅ Projeção de {len(projecoes)} cidades: {tempo:.3f}s")
+        
+        # Novos pontos entram no agregado na mesma transação
+        novo = Imovel(id=imoveis, endereco="Rua Nova", cidade="Cidade 0", estado="SC",
+                      metragem=100.0, custo_aquisicao=300000.0)
+        service.registrar(novo, {'preco_venda_estimado': 500000.0, 'custo_total': 300000.0},
+                          datetime(2023, 8, 25, 12))
+        agosto = service.reamostrar('mes', inicio=datetime(2023, 8, 1))
+        assert agosto[0]['pontos'] == imoveis * 25 + 1, f"Ponto novo fora do agregado: {agosto}"
+        conn.close()
+    
+    print(f"✅ Consultas rápidas com {total:,} pontos de histórico!")
+
+def _iniciar_servidor_ibge(cidades, atraso=0.0):
+    """Sobe um servidor HTTP local que imita a API de localidades do IBGE"""
+    import gzip
+    import json
+    import hashlib
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    por_codigo = {str(cidade['id']): cidade for cidade in cidades}
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            servidor.requisicoes += 1
+            if self.path.endswith('/municipios') and '/estados/' in self.path:
+                # Cidades com 'estado' (código IBGE da UF) só aparecem na lista da sua UF
+                estado = int(self.path.split('/')[-2])
+                corpo = [{'id': c['id'], 'nome': c['nome'],
+                          'microrregiao': {'mesorregiao': {'nome': c.get('mesorregiao', 'Central')}}}
+                         for c in cidades if c.get('estado', estado) == estado]
+            elif self.path.split('/')[-1] in por_codigo:
+                time.sleep(atraso)
+                corpo = por_codigo[self.path.split('/')[-1]]
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            dados = json.dumps(corpo).encode('utf-8')
+            etag = '"%s"' % hashlib.md5(dados).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('ETag', etag)
+            if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                dados = gzip.compress(dados)
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+        
+        def log_message(self, *args):
+            pass
+    
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    servidor.requisicoes = 0
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}"
+
+def test_sincronizacao_cidades():
+    """Testa a sincronização concorrente de cidades contra um servidor local"""
+    print("\n🌐 Testando sincronização concorrente de cidades...")
+    
+    try:
+        import tempfile
+        import time
+        from services.cidade_service import CidadeService
+        
+        cidades = [
+            {'id': 4200000 + i, 'nome': f"Cidade {i:02d}",
+             'centroide': {'lat': -27.0 - i / 100, 'lon': -49.0 - i / 100}}
+            for i in range(40)
+        ]
+        atraso = 0.05
+        servidor, base = _iniciar_servidor_ibge(cidades, atraso)
+        try:
+            with tempfile.TemporaryDirectory() as pasta:
+                service = CidadeService(os.path.join(pasta, "cidades.db"), api_base=base,
+                                        max_concorrencia=8, requisicoes_por_segundo=200)
+                inicio = time.perf_counter()
+                if not service.sincronizar_cidades(forcar_atualizacao=True):
+                    print("  ❌ Sincronização falhou")
+                    return False
+                duracao = time.perf_counter() - inicio
+                sequencial = len(cidades) * atraso
+                print(f"  ✅ {len(cidades)} cidades em {duracao:.2f}s (sequencial: ≥{sequencial:.2f}s)")
+                
+                if duracao >= sequencial:
+                    print("  ❌ Sincronização não foi mais rápida que a sequencial")
+                    return False
+                
+                cidade = service.buscar_cidade_por_nome("Cidade 07")
+                if not cidade or abs(cidade['latitude'] + 27.07) > 1e-9:
+                    print(f"  ❌ Coordenadas incorretas: {cidade}")
+                    return False
+                print("  ✅ Coordenadas preservadas na ordem")
+                
+                # Segunda sincronização sem mudanças: a lista volta 304 e nada mais é buscado
+                antes = servidor.requisicoes
+                if not service.sincronizar_cidades(forcar_atualizacao=True):
+                    print("  ❌ Sincronização condicional falhou")
+                    return False
+                if servidor.requisicoes - antes != 1 or service.http.estatisticas['nao_modificados'] != 1:
+                    print(f"  ❌ Sincronização sem mudanças fez {servidor.requisicoes - antes} requisições")
+                    return False
+                print("  ✅ Sincronização sem mudanças com uma requisição condicional")
+                
+                # Renomear um município: só a linha alterada é regravada
+                import sqlite3
+                consulta = "SELECT ultima_atualizacao FROM cidades_sc WHERE codigo_ibge = ?"
+                with sqlite3.connect(service.db_path) as conn:
+                    antes_inalterada = conn.execute(consulta, ('4200001',)).fetchone()[0]
+                cidades[0]['nome'] = "Cidade Renomeada"
+                if not service.sincronizar_cidades(forcar_atualizacao=True):
+                    print("  ❌ Sincronização incremental falhou")
+                    return False
+                with sqlite3.connect(service.db_path) as conn:
+                    depois_inalterada = conn.execute(consulta, ('4200001',)).fetchone()[0]
+                metadados = service.get_metadados_sincronizacao()
+                if (not service.buscar_cidade_por_nome("Cidade Renomeada")
+                        or antes_inalterada != depois_inalterada
+                        or metadados['total_cidades'] != len(cidades)
+                        or not metadados['versao_fonte'].startswith('ibge:')):
+                    print(f"  ❌ Sincronização incremental incorreta: {metadados}")
+                    return False
+                print("  ✅ UPSERT incremental grava só as cidades alteradas")
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+        
+        print("✅ Sincronização de cidades funcionando!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro na sincronização de cidades: {e}")
+        return False
+
+def test_snapshot_cidades():
+    """Testa a carga do catálogo de municípios distribuído com a aplicação"""
+    print("\n📦 Testando snapshot de municípios...")
+    
+    import tempfile
+    import time
+    from services.cidade_service import CidadeService
+    from services.proximidade_cidades import tem_centroide
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        service = CidadeService(os.path.join(pasta, "cidades.db"))
+        inicio = time.perf_counter()
+        assert service.garantir_cidades_locais(), "Snapshot não foi carregado"
+        duracao = (time.perf_counter() - inicio) * 1000
+        
+        total = len(service.get_todas_cidades())
+        assert total == 295, f"Esperadas 295 cidades, carregadas {total}"
+        print(f"  ✅ {total} cidades carregadas em {duracao:.1f}ms")
+        
+        florianopolis = service.buscar_cidade_por_nome("Florianópolis")
+        assert florianopolis and florianopolis['latitude'] and florianopolis['regiao'] == "Leste", \
+            f"Dados de Florianópolis incorretos: {florianopolis}"
+        print("  ✅ Região e centróide preservados")
+        
+        # O snapshot declara quantos centroides são aproximados ou ausentes
+        centroides = service.carregar_snapshot()['centroides']
+        sem_centroide = service.get_catalogo().indice_proximidade.sem_centroide
+        assert sum(centroides.values()) == total, f"Contagem de centroides incompleta: {centroides}"
+        assert len(sem_centroide) == centroides['ausentes'] > 0, \
+            f"Índice de proximidade ignora {len(sem_centroide)} municípios, snapshot declara {centroides}"
+        assert not any(tem_centroide(cidade) for cidade in sem_centroide)
+        regiao = service.classificar_coordenadas([(None, None), (0, 0)])
+        assert [r['regiao'] for r in regiao] == [None, None], f"Ponto sem coordenadas classificado: {regiao}"
+        print(f"  ✅ Centroides declarados: {centroides}")
+        
+        # Uma segunda chamada não duplica nem regrava o catálogo
+        service.garantir_cidades_locais()
+        assert len(service.get_todas_cidades()) == total, "Snapshot importado duas vezes"
+        print("  ✅ Importação idempotente")
+    
+    print("✅ Snapshot de municípios funcionando!")
+
+def test_primeira_pintura_filtros():
+    """Mede o tempo até a primeira pintura dos filtros com e sem rede"""
+    print("\n⏱️ Testando tempo até a primeira pintura dos filtros...")
+    
+    try:
+        import tempfile
+        import time
+        from datetime import timedelta
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtWidgets import QApplication
+        from services.cidade_service import CidadeService
+        from ui.filtros_widget import FiltrosWidget
+        
+        app = QApplication.instance() or QApplication([])
+        cidades = [
+            {'id': 4300000 + i, 'nome': f"Município {i:02d}",
+             'centroide': {'lat': -27.0, 'lon': -49.0}}
+            for i in range(40)
+        ]
+        servidor, base = _iniciar_servidor_ibge(cidades, atraso=0.05)
+        try:
+            # Porta fechada: simula a máquina sem rede
+            cenarios = [("com rede", base), ("sem rede", "http://127.0.0.1:9")]
+            for nome, api_base in cenarios:
+                with tempfile.TemporaryDirectory() as pasta:
+                    service = CidadeService(os.path.join(pasta, "cidades.db"), api_base=api_base,
+                                            requisicoes_por_segundo=200, timeout=2.0)
+                    service.cache_duration = timedelta(0)  # snapshot sempre desatualizado
+                    inicio = time.perf_counter()
+                    widget = FiltrosWidget(cidade_service=service)
+                    widget.show()
+                    app.processEvents()
+                    primeira_pintura = time.perf_counter() - inicio
+                    
+                    if widget.cidade_combo.count() <= 1:
+                        print(f"  ❌ Combo de cidades vazio na primeira pintura ({nome})")
+                        return False
+                    
+                    widget.sincronizacao_thread.wait(15000)
+                    app.processEvents()
+                    sincronizacao = time.perf_counter() - inicio
+                    print(f"  ✅ {nome}: primeira pintura em {primeira_pintura * 1000:.0f}ms, "
+                          f"sincronização em {sincronizacao * 1000:.0f}ms")
+                    
+                    if api_base == base and widget.cidade_combo.findText("Município 07") < 0:
+                        print("  ❌ Combos não foram atualizados após a sincronização")
+                        return False
+                    widget.close()
+                    widget.deleteLater()
+                    app.processEvents()
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+        
+        print("✅ Filtros pintam antes da sincronização terminar!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no tempo até a primeira pintura: {e}")
+        return False
+
+def test_disjuntor():
+    """Testa o disjuntor das chamadas externas e a falha rápida sem rede"""
+    print("\n🔌 Testando disjuntor de chamadas externas...")
+    
+    import tempfile
+    import threading
+    import time
+    import requests
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from services.http_client import ClienteHTTP, DisjuntorCircuito
+    from services.cidade_service import CidadeService
+    
+    agora = [0.0]
+    disjuntor = DisjuntorCircuito(limite_falhas=3, espera_inicial=5.0, relogio=lambda: agora[0])
+    for _ in range(3):
+        disjuntor.registrar_falha()
+    assert disjuntor.estado == DisjuntorCircuito.ABERTO and not disjuntor.permitir(), \
+        f"Circuito deveria abrir após 3 falhas: {disjuntor.metricas()}"
+    print("  ✅ Abre após falhas consecutivas e recusa chamadas")
+    
+    agora[0] = 5.0
+    assert disjuntor.permitir() and not disjuntor.permitir(), "Meio-aberto deveria liberar uma única chamada de teste"
+    disjuntor.registrar_falha()
+    assert disjuntor.metricas()['espera_atual'] == 10.0, f"Backoff exponencial incorreto: {disjuntor.metricas()}"
+    print("  ✅ Meio-aberto com uma chamada de teste e backoff exponencial")
+    
+    agora[0] = 15.0
+    disjuntor.permitir()
+    disjuntor.registrar_sucesso()
+    metricas = disjuntor.metricas()
+    assert (metricas['estado'] == DisjuntorCircuito.FECHADO and metricas['aberturas'] == 2
+            and metricas['recuperacoes'] == 1 and metricas['chamadas_bloqueadas'] == 2), \
+        f"Métricas incorretas: {metricas}"
+    print(f"  ✅ Recuperação registrada: {metricas['aberturas']} aberturas, {metricas['recuperacoes']} recuperação")
+    
+    # Chamadas de teste que terminam em qualquer exceção também reabrem o circuito
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/ciclo':
+                self.send_response(302)
+                self.send_header('Location', '/ciclo')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            corpo = b'{"ok": true}' if self.path == '/ok' else b'<html>manutencao</html>'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+        
+        def log_message(self, *args):
+            pass
+    
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+    try:
+        agora[0] = 0.0
+        disjuntor = DisjuntorCircuito(limite_falhas=1, espera_inicial=5.0, relogio=lambda: agora[0])
+        cliente = ClienteHTTP(timeout=2.0, disjuntor=disjuntor)
+        for caminho, erro in (('/invalido', ValueError), ('/ciclo', requests.TooManyRedirects)):
+            disjuntor.registrar_falha()
+            agora[0] += disjuntor.metricas()['espera_atual']
+            try:
+                cliente.get_json(base + caminho)
+                raise AssertionError(f"{caminho} deveria falhar")
+            except erro:
+                pass
+            assert disjuntor.estado == DisjuntorCircuito.ABERTO, \
+                f"Teste com {erro.__name__} não reabriu o circuito: {disjuntor.metricas()}"
+        agora[0] += disjuntor.metricas()['espera_atual']
+        assert cliente.get_json(base + '/ok').dados == {'ok': True}
+        assert disjuntor.estado == DisjuntorCircuito.FECHADO, f"Circuito não fechou: {disjuntor.metricas()}"
+        cliente.fechar()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+    print("  ✅ JSON inválido e redirecionamentos em ciclo reabrem o circuito")
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        # Porta fechada: simula a API inacessível
+        service = CidadeService(os.path.join(pasta, "cidades.db"), api_base="http://127.0.0.1:9")
+        inicio = time.perf_counter()
+        sucesso = service.sincronizar_cidades(forcar_atualizacao=True)
+        duracao = time.perf_counter() - inicio
+        assert not sucesso and duracao <= 2.0, f"Sincronização sem rede deveria falhar rápido ({duracao:.2f}s)"
+        print(f"  ✅ Sem rede, sincronização falha em {duracao * 1000:.0f}ms")
+    
+    print("✅ Disjuntor funcionando!")
+
+def test_busca_cidades():
+    """Testa o índice de busca de cidades sem acentos"""
+    print("\n🔎 Testando busca de cidades...")
+    
+    try:
+        import time
+        from services.busca_cidades import IndiceBuscaCidades, normalizar
+        
+        indice = IndiceBuscaCidades([
+            ("São José", "Leste"), ("São Joaquim", "Sul"), ("José Boiteux", "Norte"),
+            ("Florianópolis", "Leste"), ("Flor do Sertão", "Oeste"), ("Criciúma", "Sul"),
+            ("Herval d'Oeste", "Oeste"), ("Blumenau", "Norte"),
+        ])
+        
+        if normalizar("  São   José ") != "sao jose":
+            print("  ❌ Normalização incorreta")
+            return False
+        
+        if indice.buscar("sao jo")[:2] != ["São José", "São Joaquim"]:
+            print(f"  ❌ Busca por prefixo incorreta: {indice.buscar('sao jo')}")
+            return False
+        print("  ✅ Prefixo sem acentos")
+        
+        if indice.buscar("jose")[0] != "José Boiteux" or "São José" not in indice.buscar("jose"):
+            print(f"  ❌ Busca por início de palavra incorreta: {indice.buscar('jose')}")
+            return False
+        print("  ✅ Início de palavra, com o nome começando pela consulta primeiro")
+        
+        if indice.melhor("blumenao") != "Blumenau" or indice.melhor("criciuma") != "Criciúma":
+            print("  ❌ Busca aproximada incorreta")
+            return False
+        print("  ✅ Tolerância a erros de digitação")
+        
+        # Trecho do meio da palavra: as bordas da consulta não existem no nome
+        if indice.buscar("lume") != ["Blumenau"] or indice.buscar("ianop") != ["Florianópolis"]:
+            print(f"  ❌ Busca por trecho incorreta: {indice.buscar('lume')} / {indice.buscar('ianop')}")
+            return False
+        print("  ✅ Trecho no meio do nome")
+        
+        if indice.buscar("sao", regiao="Sul") != ["São Joaquim"]:
+            print(f"  ❌ Filtro por região incorreto: {indice.buscar('sao', regiao='Sul')}")
+            return False
+        print("  ✅ Filtro por região")
+        
+        inicio = time.perf_counter()
+        for _ in range(1000):
+            indice.buscar("flor")
+        media_us = (time.perf_counter() - inicio) * 1000
+        print(f"  ✅ Busca média em {media_us:.1f}µs")
+        
+        print("✅ Busca de cidades funcionando!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro na busca de cidades: {e}")
+        return False
+
+def test_catalogo_cidades():
+    """Testa o catálogo de municípios em memória compartilhado"""
+    print("\n🗂️ Testando catálogo de municípios em memória...")
+    
+    try:
+        import tempfile
+        from services.cidade_service import CidadeService
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            db_path = os.path.join(pasta, "cidades.db")
+            service = CidadeService(db_path)
+            service.garantir_cidades_locais()
+            outro = CidadeService(db_path)
+            
+            catalogo = service.get_catalogo()
+            if outro.get_catalogo() is not catalogo:
+                print("  ❌ Serviços do mesmo banco não compartilham o catálogo")
+                return False
+            print(f"  ✅ Catálogo único com {len(catalogo)} cidades")
+            
+            florianopolis = service.buscar_cidade_por_nome("florianopolis")
+            if not florianopolis or service.get_cidade_por_codigo(florianopolis['codigo_ibge'])['nome'] != "Florianópolis":
+                print(f"  ❌ Consulta por nome/código incorreta: {florianopolis}")
+                return False
+            print("  ✅ Consultas por nome e por código IBGE")
+            
+            por_regiao = sum(len(service.get_cidades_por_regiao(r)) for r in service.get_regioes_disponiveis())
+            if por_regiao != len(catalogo):
+                print("  ❌ Listas por região não cobrem o catálogo")
+                return False
+            print("  ✅ Listas por região pré-calculadas")
+            
+            # Sincronização invalida o catálogo de todos os serviços
+            cidades = service.get_cidades_por_regiao()
+            cidades[0] = dict(cidades[0], nome="Cidade Nova", fonte='ibge')
+            service._atualizar_cidades_locais(cidades)
+            if outro.get_catalogo() is catalogo or not outro.buscar_cidade_por_nome("Cidade Nova"):
+                print("  ❌ Catálogo não foi invalidado após a sincronização")
+                return False
+            print("  ✅ Invalidação após sincronização")
+            
+            antes = outro.get_catalogo()
+            expirado = CidadeService(db_path, catalogo_ttl=0).get_catalogo()
+            if expirado is antes:
+                print("  ❌ TTL não expirou o catálogo")
+                return False
+            print("  ✅ Expiração por TTL")
+        
+        print("✅ Catálogo de municípios funcionando!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro no catálogo de municípios: {e}")
+        return False
+
+def test_varias_ufs():
+    """Testa o cadastro particionado por UF: sincronização independente e escala nacional"""
+    print("\n🇧🇷 Testando cidades de várias UFs...")
+    
+    try:
+        import sqlite3
+        import tempfile
+        import time
+        from services.cidade_service import CidadeService
+        
+        cidades = [
+            {'id': codigo * 100000 + i, 'nome': f"Cidade {i:02d}", 'estado': codigo,
+             'mesorregiao': f"Mesorregião {codigo}",
+             'centroide': {'lat': -25.0 - i / 100, 'lon': -50.0 - i / 100}}
+            for codigo in (41, 42) for i in range(10)
+        ]
+        servidor, base = _iniciar_servidor_ibge(cidades)
+        try:
+            with tempfile.TemporaryDirectory() as pasta:
+                db_path = os.path.join(pasta, "cidades.db")
+                service = CidadeService(db_path, api_base=base, requisicoes_por_segundo=500, ufs=('SC', 'PR'))
+                if not service.sincronizar_cidades(forcar_atualizacao=True):
+                    print("  ❌ Sincronização das UFs falhou")
+                    return False
+                if len(service.get_cidades_por_uf('SC')) != 10 or len(service.get_cidades_por_uf('PR')) != 10:
+                    print(f"  ❌ Partições incorretas: {service.get_estatisticas().get('cidades_por_uf')}")
+                    return False
+                # Mesmo nome em duas UFs: listado uma vez, desambiguado pela UF
+                if service.get_todas_cidades().count("Cidade 03") != 1 or \
+                        service.buscar_cidade_por_nome("Cidade 03", 'PR')['uf'] != 'PR':
+                    print("  ❌ Nomes repetidos entre UFs mal resolvidos")
+                    return False
+                if service.buscar_cidade_por_nome("Cidade 03", 'PR')['regiao'] != "Mesorregião 41":
+                    print("  ❌ Região fora de SC não veio da mesorregião do IBGE")
+                    return False
+                print("  ✅ 2 UFs sincronizadas em partições separadas")
+                
+                # Sincronizar só PR não toca SC (nem seus metadados)
+                sc_antes = service.get_metadados_sincronizacao('SC')
+                cidades[:] = [c for c in cidades if c['id'] != 4100009]
+                service.sincronizar_cidades(forcar_atualizacao=True, ufs=['PR'])
+                if len(service.get_cidades_por_uf('PR')) != 9 or len(service.get_cidades_por_uf('SC')) != 10 \
+                        or service.get_metadados_sincronizacao('SC') != sc_antes:
+                    print("  ❌ Sincronização de uma UF afetou outra")
+                    return False
+                print("  ✅ Sincronização independente por UF")
+                
+                # Escala nacional: ~5.570 municípios em 27 UFs
+                with sqlite3.connect(db_path) as conn:
+                    conn.executemany("""
+                        INSERT INTO cidades_sc (codigo_ibge, nome, regiao, uf) VALUES (?, ?, ?, ?)
+                    """, [(str(9000000 + i), f"Município Nacional {i:04d}", f"Região {i % 137}", f"U{i % 27}")
+                          for i in range(5570)])
+                service.catalogo_ttl = 0
+                inicio = time.perf_counter()
+                catalogo = service.get_catalogo()
+                carga = time.perf_counter() - inicio
+                service.catalogo_ttl = 300
+                inicio = time.perf_counter()
+                for consulta in ("munic", "nacional 12", "municpio nacinal 0042", "cidade"):
+                    service.buscar_cidades(consulta)
+                busca = (time.perf_counter() - inicio) / 4
+                print(f"  ✅ {len(catalogo)} cidades: carga {carga * 1000:.0f}ms, busca {busca * 1000:.1f}ms")
+                if carga > 2.0 or busca > 0.1:
+                    print("  ❌ Catálogo nacional lento demais")
+                    return False
+        finally:
+            servidor.shutdown()
+        
+        print("✅ Cidades de várias UFs funcionando!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro nas cidades de várias UFs: {e}")
+        return False
+
+def test_regioes_geograficas():
+    """Testa a classificação de coordenadas por polígonos com índice espacial"""
+    print("\n🗺️ Testando classificação por polígonos...")
+    
+    try:
+        import gzip
+        import json
+        import random
+        import tempfile
+        import time
+        from services import regioes_geograficas
+        from services.cidade_service import CidadeService
+        
+        def quadrado(x0, y0, x1, y1):
+            return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+        
+        # Duas mesorregiões lado a lado (a leste com um buraco) e uma microrregião em cada
+        feicoes = [
+            {'type': 'Feature', 'properties': {'nivel': 'mesorregiao', 'codigo': '4201', 'nome': 'Oeste Catarinense'},
+             'geometry': {'type': 'Polygon', 'coordinates': [quadrado(-54, -28, -51, -26)]}},
+            {'type': 'Feature', 'properties': {'nivel': 'mesorregiao', 'codigo': '4205', 'nome': 'Grande Florianópolis'},
+             'geometry': {'type': 'MultiPolygon', 'coordinates': [
+                 [quadrado(-51, -28, -48, -26), quadrado(-50, -27.5, -49.5, -27)]]}},
+            {'type': 'Feature', 'properties': {'nivel': 'microrregiao', 'codigo': '42001', 'nome': 'Chapecó',
+                                               'mesorregiao': 'Oeste Catarinense'},
+             'geometry': {'type': 'Polygon', 'coordinates': [quadrado(-53, -27.5, -52, -26.5)]}},
+        ]
+        with tempfile.TemporaryDirectory() as pasta:
+            with gzip.open(os.path.join(pasta, "regioes_sc.geojson.gz"), 'wt', encoding='utf-8') as arquivo:
+                json.dump({'type': 'FeatureCollection', 'features': feicoes}, arquivo)
+            
+            classificador = regioes_geograficas.carregar_malha(os.path.join(pasta, "regioes_sc.geojson.gz"))
+            casos = [
+                ((-27.1, -52.6), ('Oeste Catarinense', 'Chapecó')),
+                ((-26.5, -50.5), ('Grande Florianópolis', None)),
+                ((-27.2, -49.7), (None, None)),   # dentro do buraco
+                ((-30.0, -50.0), (None, None)),   # fora da malha
+            ]
+            for (lat, lon), esperado in casos:
+                resultado = classificador.classificar(lat, lon)
+                if (resultado['mesorregiao'], resultado['microrregiao']) != esperado:
+                    print(f"  ❌ ({lat}, {lon}) classificado como {resultado}")
+                    return False
+            print("  ✅ Ponto no polígono com buracos e microrregiões")
+            
+            # Lote: mesmo resultado ponto a ponto, bem mais rápido
+            aleatorio = random.Random(42)
+            pontos = [(aleatorio.uniform(-28.5, -25.5), aleatorio.uniform(-54.5, -47.5)) for _ in range(2000)] * 50
+            pontos.append((None, None))
+            inicio = time.perf_counter()
+            lote = classificador.classificar_lote(pontos)
+            duracao = time.perf_counter() - inicio
+            unitarios = [classificador.classificar(lat, lon) for lat, lon in pontos[:2000]]
+            if lote[:2000] != unitarios or lote[-1] != {'mesorregiao': None, 'microrregiao': None}:
+                print("  ❌ Lote diverge da classificação ponto a ponto")
+                return False
+            print(f"  ✅ {len(pontos)} pontos classificados em lote em {duracao * 1000:.0f}ms")
+            
+            # Serviço: região da aplicação pela malha local, limites aproximados sem ela
+            service = CidadeService(os.path.join(pasta, "cidades.db"))
+            diretorio_original = regioes_geograficas.DIRETORIO_MALHAS
+            try:
+                regioes_geograficas.DIRETORIO_MALHAS = pasta
+                regioes_geograficas.invalidar_classificadores()
+                regioes = [r['regiao'] for r in service.classificar_coordenadas([(-27.1, -52.6), (-26.5, -50.5)])]
+                regioes_geograficas.DIRETORIO_MALHAS = os.path.join(pasta, "sem_malha")
+                regioes_geograficas.invalidar_classificadores()
+                aproximada = service.get_regiao_por_coordenadas(-27.1, -52.6)
+            finally:
+                regioes_geograficas.DIRETORIO_MALHAS = diretorio_original
+                regioes_geograficas.invalidar_classificadores()
+            if regioes != ["Oeste", "Leste"] or aproximada != "Oeste":
+                print(f"  ❌ Regiões do serviço incorretas: {regioes}, {aproximada}")
+                return False
+            print("  ✅ Regiões da aplicação pela malha, com fallback aproximado")
+            
+            if service._get_coordenadas_aproximadas("Ouro Verde")['latitude'] != -26.7 or \
+                    service._get_coordenadas_aproximadas("Nova Trento")['latitude'] != -27.2833:
+                print("  ❌ Coordenadas aproximadas incorretas")
+                return False
+            print("  ✅ Coordenadas aproximadas por nome")
+        
+        print("✅ Classificação por polígonos funcionando!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro na classificação por polígonos: {e}")
+        return False
+
+def test_geocodificacao_cep():
+    """Testa a resolução de CEPs com cache local e fonte substituível"""
+    print("\n📮 Testando geocodificação de CEPs...")
+    
+    try:
+        import sqlite3
+        import tempfile
+        from models.database import DatabaseManager
+        from services.cep_service import CepService, FonteCEP
+        from services.cidade_service import CidadeService
+        
+        class FonteLocal(FonteCEP):
+            def __init__(self):
+                self.consultas = []
+                self.falhar = set()
+            
+            def consultar(self, cep):
+                self.consultas.append(cep)
+                if cep in self.falhar:
+                    raise ConnectionError("fonte fora do ar")
+                if cep == '88015600':
+                    return {'logradouro': 'Rua Felipe Schmidt', 'bairro': 'Centro', 'cidade': 'Florianópolis',
+                            'uf': 'SC', 'latitude': -27.5966, 'longitude': -48.5525}
+                if cep == '89010000':
+                    return {'logradouro': None, 'bairro': 'Centro', 'cidade': 'Blumenau', 'uf': 'SC',
+                            'latitude': None, 'longitude': None}
+                return None
+        
+        # Fonte sem consultar é recusada ao ser criada, não na primeira consulta
+        class FonteIncompleta(FonteCEP):
+            pass
+        try:
+            FonteIncompleta()
+            print("  ❌ Fonte sem consultar aceita")
+            return False
+        except TypeError:
+            pass
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            db_path = os.path.join(pasta, "ceps.db")
+            DatabaseManager(db_path)
+            CidadeService(db_path)._atualizar_cidades_locais([
+                {'codigo_ibge': '4202404', 'nome': 'Blumenau', 'regiao': 'Norte',
+                 'latitude': -26.9189, 'longitude': -49.0661, 'populacao': 0, 'fonte': 'ibge'}])
+            fonte = FonteLocal()
+            service = CepService(db_path, fonte=fonte, requisicoes_por_segundo=1000)
+            
+            # Lote com repetidos e formatos variados: cada CEP válido vai à fonte uma vez
+            resultado = service.resolver_lote(['88015-600', '88015600', '89010-000', '99999-999', 'abc', None])
+            if sorted(fonte.consultas) != ['88015600', '89010000', '99999999'] or len(resultado) != 3:
+                print(f"  ❌ Lote não deduplicado: {fonte.consultas}")
+                return False
+            if resultado['88015600']['bairro'] != 'Centro' or resultado['99999999'] is not None:
+                print(f"  ❌ Resultado incorreto: {resultado}")
+                return False
+            blumenau = resultado['89010000']
+            if (blumenau['latitude'], blumenau['precisao']) != (-26.9189, 'municipio'):
+                print(f"  ❌ Centroide do município não usado: {blumenau}")
+                return False
+            print("  ✅ Lote deduplicado, com centroide do município como aproximação")
+            
+            # Consultas repetidas (inclusive de CEP inexistente) não usam a fonte
+            service.resolver('88015-600')
+            service.resolver_lote(['89010000', '99999999'])
+            if len(fonte.consultas) != 3:
+                print("  ❌ Consulta repetida foi à fonte")
+                return False
+            print("  ✅ Consultas repetidas respondidas pelo cache local")
+            
+            # Falha da fonte não é gravada: a próxima chamada tenta de novo
+            fonte.falhar.add('88020000')
+            if service.resolver('88020-000') is not None:
+                print("  ❌ Falha da fonte devolveu dados")
+                return False
+            fonte.falhar.clear()
+            service.resolver('88020-000')
+            if fonte.consultas.count('88020000') != 2:
+                print("  ❌ Falha da fonte ficou no cache")
+                return False
+            print("  ✅ Falhas de rede não entram no cache")
+            
+            # Imóveis sem coordenadas preenchidos pelo CEP
+            with sqlite3.connect(db_path) as conn:
+                conn.executemany("""
+                    INSERT INTO imoveis (endereco, cidade, estado, cep, metragem, custo_aquisicao)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, [("Rua A", "Florianópolis", "SC", "88015-600", 80.0, 300000.0),
+                      ("Rua B", "Blumenau", "SC", "89010-000", 90.0, 350000.0),
+                      ("Rua C", "Lages", "SC", "99999-999", 70.0, 250000.0)])
+            consultas = len(fonte.consultas)
+            if service.completar_coordenadas_imoveis() != 2 or len(fonte.consultas) != consultas:
+                print("  ❌ Preenchimento das coordenadas dos imóveis incorreto")
+                return False
+            print("  ✅ Coordenadas de imóveis preenchidas em lote, sem nova consulta")
+        
+        print("✅ Geocodificação de CEPs funcionando!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro na geocodificação de CEPs: {e}")
+        return False
+
+def test_municipio_mais_proximo():
+    """Testa a associação de imóveis ao município mais próximo (árvore KD)"""
+    print("\n📍 Testando município mais próximo...")
+    
+    import random
+    import tempfile
+    import time
+    from services.cidade_service import CidadeService
+    from services.proximidade_cidades import distancia_km
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        service = CidadeService(os.path.join(pasta, "cidades.db"))
+        service.garantir_cidades_locais()
+        indice = service.get_catalogo().indice_proximidade
+        
+        # Árvore KD confere com a busca exaustiva
+        aleatorio = random.Random(7)
+        for _ in range(300):
+            lat, lon = aleatorio.uniform(-29.3, -26.0), aleatorio.uniform(-53.8, -48.3)
+            cidade, distancia = indice.mais_proximo(lat, lon)
+            exaustiva = min(distancia_km(lat, lon, c['latitude'], c['longitude']) for c in indice.cidades)
+            assert distancia <= exaustiva + 0.5, \
+                f"({lat:.3f}, {lon:.3f}) -> {cidade['nome']} a {distancia:.1f} km (melhor: {exaustiva:.1f})"
+        print(f"  ✅ Árvore KD sobre {len(indice)} centroides confere com a busca exaustiva")
+        
+        sem_centroide = service.buscar_cidade_por_nome("Abdon Batista")
+        assert sem_centroide and sem_centroide['latitude'] is None, f"Abdon Batista deveria estar sem centroide: {sem_centroide}"
+        imoveis = [
+            {'id': 1, 'cidade': 'Blumenau', 'estado': 'SC', 'latitude': -26.92, 'longitude': -49.07},
+            {'id': 2, 'cidade': 'Florianópolis', 'estado': 'SC', 'latitude': -26.30, 'longitude': -48.85},
+            {'id': 3, 'cidade': 'Blumenal', 'estado': 'SC', 'latitude': -26.91, 'longitude': -49.06},
+            {'id': 4, 'cidade': 'Blumenau', 'estado': 'SC', 'latitude': None, 'longitude': None},
+            {'id': 5, 'cidade': 'Abdon Batista', 'estado': 'SC', 'latitude': -27.61, 'longitude': -51.02},
+        ]
+        associacoes = {a['imovel_id']: a for a in service.associar_imoveis(imoveis)}
+        assert set(associacoes) == {1, 2, 3, 5}, f"Associação incorreta: {associacoes}"
+        assert associacoes[1]['divergente'] is False
+        assert associacoes[2]['municipio'] == 'Joinville' and associacoes[2]['divergente'] is True
+        assert associacoes[3]['divergente'] is True
+        print("  ✅ Cidade digitada divergente sinalizada")
+        assert associacoes[5]['divergente'] is None, f"Cidade sem centroide não pode ser verificada: {associacoes[5]}"
+        print(f"  ✅ Cidade sem centroide fica indeterminada (mais próximo com centroide: {associacoes[5]['municipio']})")
+        
+        # 100 mil imóveis em torno dos centroides, em lote, idêntico à consulta individual
+        pontos = []
+        for _ in range(100000):
+            centro = aleatorio.choice(indice.cidades)
+            pontos.append((round(centro['latitude'] + aleatorio.gauss(0, 0.05), 5),
+                           round(centro['longitude'] + aleatorio.gauss(0, 0.05), 5)))
+        inicio = time.perf_counter()
+        lote = indice.mais_proximos_lote(pontos)
+        duracao = time.perf_counter() - inicio
+        assert all(lote[i][0] is indice.mais_proximo(*pontos[i])[0] for i in range(0, len(pontos), 97)), \
+            "Lote diverge da consulta individual"
+        print(f"  ✅ {len(pontos)} imóveis associados em {duracao * 1000:.0f}ms")
+        assert duracao <= 1.0, "Associação em lote lenta demais"
+    
+    print("✅ Município mais próximo funcionando!")
+
 def test_export_service():
     """Testa o serviço de exportação"""
     print("\n📊 Testando serviço de exportação...")
@@ -184,6 +1378,524 @@ def test_export_service():
         print(f"❌ Erro no serviço de exportação: {e}")
         return False
 
+def test_exportacao_excel():
+    """Testa a exportação Excel em modo streaming (write-only)"""
+    print("\n📗 Testando exportação Excel em streaming...")
+    
+    import tempfile
+    import time
+    import tracemalloc
+    import openpyxl
+    from models.database import DatabaseManager
+    from models.imovel import Imovel
+    from services.export_service import ExportService
+    
+    def gerar(n):
+        for i in range(n):
+            yield Imovel(
+                endereco=f"Rua {i}", cidade="Blumenau", estado="SC", cep=f"89{i:06d}"[:8],
+                metragem=50.0 + i % 200, quartos=2, banheiros=1, ano=2000,
+                padrao_acabamento=('baixo', 'medio', 'alto')[i % 3],
+                custo_aquisicao=200000.0 + i, custos_reforma=10000.0, custos_transacao=5000.0
+            )
+    
+    indicadores = [{'nome': 'Preço m²', 'expressao': 'preco_venda_estimado / metragem', 'formato': 'moeda'}]
+    with tempfile.TemporaryDirectory() as pasta:
+        service = ExportService(DatabaseManager(os.path.join(pasta, "export.db")))
+        picos = {}
+        for n in (1000, 5000):
+            caminho = os.path.join(pasta, f"imoveis_{n}.xlsx")
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            ok = service.export_to_excel(gerar(n), caminho, {'cidade': 'Blumenau'}, indicadores)
+            duracao = time.perf_counter() - inicio
+            picos[n] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            assert ok, f"Exportação de {n} imóveis falhou"
+            print(f"  ✅ {n} imóveis em {duracao:.2f}s (pico {picos[n] / 1024 / 1024:.1f} MB)")
+        
+        wb = openpyxl.load_workbook(caminho, read_only=True)
+        ws = wb["Imóveis"]
+        linhas = ws.iter_rows(values_only=False)
+        cabecalho = [cell.value for cell in next(linhas)]
+        primeira = next(linhas)
+        total = 2 + sum(1 for _ in linhas)
+        assert cabecalho[0] == 'CEP' and cabecalho[-1] == 'Preço m²', cabecalho
+        assert total == 5001, total
+        assert primeira[8].number_format == 'R$ #.##0'
+        assert primeira[14].number_format == '0.0%'
+        assert primeira[3].number_format == '0.0'
+        assert primeira[16].value is not None, "Indicador ausente"
+        assert "Filtros" in wb.sheetnames
+        wb.close()
+        print("  ✅ Cabeçalho, formatos, indicador e filtros conferem")
+        
+        # Memória não cresce com o número de linhas
+        assert picos[5000] <= picos[1000] * 2, f"Memória cresce com o número de linhas: {picos}"
+        print("  ✅ Memória estável com 5x mais linhas")
+    
+    print("✅ Exportação Excel em streaming funcionando!")
+
+def test_exportacao_csv():
+    """Testa a exportação CSV/TSV em streaming a partir do banco e de quadros colunares"""
+    print("\n🧾 Testando exportação CSV/TSV em streaming...")
+    
+    try:
+        import csv
+        import gzip
+        import tempfile
+        from models.database import DatabaseManager
+        from models.imovel import Imovel
+        from services.calculo_service import get_calculo_service
+        from services.export_service import ExportService
+        from services.indicador_service import CAMPOS_CALCULO
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            db = DatabaseManager(os.path.join(pasta, "export.db"))
+            n = 50000
+            db.execute_many("""
+                INSERT INTO imoveis (endereco, cidade, estado, cep, metragem, quartos, banheiros,
+                                     padrao_acabamento, custo_aquisicao, custos_reforma, custos_transacao, status)
+                VALUES (?, ?, 'SC', ?, ?, 2, 1, ?, ?, 10000, 5000, 'em_analise')
+            """, [
+                (f"Rua {i}", ('Blumenau', 'Joinville')[i % 2], f"89{i % 1000000:06d}", 50.0 + i % 100,
+                 ('baixo', 'medio', 'alto')[i % 3], 200000.0 + i)
+                for i in range(n)
+            ])
+            service = ExportService(db)
+            indicadores = [{'nome': 'Preço m²', 'expressao': 'preco_venda_estimado / metragem', 'formato': 'moeda'}]
+            
+            # Cursor -> CSV compactado
+            caminho = os.path.join(pasta, "imoveis.csv.gz")
+            progresso = []
+            if not service.export_to_csv(service.lotes_do_banco(), caminho, indicadores, progresso=progresso.append):
+                print("  ❌ Exportação CSV falhou")
+                return False
+            estatisticas = service.ultima_exportacao
+            with gzip.open(caminho, 'rt', encoding='utf-8', newline='') as arquivo:
+                linhas = list(csv.reader(arquivo))
+            if len(linhas) != n + 1 or linhas[0][-1] != 'Preço m²' or progresso[-1] != n:
+                print(f"  ❌ CSV incorreto: {len(linhas)} linhas, cabeçalho {linhas[0]}")
+                return False
+            # Valores do motor de cálculo, iguais aos da tabela
+            primeira = dict(zip(linhas[0], linhas[1]))
+            esperado = get_calculo_service(db).calcular_tudo(Imovel(
+                endereco="Rua 0", cidade="Blumenau", estado="SC", cep="89000000", metragem=50.0,
+                quartos=2, banheiros=1, padrao_acabamento='baixo', custo_aquisicao=200000.0,
+                custos_reforma=10000.0, custos_transacao=5000.0
+            ))
+            if float(primeira['custo_total']) != esperado['custo_total'] \
+                    or float(primeira['preco_venda_estimado']) != esperado['preco_venda_estimado'] \
+                    or abs(float(primeira['vpl']) - esperado['vpl']) > 1e-6 \
+                    or abs(float(primeira['Preço m²']) - esperado['preco_venda_estimado'] / 50.0) > 1e-6:
+                print(f"  ❌ Colunas calculadas incorretas: {primeira}")
+                return False
+            print(f"  ✅ {n} linhas do cursor em gzip ({estatisticas['linhas_por_segundo']:.0f} linhas/s)")
+            
+            # Quadro colunar já calculado -> TSV (resultados reaproveitados sem recálculo)
+            quadro = {'id': [1, 2], 'cidade': ['Blumenau', 'Itajaí'], 'metragem': [100.0, 80.0],
+                      'padrao_acabamento': ['medio', 'alto'], 'custo_aquisicao': [300000.0, 250000.0]}
+            quadro.update({campo: [0.0, 0.0] for campo in CAMPOS_CALCULO})
+            quadro['margem'] = [1.0, 150000.0]
+            caminho = os.path.join(pasta, "imoveis.tsv")
+            if not service.export_to_csv(quadro, caminho, []):
+                print("  ❌ Exportação TSV falhou")
+                return False
+            with open(caminho, encoding='utf-8', newline='') as arquivo:
+                linhas = list(csv.DictReader(arquivo, delimiter='\t'))
+            if len(linhas) != 2 or float(linhas[1]['margem']) != 150000.0 or linhas[1]['cidade'] != 'Itajaí':
+                print(f"  ❌ TSV incorreto: {linhas}")
+                return False
+            print("  ✅ Quadro colunar exportado em TSV")
+        
+        print("✅ Exportação CSV/TSV funcionando!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro na exportação CSV: {e}")
+        return False
+
+def test_exportacao_outro_banco():
+    """Testa que a exportação usa os parâmetros do banco injetado, sem tocar o imoveis.db"""
+    print("\n🗄️ Testando exportação de outro banco...")
+    
+    import csv
+    import tempfile
+    from models.database import DatabaseManager
+    from models.parametros import ParametrosGlobais
+    from services.calculo_service import get_calculo_service
+    from services.export_service import ExportService
+    
+    diretorio = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta)
+        try:
+            db = DatabaseManager("outro.db")
+            parametros = ParametrosGlobais(db)
+            parametros.preco_base_m2 = 10000.0
+            parametros.save_to_db()
+            db.execute_query("""
+                INSERT INTO imoveis (endereco, cidade, estado, cep, metragem, quartos, banheiros,
+                                     padrao_acabamento, custo_aquisicao, custos_reforma, custos_transacao, status)
+                VALUES ('Rua 1', 'Cidade Sem Índice', 'SC', '88000000', 100, 2, 1, 'medio', 300000, 0, 0, 'em_analise')
+            """)
+            
+            assert get_calculo_service(db).db_manager is db
+            service = ExportService(db)
+            assert service.export_to_csv(service.lotes_do_banco(), "imoveis.csv", [])
+            with open("imoveis.csv", encoding='utf-8', newline='') as arquivo:
+                linha = next(csv.DictReader(arquivo))
+            assert float(linha['preco_venda_estimado']) == 1000000.0, linha['preco_venda_estimado']
+            assert not os.path.exists("imoveis.db"), "imoveis.db criado fora do banco injetado"
+        finally:
+            os.chdir(diretorio)
+    print("  ✅ Preço com o preço base do banco injetado (10.000/m²) e nenhum imoveis.db criado")
+    print("✅ Exportação de outro banco funcionando!")
+
+def test_exportacao_parquet():
+    """Testa a exportação Parquet/Arrow (filtros, tipos, dicionários, row groups e metadados)"""
+    print("\n🏹 Testando exportação Parquet...")
+    
+    import json
+    import tempfile
+    from models.database import DatabaseManager
+    from services.catalogo_cidades import get_catalogo
+    from services.export_service import ExportService, PYARROW_AVAILABLE
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        db = DatabaseManager(os.path.join(pasta, "export.db"))
+        n = 5000
+        cidades = ('Blumenau', 'Joinville', 'Itajaí')
+        db.execute_many("""
+            INSERT INTO imoveis (endereco, cidade, estado, metragem, quartos, padrao_acabamento,
+                                 custo_aquisicao, status)
+            VALUES (?, ?, 'SC', ?, 3, ?, ?, 'comprado')
+        """, [(f"Rua {i}", cidades[i % 3], 60.0 + i % 50,
+               ('baixo', 'medio', 'alto')[i % 3], 250000.0 + i) for i in range(n)])
+        service = ExportService(db)
+        indicadores = [{'nome': 'Preço m²', 'expressao': 'preco_venda_estimado / metragem', 'formato': 'moeda'}]
+        
+        metadados = service.metadados_exportacao({'cidade': 'Blumenau', 'status': ''}, indicadores)
+        assert 'preco_base_m2' in metadados['parametros']
+        assert metadados['filtros'] == {'cidade': 'Blumenau'}, metadados['filtros']
+        print(f"  ✅ Metadados com {len(metadados['parametros'])} parâmetros versionados")
+        
+        # Filtros do painel aplicados à origem padrão (tabela imoveis)
+        def ids(filtros):
+            return [i for lote in service.lotes_filtrados(filtros) for i in lote['id']]
+        blumenau = [i + 1 for i in range(n) if i % 3 == 0]
+        assert ids({'cidade': 'Blumenau'}) == blumenau
+        assert len(ids({'cidade': 'Todas as cidades', 'regiao': ''})) == n
+        assert ids({'cidade': 'Blumenau', 'formula': 'metragem >= 100'}) == \
+            [i + 1 for i in range(n) if i % 3 == 0 and i % 50 >= 40]
+        regiao = get_catalogo(db.db_path).regiao_de('Joinville')
+        assert len(ids({'regiao': regiao})) == \
+            sum(get_catalogo(db.db_path).regiao_de(cidades[i % 3]) == regiao for i in range(n))
+        assert ids({'regiao': 'Região inexistente'}) == []
+        try:
+            ids({'status': 'comprado'})
+            assert False, "Filtro desconhecido aceito"
+        except ValueError:
+            pass
+        print("  ✅ Cidade, região e fórmula filtram a tabela; filtros desconhecidos são recusados")
+        
+        caminho = os.path.join(pasta, "imoveis.parquet")
+        ok = service.export_to_parquet(caminho, filtros={'cidade': 'Blumenau'}, indicadores=indicadores,
+                                       linhas_por_grupo=1000)
+        if not PYARROW_AVAILABLE:
+            assert not ok and 'Parquet' not in service.get_export_formats(), "Parquet anunciado sem PyArrow"
+            print("  ⚠️ PyArrow não instalado - exportação Parquet desabilitada")
+            print("✅ Exportação Parquet verificada (indisponível)!")
+            return
+        
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        arquivo = pq.ParquetFile(caminho)
+        tabela = arquivo.read()
+        esquema = arquivo.schema_arrow
+        assert tabela.column('id').to_pylist() == blumenau, "Filtro de cidade ignorado"
+        assert arquivo.num_row_groups == 2, arquivo.num_row_groups
+        assert pa.types.is_dictionary(esquema.field('cidade').type)
+        assert esquema.field('quartos').type == pa.int32()
+        assert esquema.field('Preço m²').type == pa.float64()
+        assert json.loads(esquema.metadata[b'imoveis.filtros']) == {'cidade': 'Blumenau'}
+        assert b'imoveis.parametros' in esquema.metadata
+        print(f"  ✅ {tabela.num_rows} linhas filtradas e tipadas em {arquivo.num_row_groups} row groups com metadados")
+        
+        caminho = os.path.join(pasta, "imoveis.arrows")
+        assert service.export_to_parquet(caminho, indicadores=[]), "Exportação Arrow falhou"
+        with pa.ipc.open_stream(caminho) as leitor:
+            assert leitor.read_all().num_rows == n, "Fluxo Arrow incompleto"
+        print("  ✅ Fluxo Arrow IPC em record batches")
+    
+    print("✅ Exportação Parquet funcionando!")
+
+def test_exportacao_pdf():
+    """Testa o PDF paginado sob demanda (cabeçalho por página, progresso e resumo)"""
+    print("\n📕 Testando exportação PDF paginada...")
+    
+    import re
+    import zlib
+    import base64
+    import tempfile
+    import time
+    from models.database import DatabaseManager
+    from models.imovel import Imovel
+    from services.export_service import ExportService, REPORTLAB_AVAILABLE
+    
+    if not REPORTLAB_AVAILABLE:
+        print("  ⚠️ ReportLab não instalado - exportação PDF desabilitada")
+        return
+    
+    def gerar(n):
+        for i in range(n):
+            yield Imovel(endereco=f"Rua {i}", cidade=('Blumenau', 'Joinville')[i % 2], estado="SC",
+                         cep="89010-000", metragem=50.0 + i % 40, custo_aquisicao=200000.0 + i)
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        service = ExportService(DatabaseManager(os.path.join(pasta, "export.db")))
+        caminho = os.path.join(pasta, "imoveis.pdf")
+        n = 3000
+        progresso = []
+        inicio = time.perf_counter()
+        assert service.export_to_pdf(gerar(n), caminho, {'cidade': 'Blumenau'}, progresso=progresso.append), \
+            "Exportação PDF falhou"
+        duracao = time.perf_counter() - inicio
+        
+        with open(caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        paginas = len(re.findall(rb'/Type /Page\b(?!s)', conteudo))
+        # Fluxos de conteúdo em ASCII85 + Flate
+        textos = b''.join(
+            zlib.decompress(base64.a85decode(fluxo.strip()[:-2]))
+            for fluxo in re.findall(rb'stream\r?\n(.*?)endstream', conteudo, re.S)
+            if fluxo.strip().endswith(b'~>')
+        )
+        cabecalhos = textos.count(b'(CEP)')
+        assert progresso[-1] == n, progresso[-1:]
+        assert cabecalhos == len(progresso) and cabecalhos >= paginas - 1, \
+            f"{paginas} páginas, {cabecalhos} cabeçalhos, {len(progresso)} avisos de progresso"
+        assert b'Resumo por Regi' in textos, "Resumo ausente"
+        print(f"  ✅ {n} imóveis em {paginas} páginas com cabeçalho em cada uma ({duracao:.2f}s)")
+    
+    print("✅ Exportação PDF paginada funcionando!")
+
+def test_exportacao_segundo_plano():
+    """Testa a exportação em thread com progresso, interface responsiva e cancelamento"""
+    print("\n🧵 Testando exportação em segundo plano...")
+    
+    import tempfile
+    import time
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    from models.database import DatabaseManager
+    from models.imovel import Imovel
+    from services.export_service import ExportService
+    from ui.exportacao import ExportacaoThread
+    
+    app = QApplication.instance() or QApplication([])
+    imoveis = [
+        Imovel(endereco=f"Rua {i}", cidade="Blumenau", estado="SC", cep="89010-000",
+               metragem=50.0 + i % 40, custo_aquisicao=200000.0 + i)
+        for i in range(4000)
+    ]
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        service = ExportService(DatabaseManager(os.path.join(pasta, "export.db")))
+        
+        # Exportação completa: progresso chega por sinal e o laço de eventos não trava
+        caminho = os.path.join(pasta, "imoveis.pdf")
+        thread = ExportacaoThread(service, 'PDF', imoveis, caminho)
+        progresso, concluida = [], []
+        thread.progresso.connect(lambda feitos, total: progresso.append((feitos, total)))
+        thread.concluida.connect(lambda sucesso, arquivo: concluida.append(sucesso))
+        thread.start()
+        maior_intervalo, anterior = 0.0, time.perf_counter()
+        while not concluida:
+            app.processEvents()
+            time.sleep(0.005)
+            agora = time.perf_counter()
+            maior_intervalo, anterior = max(maior_intervalo, agora - anterior), agora
+        thread.wait()
+        assert concluida == [True], concluida
+        assert progresso[-1] == (4000, 4000), progresso[-1:]
+        assert os.path.exists(caminho)
+        print(f"  ✅ PDF em segundo plano com {len(progresso)} avisos de progresso "
+              f"(maior pausa da interface: {maior_intervalo * 1000:.0f}ms)")
+        assert maior_intervalo <= 0.5, f"Interface travou durante a exportação ({maior_intervalo:.2f}s)"
+        
+        # Cancelamento: para entre lotes e remove o arquivo parcial
+        caminho = os.path.join(pasta, "imoveis.xlsx")
+        thread = ExportacaoThread(service, 'Excel', imoveis * 5, caminho)
+        concluida = []
+        thread.progresso.connect(lambda feitos, total: thread.requestInterruption())
+        thread.concluida.connect(lambda sucesso, arquivo: concluida.append(sucesso))
+        thread.start()
+        limite = time.perf_counter() + 30
+        while not concluida and time.perf_counter() < limite:
+            app.processEvents()
+            time.sleep(0.005)
+        thread.wait()
+        assert concluida == [False], f"Cancelamento não respeitado: {concluida}"
+        assert not os.path.exists(caminho), "Arquivo parcial mantido"
+        print("  ✅ Exportação cancelada e arquivo parcial removido")
+    
+    print("✅ Exportação em segundo plano funcionando!")
+
+def test_exportacao_multipla():
+    """Testa a exportação para vários formatos com um único cálculo e manifesto"""
+    print("\n📦 Testando exportação múltipla...")
+    
+    import csv
+    import json
+    import tempfile
+    from models.database import DatabaseManager
+    from models.imovel import Imovel
+    from services.calculo_service import CalculoService
+    from services.export_service import ExportService, OPENPYXL_AVAILABLE, REPORTLAB_AVAILABLE
+    
+    class MotorContado:
+        """Conta quantos imóveis passam pelo motor de cálculo"""
+        def __init__(self, motor):
+            self.motor = motor
+            self.calculados = 0
+        def calcular_lote(self, imoveis):
+            self.calculados += len(imoveis)
+            return self.motor.calcular_lote(imoveis)
+        def __getattr__(self, nome):
+            return getattr(self.motor, nome)
+    
+    n = 2500
+    imoveis = [
+        Imovel(endereco=f"Rua {i}", cidade=('Blumenau', 'Joinville')[i % 2], estado="SC",
+               cep="89010-000", metragem=50.0 + i % 40, custo_aquisicao=200000.0 + i)
+        for i in range(n)
+    ]
+    indicadores = [{'nome': 'Preço m²', 'expressao': 'preco_venda_estimado / metragem', 'formato': 'moeda'}]
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        db = DatabaseManager(os.path.join(pasta, "export.db"))
+        motor = MotorContado(CalculoService(db))
+        service = ExportService(db, calculo_service=motor)
+        destinos = [os.path.join(pasta, nome) for nome in ("imoveis.csv", "imoveis.tsv.gz")]
+        if REPORTLAB_AVAILABLE:
+            destinos.append(os.path.join(pasta, "imoveis.pdf"))
+        if OPENPYXL_AVAILABLE:
+            destinos.append(('Excel', os.path.join(pasta, "planilha")))
+        caminho_manifesto = os.path.join(pasta, "manifesto.json")
+        manifesto = service.exportar_varios(iter(imoveis), destinos, filtros={'cidade': ''},
+                                            indicadores=indicadores, manifesto=caminho_manifesto)
+        
+        assert motor.calculados == n, f"Motor de cálculo rodou para {motor.calculados} imóveis (esperado {n})"
+        arquivos = manifesto['arquivos']
+        assert len(arquivos) == len(destinos), arquivos
+        assert all(a['sucesso'] and a['bytes'] for a in arquivos), arquivos
+        # Estatísticas de cada arquivo vêm do próprio exportador, não de ultima_exportacao
+        for entrada in arquivos:
+            if entrada['formato'] == 'CSV':
+                assert entrada['linhas'] == n and entrada['linhas_por_segundo'] > 0, entrada
+        assert service.ultima_exportacao == {}, service.ultima_exportacao
+        with open(caminho_manifesto, encoding='utf-8') as arquivo:
+            gravado = json.load(arquivo)
+        assert gravado['linhas'] == n
+        assert gravado['metadados']['indicadores'][0]['nome'] == 'Preço m²'
+        with open(destinos[0], encoding='utf-8', newline='') as arquivo:
+            linhas = list(csv.DictReader(arquivo))
+        assert len(linhas) == n and linhas[0]['Preço m²'], "CSV do conjunto incompleto"
+        tempos = ", ".join(f"{a['formato']} {a['segundos']:.2f}s" for a in arquivos)
+        print(f"  ✅ {len(arquivos)} arquivos com um cálculo ({manifesto['calculo_segundos']:.2f}s): {tempos}")
+        print("  ✅ Linhas e linhas/s registradas por destino")
+        
+        # Destino sem formato reconhecido fica registrado como falha, sem derrubar os demais
+        manifesto = service.exportar_varios(imoveis[:10], [os.path.join(pasta, "imoveis.txt"),
+                                                           os.path.join(pasta, "pequeno.csv")])
+        assert [a['sucesso'] for a in manifesto['arquivos']] == [False, True], manifesto['arquivos']
+        assert [a['linhas'] for a in manifesto['arquivos']] == [None, 10]
+        print("  ✅ Formato desconhecido registrado no manifesto")
+    
+    print("✅ Exportação múltipla funcionando!")
+
+def test_relatorios_lote():
+    """Testa a geração de relatórios por cidade em processos, com reaproveitamento e sem Qt"""
+    print("\n🗂️ Testando geração de relatórios em lote...")
+    
+    import csv
+    import json
+    import subprocess
+    import tempfile
+    from models.database import DatabaseManager
+    from models.parametros import ParametrosGlobais
+    from services.calculo_service import CalculoService
+    from services.relatorio_service import RelatorioService, ARQUIVO_INDICE
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_banco = os.path.join(pasta, "carteira.db")
+        db = DatabaseManager(caminho_banco)
+        # Parâmetros fora do padrão: os relatórios devem usar os deste banco
+        parametros = ParametrosGlobais(db)
+        parametros.preco_base_m2 = 10000.0
+        parametros.save_to_db()
+        cidades = ('Blumenau', 'Joinville', 'São José')
+        db.execute_many("""
+            INSERT INTO imoveis (endereco, cidade, estado, metragem, padrao_acabamento, custo_aquisicao, status)
+            VALUES (?, ?, 'SC', ?, 'medio', ?, 'comprado')
+        """, [(f"Rua {i}", cidades[i % 3], 60.0 + i % 30, 250000.0 + i) for i in range(600)])
+        particoes_sc = sorted(f"{cidade}/SC" for cidade in cidades)
+        saida = os.path.join(pasta, "relatorios")
+        
+        # Linha de comando em outro interpretador: gera tudo sem carregar o Qt
+        comando = [sys.executable, "-c",
+                   "import sys, gerar_relatorios; ok = gerar_relatorios.main(sys.argv[1:]); "
+                   "print('QT' if 'PySide6' in sys.modules else 'SEM_QT'); sys.exit(0 if ok else 1)",
+                   "--banco", caminho_banco, "--pasta", saida, "--formatos", "csv,tsv.gz", "--processos", "2"]
+        execucao = subprocess.run(comando, capture_output=True, text=True, timeout=120)
+        assert execucao.returncode == 0, f"{execucao.stdout[-500:]} {execucao.stderr[-500:]}"
+        assert 'SEM_QT' in execucao.stdout, "Linha de comando carregou o Qt"
+        with open(os.path.join(saida, ARQUIVO_INDICE), encoding='utf-8') as arquivo:
+            indice = json.load(arquivo)
+        assert sorted(indice['particoes']) == particoes_sc, indice['particoes'].keys()
+        assert os.path.exists(os.path.join(saida, "sao-jose-sc.csv"))
+        assert all(p['linhas'] == 200 and not p['reaproveitada'] for p in indice['particoes'].values())
+        print(f"  ✅ {len(indice['particoes'])} cidades geradas em processos, sem Qt")
+        
+        # Preços com o preço base do banco informado em --banco, não o do imoveis.db
+        with open(os.path.join(saida, "blumenau-sc.csv"), encoding='utf-8', newline='') as arquivo:
+            primeira = next(csv.DictReader(arquivo))
+        fator = CalculoService(db).get_fator_localizacao('Blumenau')
+        assert float(primeira['preco_venda_estimado']) == round(10000.0 * 60.0 * fator, 2), primeira
+        print("  ✅ Relatórios calculados com os parâmetros do banco informado")
+        
+        # Segunda execução: só a cidade alterada é refeita
+        db.execute_query("UPDATE imoveis SET custo_aquisicao = 1.0, data_atualizacao = '2030-01-01' "
+                         "WHERE id = (SELECT MIN(id) FROM imoveis WHERE cidade = 'Joinville')")
+        indice = RelatorioService(db).gerar(saida, formatos=('csv', 'tsv.gz'), processos=2)
+        refeitas = sorted(nome for nome, p in indice['particoes'].items() if not p['reaproveitada'])
+        assert refeitas == ['Joinville/SC'], refeitas
+        print("  ✅ Partições sem alterações reaproveitadas")
+        
+        # Mesma cidade em outra UF e nome que vira o mesmo arquivo: partições e arquivos separados
+        db.execute_many("""
+            INSERT INTO imoveis (endereco, cidade, estado, metragem, padrao_acabamento, custo_aquisicao, status)
+            VALUES (?, ?, ?, 80, 'medio', 300000, 'comprado')
+        """, [("Rua PR", 'São José', 'PR'), ("Rua A", 'Itajaí', 'SC'), ("Rua B", 'Itajai', 'SC')])
+        indice = RelatorioService(db).gerar(saida, formatos=('csv',), processos=2)
+        particoes = indice['particoes']
+        assert particoes['São José/PR']['linhas'] == 1 and particoes['São José/SC']['linhas'] == 200
+        arquivos = [a['arquivo'] for p in particoes.values() for a in p['arquivos']]
+        assert len(set(arquivos)) == len(arquivos) == len(particoes), arquivos
+        assert {os.path.basename(particoes[nome]['arquivos'][0]['arquivo']) for nome in ('Itajai/SC', 'Itajaí/SC')} \
+            == {'itajai-sc.csv', 'itajai-sc-2.csv'}
+        assert all(p['impressao'] for p in particoes.values())
+        print("  ✅ Cidades homônimas em UFs diferentes e nomes de arquivo repetidos separados")
+        
+        # Por região, todas no mesmo índice de particionamento
+        indice = RelatorioService(db).gerar(os.path.join(pasta, "regioes"), por='regiao',
+                                            formatos=('csv',), processos=1)
+        assert sum(p['linhas'] for p in indice['particoes'].values()) == 603, indice['particoes']
+        print(f"  ✅ {len(indice['particoes'])} região(ões) geradas")
+    
+    print("✅ Geração de relatórios em lote funcionando!")
+
 def main():
     """Função principal de teste"""
     print("🚀 Iniciando testes do Sistema de Negociação de Imóveis")
@@ -199,6 +1911,31 @@ def main():
         test_imports,
         test_database,
         test_calculos,
+        test_calculo_compartilhado,
+        test_calculo_colunar,
+        test_fluxo_caixa,
+        test_indicadores,
+        test_agregacao,
+        test_historico,
+        test_historico_volume,
+        test_sincronizacao_cidades,
+        test_snapshot_cidades,
+        test_primeira_pintura_filtros,
+        test_disjuntor,
+        test_busca_cidades,
+        test_catalogo_cidades,
+        test_varias_ufs,
+        test_regioes_geograficas,
+        test_geocodificacao_cep,
+        test_municipio_mais_proximo,
+        test_exportacao_excel,
+        test_exportacao_csv,
+        test_exportacao_outro_banco,
+        test_exportacao_parquet,
+        test_exportacao_pdf,
+        test_exportacao_segundo_plano,
+        test_exportacao_multipla,
+        test_relatorios_lote,
         test_export_service
     ]
     
@@ -206,7 +1943,8 @@ def main():
     for teste in testes:
         try:
             resultado = teste()
-            resultados.append(resultado)
+            # Testes com assert não retornam nada: chegar ao fim é passar
+            resultados.append(resultado is None or bool(resultado))
         except Exception as e:
             print(f"❌ Erro inesperado no teste {teste.__name__}: {e}")
             resultados.append(False)
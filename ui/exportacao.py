@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportação de relatórios fora da thread da interface
+"""
+
+import logging
+from typing import Any, Dict, List
+from PySide6.QtCore import QThread, Signal
+
+from models.imovel import Imovel
+from services.export_service import ExportService
+
+class ExportacaoThread(QThread):
+    # (imóveis exportados, total de imóveis)
+    progresso = Signal(int, int)
+    # (sucesso, arquivo); False também quando a exportação é cancelada
+    concluida = Signal(bool, str)
+
+    def __init__(self, export_service: ExportService, formato: str, imoveis: List[Imovel],
+                 arquivo: str, filtros: Dict[str, Any] = None, parent=None):
+        super().__init__(parent)
+        self.export_service = export_service
+        self.formato = formato
+        # Cópia: a tabela pode ser refiltrada enquanto a exportação roda
+        self.imoveis = list(imoveis)
+        self.arquivo = arquivo
+        self.filtros = filtros
+
+    def run(self):
+        """Executa a exportação; progresso e conclusão chegam à interface por sinal"""
+        exportadores = {
+            'PDF': self.export_service.export_to_pdf,
+            'Excel': self.export_service.export_to_excel,
+        }
+        total = len(self.imoveis)
+        try:
+            sucesso = exportadores[self.formato](
+                self.imoveis, self.arquivo, self.filtros,
+                progresso=lambda feitos: self.progresso.emit(feitos, total),
+                cancelado=self.isInterruptionRequested
+            )
+        except Exception as e:
+            logging.error(f"Erro na exportação {self.formato} em segundo plano: {e}")
+            sucesso = False
+        self.concluida.emit(sucesso and not self.isInterruptionRequested(), self.arquivo)
+
+    def cancelar(self, espera_ms: int = 5000):
+        """Pede a interrupção e aguarda o lote em andamento terminar"""
+        if self.isRunning():
+            self.requestInterruption()
+            self.wait(espera_ms)
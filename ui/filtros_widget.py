@@ -6,20 +6,23 @@ Widget de filtros para a tabela de imóveis
 
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
                                QLabel, QLineEdit, QComboBox, QSpinBox, QDoubleSpinBox,
-                               QPushButton, QGroupBox, QCheckBox, QMessageBox)
+                               QPushButton, QGroupBox, QCheckBox, QMessageBox, QApplication)
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QFont
 from models.database import DatabaseManager
 from services.cidade_service import CidadeService
+from ui.sincronizacao_cidades import SincronizacaoCidadesThread
 import logging
 
 class FiltrosWidget(QWidget):
     filtros_alterados = Signal(dict)
     
-    def __init__(self):
+    def __init__(self, cidade_service: CidadeService = None, sincronizar_online: bool = True):
         super().__init__()
         self.db_manager = DatabaseManager()
-        self.cidade_service = CidadeService()
+        self.cidade_service = cidade_service or CidadeService()
+        self.sincronizar_online = sincronizar_online
+        self.sincronizacao_thread = None
         self.init_ui()
         self.setup_connections()
         self.load_cidades()
@@ -260,6 +263,34 @@ class FiltrosWidget(QWidget):
         filtros_layout.addWidget(cidade_label, 1, 2)
         filtros_layout.addWidget(self.cidade_combo, 1, 3)
         
+        # Posição 5: Fórmula (indicadores personalizados como filtro)
+        self.formula_edit = QLineEdit()
+        self.formula_edit.setPlaceholderText("Ex.: roi > 15 and metragem >= 80")
+        self.formula_edit.setMinimumWidth(80)
+        self.formula_edit.setStyleSheet("""
+            QLineEdit {
+                border: 2px solid #dee2e6;
+                border-radius: 6px;
+                padding: 8px 12px;
+                background-color: white;
+                font-size: 12px;
+            }
+            QLineEdit:focus {
+                border-color: #3498db;
+                background-color: #f8fffe;
+            }
+        """)
+        formula_label = QLabel("Fórmula:")
+        formula_label.setStyleSheet("QLabel { font-weight: bold; color: #495057; }")
+        filtros_layout.addWidget(formula_label, 2, 0)
+        filtros_layout.addWidget(self.formula_edit, 2, 1, 1, 3)
+        
+        # Andamento da sincronização de cidades em segundo plano
+        self.sincronizacao_label = QLabel("")
+        self.sincronizacao_label.setStyleSheet("QLabel { color: #6c757d; font-size: 11px; }")
+        self.sincronizacao_label.setVisible(False)
+        filtros_layout.addWidget(self.sincronizacao_label, 3, 0, 1, 4)
+        
         # Status removido
         
         # Todos os filtros numéricos e padrão removidos
@@ -358,13 +389,12 @@ class FiltrosWidget(QWidget):
         self.inicializar_cidades()
         
     def inicializar_cidades(self):
-        """Inicializa o serviço de cidades e sincroniza com dados online"""
+        """Inicializa o serviço de cidades a partir do catálogo local"""
         try:
-            # Tentar sincronizar cidades (pode demorar na primeira vez)
             logging.info("Inicializando serviço de cidades...")
             
-            # Em background, sincronizar cidades
-            self.cidade_service.sincronizar_cidades()
+            # Primeira execução: carregar o snapshot distribuído, sem depender da rede
+            self.cidade_service.garantir_cidades_locais()
             
             # Carregar cidades disponíveis
             self.regioes_disponiveis = self.cidade_service.get_regioes_disponiveis()
@@ -378,6 +408,73 @@ class FiltrosWidget(QWidget):
             self.regioes_disponiveis = ["Norte", "Sul", "Leste", "Oeste", "Central"]
             self.todas_cidades_sc = ["Florianópolis", "Joinville", "Blumenau", "Criciúma", "Chapecó", "Capinzal"]
         
+        # Atualização online opcional, fora da thread da interface
+        if self.sincronizar_online:
+            self.iniciar_sincronizacao()
+        
+    def iniciar_sincronizacao(self, forcar_atualizacao: bool = False):
+        """Dispara a sincronização de cidades em segundo plano"""
+        if self.sincronizacao_thread and self.sincronizacao_thread.isRunning():
+            return
+        self.sincronizacao_thread = SincronizacaoCidadesThread(self.cidade_service, forcar_atualizacao)
+        self.sincronizacao_thread.progresso.connect(self.on_sincronizacao_progresso)
+        self.sincronizacao_thread.concluida.connect(self.on_sincronizacao_concluida)
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.sincronizacao_thread.cancelar)
+        self.sincronizacao_thread.start()
+        
+    def on_sincronizacao_progresso(self, feitas: int, total: int):
+        """Mostra o andamento da sincronização"""
+        self.sincronizacao_label.setText(f"🔄 Atualizando cidades do IBGE... {feitas}/{total}")
+        self.sincronizacao_label.setVisible(True)
+        
+    def on_sincronizacao_concluida(self, sucesso: bool):
+        """Recarrega os combos com o catálogo atualizado"""
+        self.sincronizacao_label.setVisible(False)
+        if sucesso:
+            self.recarregar_cidades()
+        
+    def recarregar_cidades(self):
+        """Relê regiões e cidades do banco mantendo a seleção atual"""
+        try:
+            regioes = self.cidade_service.get_regioes_disponiveis()
+            cidades = self.cidade_service.get_todas_cidades()
+            if not cidades or (regioes == self.regioes_disponiveis and cidades == self.todas_cidades_sc):
+                return
+            self.regioes_disponiveis = regioes
+            self.todas_cidades_sc = cidades
+            
+            regiao_atual = self.regiao_combo.currentText()
+            cidade_atual = self.cidade_combo.currentText()
+            
+            # Reconstruir sem disparar filtros; a seleção é restaurada em seguida
+            self.regiao_combo.blockSignals(True)
+            self.cidade_combo.blockSignals(True)
+            try:
+                self.regiao_combo.clear()
+                self.regiao_combo.addItem("Todas as regiões")
+                self.regiao_combo.addItems(regioes)
+                self.regiao_combo.setCurrentText(regiao_atual)
+                
+                if self.regiao_combo.currentText() == "Todas as regiões":
+                    cidades_combo = cidades
+                else:
+                    cidades_combo = [cidade['nome'] for cidade in
+                                     self.cidade_service.get_cidades_por_regiao(self.regiao_combo.currentText())]
+                self.cidade_combo.clear()
+                self.cidade_combo.addItem("Todas as cidades")
+                self.cidade_combo.addItems(cidades_combo)
+                self.cidade_combo.setCurrentText(cidade_atual)
+            finally:
+                self.regiao_combo.blockSignals(False)
+                self.cidade_combo.blockSignals(False)
+            
+            logging.info(f"Cidades recarregadas após sincronização: {len(cidades)}")
+            
+        except Exception as e:
+            logging.error(f"Erro ao recarregar cidades: {e}")
+        
     def setup_connections(self):
         """Configura as conexões dos controles"""
         # Filtros avançados removidos
@@ -391,6 +488,8 @@ class FiltrosWidget(QWidget):
         self.busca_cidade_edit.textChanged.connect(self.on_busca_cidade_changed)
         self.regiao_combo.currentTextChanged.connect(self.on_regiao_changed)
         self.cidade_combo.currentTextChanged.connect(self.on_filtro_changed)
+        # Fórmula só é aplicada ao confirmar (Enter), para não avaliar expressões incompletas
+        self.formula_edit.editingFinished.connect(self.on_filtro_changed)
         # Conexões de filtros removidos
         
     def on_regiao_changed(self, regiao):
@@ -424,27 +523,18 @@ class FiltrosWidget(QWidget):
     def on_busca_cidade_changed(self, texto):
         """Chamado quando o texto de busca de cidade é alterado"""
         try:
-            texto = texto.strip().lower()
+            texto = texto.strip()
             
             # Se não há texto, mostrar todas as cidades da região
             if not texto:
                 self.on_regiao_changed(self.regiao_combo.currentText())
                 return
             
-            # Filtrar cidades baseado no texto de busca (case-insensitive)
-            regiao_selecionada = self.regiao_combo.currentText()
-            
-            if regiao_selecionada == "Todas as regiões":
-                cidades_base = self.todas_cidades_sc
-            else:
-                cidades_por_regiao = self.cidade_service.get_cidades_por_regiao(regiao_selecionada)
-                cidades_base = [cidade['nome'] for cidade in cidades_por_regiao]
-            
-            # Filtrar cidades que contêm o texto de busca
-            cidades_filtradas = [
-                cidade for cidade in cidades_base 
-                if texto in cidade.lower()
-            ]
+            # Busca no índice em memória (sem acentos, por prefixo e aproximada),
+            # restrita à região selecionada e ordenada por relevância
+            cidades_filtradas = self.cidade_service.buscar_cidades(
+                texto, self.regiao_combo.currentText(), limite=None
+            )
             
             # Atualizar combo de cidades
             self.cidade_combo.clear()
@@ -491,6 +581,10 @@ class FiltrosWidget(QWidget):
         if self.cidade_combo.currentText() != "Todas as cidades":
             filtros['cidade'] = self.cidade_combo.currentText()
             
+        # Fórmula
+        if self.formula_edit.text().strip():
+            filtros['formula'] = self.formula_edit.text().strip()
+            
         # Status
         # Status removido
             
@@ -509,6 +603,7 @@ class FiltrosWidget(QWidget):
         """Limpa todos os filtros"""
         self.busca_edit.clear()
         self.busca_cidade_edit.clear()
+        self.formula_edit.clear()
         self.regiao_combo.setCurrentIndex(0)
         self.cidade_combo.setCurrentIndex(0)
         # Filtros removidos
@@ -6,11 +6,16 @@ Formulário de cadastro e edição de imóveis
 
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
                                QLabel, QLineEdit, QComboBox, QSpinBox, QDoubleSpinBox,
-                               QPushButton, QGroupBox, QMessageBox, QFormLayout)
-from PySide6.QtCore import Qt, Signal
+                               QPushButton, QGroupBox, QMessageBox, QFormLayout, QCompleter,
+                               QApplication)
+from PySide6.QtCore import Qt, Signal, QStringListModel
 from PySide6.QtGui import QFont
 from models.imovel import Imovel
 from models.database import DatabaseManager
+from services.historico_service import HistoricoService
+from services.cidade_service import CidadeService
+from services.cep_service import CepService, normalizar_cep
+from ui.resolucao_cep import ResolucaoCepThread
 import logging
 
 class ImovelForm(QWidget):
@@ -19,6 +24,10 @@ class ImovelForm(QWidget):
     def __init__(self):
         super().__init__()
         self.db_manager = DatabaseManager()
+        self.historico_service = HistoricoService(db_manager=self.db_manager)
+        self.cidade_service = CidadeService()
+        self.cep_service = CepService(self.db_manager.db_path)
+        self.resolucoes_cep = []
         self.imovel_atual = None
         self.modo_edicao = False
         
@@ -47,6 +56,12 @@ class ImovelForm(QWidget):
         # Cidade
         self.cidade_edit = QLineEdit()
         self.cidade_edit.setPlaceholderText("Digite a cidade")
+        # Sugestões vêm do índice de busca (sem acentos); o completer só exibe
+        self.cidade_completer_model = QStringListModel(self)
+        self.cidade_completer = QCompleter(self.cidade_completer_model, self)
+        self.cidade_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.cidade_completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.cidade_edit.setCompleter(self.cidade_completer)
         form_layout.addRow("Cidade:", self.cidade_edit)
         
         # Estado
@@ -200,6 +215,46 @@ class ImovelForm(QWidget):
         self.btn_novo.clicked.connect(self.novo_imovel)
         self.btn_salvar.clicked.connect(self.salvar_imovel)
         self.btn_cancelar.clicked.connect(self.cancelar_edicao)
+        self.cidade_edit.textEdited.connect(self.sugerir_cidades)
+        self.cep_edit.editingFinished.connect(self.resolver_cep)
+        
+    def sugerir_cidades(self, texto):
+        """Atualiza as sugestões de cidade conforme a digitação"""
+        try:
+            self.cidade_completer_model.setStringList(self.cidade_service.buscar_cidades(texto, limite=10))
+            if texto.strip():
+                self.cidade_completer.complete()
+        except Exception as e:
+            logging.error(f"Erro ao sugerir cidades: {e}")
+        
+    def resolver_cep(self):
+        """Busca bairro, cidade e coordenadas do CEP digitado sem travar a interface"""
+        cep = normalizar_cep(self.cep_edit.text())
+        if not cep:
+            return
+        thread = ResolucaoCepThread(self.cep_service, cep, self)
+        thread.resolvido.connect(self.on_cep_resolvido)
+        thread.finished.connect(lambda: self.resolucoes_cep.remove(thread))
+        thread.finished.connect(thread.deleteLater)
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(thread.wait)
+        self.resolucoes_cep.append(thread)
+        thread.start()
+        
+    def on_cep_resolvido(self, cep, dados):
+        """Completa cidade, estado e coordenadas ainda não preenchidos"""
+        if not dados or cep != normalizar_cep(self.cep_edit.text()):
+            return
+        if not self.cidade_edit.text().strip() and dados.get('cidade'):
+            self.cidade_edit.setText(dados['cidade'])
+            estado_index = self.estado_combo.findText(dados.get('uf') or '')
+            if estado_index >= 0:
+                self.estado_combo.setCurrentIndex(estado_index)
+        if self.lat_edit.value() == 0 and self.lon_edit.value() == 0 \
+                and dados.get('latitude') and dados.get('longitude'):
+            self.lat_edit.setValue(dados['latitude'])
+            self.lon_edit.setValue(dados['longitude'])
         
     def novo_imovel(self):
         """Prepara o formulário para um novo imóvel"""
@@ -358,11 +413,12 @@ class ImovelForm(QWidget):
                     dados_imovel['status']
                 )
                 
-                self.db_manager.execute_query(query, params)
+                dados_imovel['id'] = self.db_manager.execute_insert(query, params)
                 QMessageBox.information(self, "Sucesso", "Imóvel cadastrado com sucesso!")
                 
-            # Emitir sinal
+            # Registrar o ponto no histórico de preços e emitir sinal
             novo_imovel = Imovel(**dados_imovel)
+            self.historico_service.registrar(novo_imovel)
             self.imovel_salvo.emit(novo_imovel)
             
             # Limpar formulário
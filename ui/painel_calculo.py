@@ -12,14 +12,14 @@ from PySide6.QtGui import QFont, QColor, QPalette
 
 from models.imovel import Imovel
 from models.database import DatabaseManager
-from services.calculo_service import CalculoService
+from services.calculo_service import get_calculo_service
 from utils.formatacao import formatar_moeda, formatar_percentual
 
 class PainelCalculo(QWidget):
     def __init__(self):
         super().__init__()
         self.db_manager = DatabaseManager()
-        self.calculo_service = CalculoService()
+        self.calculo_service = get_calculo_service()
         self.imovel_atual = None
         self.setup_ui()
         
@@ -337,6 +337,52 @@ class PainelCalculo(QWidget):
         """)
         indicadores_layout.addWidget(self.lbl_payback_valor, 2, 1)
         
+        # VPL
+        self.lbl_vpl_titulo = QLabel("VPL:")
+        self.lbl_vpl_titulo.setStyleSheet("""
+            QLabel {
+                font-weight: bold;
+                color: #495057;
+            }
+        """)
+        indicadores_layout.addWidget(self.lbl_vpl_titulo, 3, 0)
+        
+        self.lbl_vpl_valor = QLabel("R$ 0")
+        self.lbl_vpl_valor.setStyleSheet("""
+            QLabel {
+                font-size: 14px;
+                font-weight: bold;
+                color: #495057;
+                padding: 5px;
+                background-color: #f8f9fa;
+                border-radius: 4px;
+            }
+        """)
+        indicadores_layout.addWidget(self.lbl_vpl_valor, 3, 1)
+        
+        # TIR
+        self.lbl_tir_titulo = QLabel("TIR (% a.a.):")
+        self.lbl_tir_titulo.setStyleSheet("""
+            QLabel {
+                font-weight: bold;
+                color: #495057;
+            }
+        """)
+        indicadores_layout.addWidget(self.lbl_tir_titulo, 4, 0)
+        
+        self.lbl_tir_valor = QLabel("N/A")
+        self.lbl_tir_valor.setStyleSheet("""
+            QLabel {
+                font-size: 14px;
+                font-weight: bold;
+                color: #495057;
+                padding: 5px;
+                background-color: #f8f9fa;
+                border-radius: 4px;
+            }
+        """)
+        indicadores_layout.addWidget(self.lbl_tir_valor, 4, 1)
+        
         content_layout.addWidget(self.indicadores_group)
         
         # Adicionar widget de conteúdo ao scroll area
@@ -394,8 +440,11 @@ class PainelCalculo(QWidget):
             # Colorir ROI baseado no valor
             self._aplicar_cor_roi(roi)
             
-            # Calcular payback estimado
-            self._calcular_payback(calculos['custo_total'], margem)
+            # Payback, VPL e TIR vêm do fluxo de caixa datado
+            self._exibir_payback(calculos['payback_meses'])
+            self.lbl_vpl_valor.setText(formatar_moeda(calculos['vpl']))
+            tir_anual = calculos['tir_anual']
+            self.lbl_tir_valor.setText(formatar_percentual(tir_anual) if tir_anual is not None else "N/A")
                 
         except Exception as e:
             logging.error(f"Erro ao calcular valores: {e}")
@@ -491,10 +540,10 @@ class PainelCalculo(QWidget):
                 }
             """)
             
-    def _calcular_payback(self, custo_total: float, margem: float):
-        """Calcula e exibe o payback estimado"""
-        if margem > 0:
-            payback_meses = int((custo_total / margem) * 12)
+    def _exibir_payback(self, payback_meses: float):
+        """Exibe o payback calculado a partir do fluxo de caixa"""
+        if payback_meses != float('inf'):
+            payback_meses = int(payback_meses)
             if payback_meses < 12:
                 self.lbl_payback_valor.setText(f"{payback_meses} meses")
             else:
@@ -517,6 +566,8 @@ class PainelCalculo(QWidget):
         self.lbl_margem_valor.setText("R$ 0")
         self.lbl_roi_valor.setText("0,0%")
         self.lbl_payback_valor.setText("0 meses")
+        self.lbl_vpl_valor.setText("R$ 0")
+        self.lbl_tir_valor.setText("N/A")
         
         # Resetar cores
         self._resetar_cores()
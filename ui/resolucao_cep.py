@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resolução de CEPs fora da thread da interface
+"""
+
+import logging
+from PySide6.QtCore import QThread, Signal
+
+from services.cep_service import CepService
+
+class ResolucaoCepThread(QThread):
+    # (CEP normalizado, dados do CEP ou None)
+    resolvido = Signal(str, object)
+
+    def __init__(self, cep_service: CepService, cep: str, parent=None):
+        super().__init__(parent)
+        self.cep_service = cep_service
+        self.cep = cep
+
+    def run(self):
+        """Consulta o CEP (cache local ou fonte externa) e entrega o resultado por sinal"""
+        try:
+            dados = self.cep_service.resolver(self.cep)
+        except Exception as e:
+            logging.error(f"Erro ao resolver CEP {self.cep}: {e}")
+            dados = None
+        self.resolvido.emit(self.cep, dados)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Painel de resumo do portfólio agrupado por cidade, região, status ou padrão
+"""
+
+import logging
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
+                               QTableWidgetItem, QHeaderView, QLabel, QComboBox, QGroupBox)
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QFont
+
+from services.agregacao_service import AgregacaoService, AGRUPAMENTOS
+from utils.formatacao import formatar_moeda, formatar_percentual
+
+class ResumoWidget(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.agregacao_service = AgregacaoService()
+        self.colunas = {}
+        self.setup_ui()
+
+    def setup_ui(self):
+        """Configura a interface do resumo"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        grupo = QGroupBox("📊 Resumo do Portfólio")
+        grupo.setStyleSheet("""
+            QGroupBox {
+                font-weight: bold;
+                border: 2px solid #e9ecef;
+                border-radius: 8px;
+                margin-top: 10px;
+                padding-top: 10px;
+                background-color: white;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 10px;
+                padding: 0 8px 0 8px;
+                color: #495057;
+            }
+        """)
+        grupo_layout = QVBoxLayout(grupo)
+
+        # Seleção do agrupamento
+        seletor_layout = QHBoxLayout()
+        seletor_label = QLabel("Agrupar por:")
+        seletor_label.setStyleSheet("QLabel { font-weight: bold; color: #495057; }")
+        seletor_layout.addWidget(seletor_label)
+
+        self.agrupamento_combo = QComboBox()
+        for chave, rotulo in AGRUPAMENTOS.items():
+            self.agrupamento_combo.addItem(rotulo, chave)
+        self.agrupamento_combo.setCurrentIndex(list(AGRUPAMENTOS.keys()).index('regiao'))
+        self.agrupamento_combo.currentIndexChanged.connect(self.atualizar_resumo)
+        seletor_layout.addWidget(self.agrupamento_combo)
+        seletor_layout.addStretch()
+        grupo_layout.addLayout(seletor_layout)
+
+        # Tabela de grupos
+        self.tabela = QTableWidget()
+        headers = ["Grupo", "Imóveis", "Custo Total", "Preço Estimado", "Margem", "ROI Ponderado"]
+        self.tabela.setColumnCount(len(headers))
+        self.tabela.setHorizontalHeaderLabels(headers)
+        self.tabela.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.tabela.setAlternatingRowColors(True)
+        self.tabela.verticalHeader().setVisible(False)
+        self.tabela.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.tabela.setMinimumHeight(140)
+        grupo_layout.addWidget(self.tabela)
+
+        layout.addWidget(grupo)
+
+    def carregar_colunas(self, colunas: dict):
+        """Recebe o quadro colunar exibido na tabela de imóveis e recalcula o resumo"""
+        self.colunas = colunas or {}
+        self.atualizar_resumo()
+
+    def atualizar_resumo(self):
+        """Agrega o quadro atual pelo agrupamento selecionado"""
+        try:
+            chave = self.agrupamento_combo.currentData()
+            resumo = self.agregacao_service.agregar(
+                self.agregacao_service.linhas_de_colunas(self.colunas), [chave]
+            )
+            grupos = list(resumo['grupos'][chave].items()) + [("Total", resumo['total'])]
+
+            self.tabela.setRowCount(len(grupos))
+            for row, (nome, valores) in enumerate(grupos):
+                itens = [
+                    str(nome),
+                    str(valores['quantidade']),
+                    formatar_moeda(valores['total_custo']),
+                    formatar_moeda(valores['total_preco_estimado']),
+                    formatar_moeda(valores['total_margem']),
+                    formatar_percentual(valores['roi_ponderado'])
+                ]
+                for col, texto in enumerate(itens):
+                    item = QTableWidgetItem(texto)
+                    if nome == "Total":
+                        fonte = item.font()
+                        fonte.setBold(True)
+                        item.setFont(fonte)
+                    self.tabela.setItem(row, col, item)
+
+        except Exception as e:
+            logging.error(f"Erro ao atualizar resumo do portfólio: {e}")
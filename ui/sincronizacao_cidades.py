@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sincronização de cidades com o IBGE fora da thread da interface
+"""
+
+import logging
+from PySide6.QtCore import QThread, Signal
+
+from services.cidade_service import CidadeService
+
+class SincronizacaoCidadesThread(QThread):
+    # (cidades concluídas, total de cidades)
+    progresso = Signal(int, int)
+    # True quando o catálogo local foi atualizado ou confirmado como atual
+    concluida = Signal(bool)
+
+    def __init__(self, cidade_service: CidadeService, forcar_atualizacao: bool = False, parent=None):
+        super().__init__(parent)
+        self.cidade_service = cidade_service
+        self.forcar_atualizacao = forcar_atualizacao
+
+    def run(self):
+        """Executa a sincronização; o progresso chega à interface por sinal"""
+        try:
+            sucesso = self.cidade_service.sincronizar_cidades(
+                self.forcar_atualizacao,
+                progresso=self.progresso.emit,
+                cancelado=self.isInterruptionRequested
+            )
+        except Exception as e:
+            logging.error(f"Erro na sincronização de cidades em segundo plano: {e}")
+            sucesso = False
+        self.concluida.emit(sucesso and not self.isInterruptionRequested())
+
+    def cancelar(self, espera_ms: int = 5000):
+        """Pede a interrupção e aguarda as requisições em andamento terminarem"""
+        if self.isRunning():
+            self.requestInterruption()
+            self.wait(espera_ms)
@@ -7,27 +7,45 @@ Tabela de imóveis com filtros e ordenação
 import logging
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, 
                                QTableWidgetItem, QHeaderView, QLabel, QPushButton,
-                               QGroupBox, QFrame, QMessageBox, QFileDialog)
+                               QGroupBox, QFrame, QMessageBox, QFileDialog, QInputDialog,
+                               QProgressDialog, QApplication)
 from PySide6.QtCore import Signal, Qt
 from PySide6.QtGui import QFont, QColor, QPalette
 
 from models.imovel import Imovel
 from models.database import DatabaseManager
 from utils.formatacao import formatar_moeda
-from services.calculo_service import CalculoService
+from services.calculo_service import get_calculo_service
 from services.export_service import ExportService
+from services.historico_service import HistoricoService
+from ui.exportacao import ExportacaoThread
+from services.indicador_service import (IndicadorService, compilar_formula, montar_colunas,
+                                        formatar_valor, CAMPOS_DISPONIVEIS, FORMATOS)
+
+# Colunas fixas da tabela; indicadores personalizados são adicionados depois delas
+COLUNAS_FIXAS = [
+    "CEP", "Cidade", "Estado", 
+    "Custo Total (R$)", "Preço Estimado (R$)", "Margem (R$)", "ROI (%)"
+]
 
 class TabelaImoveis(QWidget):
     imovel_selecionado = Signal(Imovel)
+    # Quadro colunar (campos + cálculos) dos imóveis exibidos, usado pelo resumo
+    dados_atualizados = Signal(dict)
     
     def __init__(self):
         super().__init__()
         self.db_manager = DatabaseManager()
-        self.calculo_service = CalculoService()
+        self.calculo_service = get_calculo_service()
         self.export_service = ExportService()
+        self.indicador_service = IndicadorService(self.db_manager)
+        self.historico_service = HistoricoService(self.db_manager, self.calculo_service)
+        self.indicadores = self.indicador_service.listar_indicadores()
         self.imoveis = []
         self.imoveis_filtrados = []
         self.imovel_selecionado_atual = None
+        self.exportacao_thread = None
+        self.exportacao_dialogo = None
         self.setup_ui()
         self.setup_connections()
         self.carregar_imoveis()
@@ -164,6 +182,10 @@ class TabelaImoveis(QWidget):
         header_layout.addWidget(self.btn_export_pdf)
         header_layout.addWidget(self.btn_export_excel)
         
+        # Indicadores personalizados (fórmulas)
+        self.btn_indicadores = QPushButton("🧮 Indicador")
+        header_layout.addWidget(self.btn_indicadores)
+        
         layout.addWidget(header_widget)
         
         # Tabela
@@ -209,12 +231,7 @@ class TabelaImoveis(QWidget):
         """)
         
         # Configurar cabeçalhos - Removido ID e endereço, mantido apenas CEP
-        headers = [
-            "CEP", "Cidade", "Estado", 
-            "Custo Total (R$)", "Preço Estimado (R$)", "Margem (R$)", "ROI (%)"
-        ]
-        self.tabela.setColumnCount(len(headers))
-        self.tabela.setHorizontalHeaderLabels(headers)
+        self._configurar_colunas()
         
         # Configurar comportamento da tabela
         self.tabela.setAlternatingRowColors(True)
@@ -275,10 +292,13 @@ class TabelaImoveis(QWidget):
         self.btn_export_pdf.clicked.connect(self.exportar_pdf)
         self.btn_export_excel.clicked.connect(self.exportar_excel)
         
+        # Conectar botão de indicadores personalizados
+        self.btn_indicadores.clicked.connect(self.gerenciar_indicadores)
+        
         # Habilitar/desabilitar botões baseado na seleção
         self.atualizar_botoes()
         
-    def carregar_imoveis(self):
+    def _carregar_imoveis(self):
         """Carrega todos os imóveis do banco"""
         try:
             query = """
@@ -307,54 +327,90 @@ class TabelaImoveis(QWidget):
             logging.error(f"Erro ao carregar imóveis: {e}")
             self.status_label.setText("Erro ao carregar imóveis")
             
-    def atualizar_tabela(self):
-        """Atualiza a tabela com os imóveis filtrados"""
-        self.tabela.setRowCount(len(self.imoveis_filtrados))
+    def _configurar_colunas(self):
+        """Define as colunas fixas seguidas dos indicadores personalizados"""
+        headers = COLUNAS_FIXAS + [indicador['nome'] for indicador in self.indicadores]
+        self.tabela.setColumnCount(len(headers))
+        self.tabela.setHorizontalHeaderLabels(headers)
         
-        for row, imovel in enumerate(self.imoveis_filtrados):
-            # Calcular valores financeiros
-            calculos = self.calculo_service.calcular_tudo(imovel)
-            
-            # CEP (agora na posição 0)
-            self.tabela.setItem(row, 0, QTableWidgetItem(imovel.cep))
-            
-            # Cidade (agora na posição 1)
-            self.tabela.setItem(row, 1, QTableWidgetItem(imovel.cidade))
-            
-            # Estado (agora na posição 2)
-            self.tabela.setItem(row, 2, QTableWidgetItem(imovel.estado))
-            
-            # Custo Total (agora na posição 3)
-            custo_total = calculos['custo_total']
-            self.tabela.setItem(row, 3, QTableWidgetItem(formatar_moeda(custo_total)))
-            
-            # Preço Estimado (agora na posição 4)
-            preco_estimado = calculos['preco_venda_estimado']
-            self.tabela.setItem(row, 4, QTableWidgetItem(formatar_moeda(preco_estimado)))
-            
-            # Margem (agora na posição 5)
-            margem = calculos['margem']
-            margem_item = QTableWidgetItem(formatar_moeda(margem))
-            if margem > 0:
-                margem_item.setBackground(QColor(220, 255, 220))  # Verde claro
-            elif margem < 0:
-                margem_item.setBackground(QColor(255, 220, 220))  # Vermelho claro
-            else:
-                margem_item.setBackground(QColor(255, 255, 220))  # Amarelo claro
-            self.tabela.setItem(row, 5, margem_item)
-            
-            # ROI (agora na posição 6)
-            roi = calculos['roi']
-            roi_item = QTableWidgetItem(f"{roi:.1f}%")
-            if roi > 20:
-                roi_item.setBackground(QColor(220, 255, 220))  # Verde claro
-            elif roi < 0:
-                roi_item.setBackground(QColor(255, 220, 220))  # Vermelho claro
-            else:
-                roi_item.setBackground(QColor(255, 255, 220))  # Amarelo claro
-            self.tabela.setItem(row, 6, roi_item)
+    def _atualizar_tabela(self, calculos_lote=None):
+        """Atualiza a tabela com os imóveis filtrados (calculos_lote, se já calculados, na mesma ordem)"""
+        # Preencher sem disparar itemChanged (edição) e sem reordenar linhas no meio
+        colunas = {}
+        self.tabela.blockSignals(True)
+        self.tabela.setSortingEnabled(False)
+        try:
+            self._configurar_colunas()
+            self.tabela.setRowCount(len(self.imoveis_filtrados))
+            
+            # Calcular todo o conjunto filtrado de uma vez (o filtro por fórmula já pode ter calculado)
+            if calculos_lote is None:
+                calculos_lote = self.calculo_service.calcular_lote(self.imoveis_filtrados)
+            colunas = montar_colunas(self.imoveis_filtrados, calculos_lote)
+            valores_indicadores = self.indicador_service.avaliar_indicadores(self.indicadores, colunas)
+            
+            for row, (imovel, calculos) in enumerate(zip(self.imoveis_filtrados, calculos_lote)):
+                # CEP (agora na posição 0) - guarda o índice do imóvel para sobreviver à ordenação
+                cep_item = QTableWidgetItem(imovel.cep)
+                cep_item.setData(Qt.UserRole, row)
+                self.tabela.setItem(row, 0, cep_item)
+                
+                # Cidade (agora na posição 1)
+                self.tabela.setItem(row, 1, QTableWidgetItem(imovel.cidade))
+                
+                # Estado (agora na posição 2)
+                self.tabela.setItem(row, 2, QTableWidgetItem(imovel.estado))
+                
+                self._preencher_calculos(row, calculos)
+                self._preencher_indicadores(
+                    row, {nome: valores[row] for nome, valores in valores_indicadores.items()}
+                )
+        finally:
+            self.tabela.setSortingEnabled(True)
+            self.tabela.blockSignals(False)
+        
+        self.dados_atualizados.emit(colunas)
+            
+    def _preencher_calculos(self, row, calculos):
+        """Preenche as colunas financeiras (3 a 6) de uma linha"""
+        # Custo Total (agora na posição 3)
+        custo_total = calculos['custo_total']
+        self.tabela.setItem(row, 3, QTableWidgetItem(formatar_moeda(custo_total)))
+        
+        # Preço Estimado (agora na posição 4)
+        preco_estimado = calculos['preco_venda_estimado']
+        self.tabela.setItem(row, 4, QTableWidgetItem(formatar_moeda(preco_estimado)))
+        
+        # Margem (agora na posição 5)
+        margem = calculos['margem']
+        margem_item = QTableWidgetItem(formatar_moeda(margem))
+        if margem > 0:
+            margem_item.setBackground(QColor(220, 255, 220))  # Verde claro
+        elif margem < 0:
+            margem_item.setBackground(QColor(255, 220, 220))  # Vermelho claro
+        else:
+            margem_item.setBackground(QColor(255, 255, 220))  # Amarelo claro
+        self.tabela.setItem(row, 5, margem_item)
+        
+        # ROI (agora na posição 6)
+        roi = calculos['roi']
+        roi_item = QTableWidgetItem(f"{roi:.1f}%")
+        if roi > 20:
+            roi_item.setBackground(QColor(220, 255, 220))  # Verde claro
+        elif roi < 0:
+            roi_item.setBackground(QColor(255, 220, 220))  # Vermelho claro
+        else:
+            roi_item.setBackground(QColor(255, 255, 220))  # Amarelo claro
+        self.tabela.setItem(row, 6, roi_item)
+        
+    def _preencher_indicadores(self, row, valores):
+        """Preenche as colunas de indicadores personalizados de uma linha"""
+        for offset, indicador in enumerate(self.indicadores):
+            item = QTableWidgetItem(formatar_valor(valores.get(indicador['nome']), indicador['formato']))
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            self.tabela.setItem(row, len(COLUNAS_FIXAS) + offset, item)
             
-    def aplicar_filtros(self, filtros):
+    def _aplicar_filtros(self, filtros):
         """Aplica filtros à lista de imóveis"""
         self.imoveis_filtrados = []
         
@@ -362,8 +418,29 @@ class TabelaImoveis(QWidget):
             if self.imovel_atende_filtros(imovel, filtros):
                 self.imoveis_filtrados.append(imovel)
         
-        self.atualizar_tabela()
-        self.status_label.setText(f"{len(self.imoveis_filtrados)} imóveis encontrados")
+        # Filtro por fórmula, avaliado de uma vez sobre os imóveis restantes
+        erro_formula = None
+        calculos_filtrados = None
+        if filtros.get('formula') and self.imoveis_filtrados:
+            try:
+                formula = compilar_formula(filtros['formula'])
+                calculos_lote = self.calculo_service.calcular_lote(self.imoveis_filtrados)
+                mascara = formula.filtrar(montar_colunas(self.imoveis_filtrados, calculos_lote))
+                self.imoveis_filtrados = [
+                    imovel for imovel, atende in zip(self.imoveis_filtrados, mascara) if atende
+                ]
+                # Reaproveitados ao preencher a tabela, em vez de calcular tudo de novo
+                calculos_filtrados = [
+                    calculos for calculos, atende in zip(calculos_lote, mascara) if atende
+                ]
+            except ValueError as e:
+                erro_formula = str(e)
+        
+        self._atualizar_tabela(calculos_filtrados)
+        if erro_formula:
+            self.status_label.setText(f"Fórmula ignorada: {erro_formula}")
+        else:
+            self.status_label.setText(f"{len(self.imoveis_filtrados)} imóveis encontrados")
         
     def imovel_atende_filtros(self, imovel, filtros):
         """Verifica se um imóvel atende aos filtros aplicados"""
@@ -408,15 +485,24 @@ class TabelaImoveis(QWidget):
         
     def on_selecao_alterada(self):
         """Chamado quando a seleção da tabela é alterada"""
-        current_row = self.tabela.currentRow()
-        if current_row >= 0 and current_row < len(self.imoveis_filtrados):
-            imovel_selecionado = self.imoveis_filtrados[current_row]
+        imovel_selecionado = self._imovel_da_linha(self.tabela.currentRow())
+        if imovel_selecionado is not None:
             self.imovel_selecionado_atual = imovel_selecionado
             self.imovel_selecionado.emit(imovel_selecionado)
         else:
             self.imovel_selecionado_atual = None
         self.atualizar_botoes()
         
+    def _imovel_da_linha(self, row):
+        """Retorna o imóvel exibido em uma linha, mesmo após ordenação"""
+        item = self.tabela.item(row, 0) if row >= 0 else None
+        if item is None:
+            return None
+        indice = item.data(Qt.UserRole)
+        if indice is None or indice >= len(self.imoveis_filtrados):
+            return None
+        return self.imoveis_filtrados[indice]
+        
     def on_item_changed(self, item):
         """Chamado quando um item da tabela é modificado"""
         if not item:
@@ -439,8 +525,8 @@ class TabelaImoveis(QWidget):
                     valor = float(texto_limpo)
                     
                     # Atualizar o imóvel correspondente
-                    if row < len(self.imoveis_filtrados):
-                        imovel = self.imoveis_filtrados[row]
+                    imovel = self._imovel_da_linha(row)
+                    if imovel is not None:
                         
                         # Aplicar cálculos automáticos baseado na coluna editada
                         if column == 3:  # Custo Total
@@ -452,7 +538,9 @@ class TabelaImoveis(QWidget):
                         
             except ValueError:
                 # Se não conseguir converter, reverter para o valor anterior
-                self.atualizar_linha_calculos(row, self.imoveis_filtrados[row])
+                imovel = self._imovel_da_linha(row)
+                if imovel is not None:
+                    self.atualizar_linha_calculos(row, imovel)
                 
     def calcular_com_custo_total(self, imovel, novo_custo_total, row):
         """Calcula automaticamente quando o custo total é alterado"""
@@ -483,7 +571,8 @@ class TabelaImoveis(QWidget):
                 imovel.custos_reforma = novo_custo_reforma
                 imovel.custos_transacao = novo_custo_transacao
                 
-                # Recalcular e atualizar a linha
+                # Registrar o novo custo no histórico e atualizar a linha
+                self.historico_service.registrar(imovel)
                 self.atualizar_linha_calculos(row, imovel)
                 
         except Exception as e:
@@ -520,42 +609,63 @@ class TabelaImoveis(QWidget):
             
     def atualizar_linha_calculos(self, row, imovel):
         """Atualiza os cálculos de uma linha específica"""
+        self.tabela.blockSignals(True)
         try:
             # Recalcular valores financeiros
             calculos = self.calculo_service.calcular_tudo(imovel)
+            self._preencher_calculos(row, calculos)
             
-            # Atualizar Custo Total
-            custo_total = calculos['custo_total']
-            self.tabela.setItem(row, 3, QTableWidgetItem(formatar_moeda(custo_total)))
-            
-            # Atualizar Preço Estimado
-            preco_estimado = calculos['preco_venda_estimado']
-            self.tabela.setItem(row, 4, QTableWidgetItem(formatar_moeda(preco_estimado)))
-            
-            # Atualizar Margem
-            margem = calculos['margem']
-            margem_item = QTableWidgetItem(formatar_moeda(margem))
-            if margem > 0:
-                margem_item.setBackground(QColor(220, 255, 220))  # Verde claro
-            elif margem < 0:
-                margem_item.setBackground(QColor(255, 220, 220))  # Vermelho claro
-            else:
-                margem_item.setBackground(QColor(255, 255, 220))  # Amarelo claro
-            self.tabela.setItem(row, 5, margem_item)
-            
-            # Atualizar ROI
-            roi = calculos['roi']
-            roi_item = QTableWidgetItem(f"{roi:.1f}%")
-            if roi > 20:
-                roi_item.setBackground(QColor(220, 255, 220))  # Verde claro
-            elif roi < 0:
-                roi_item.setBackground(QColor(255, 220, 220))  # Vermelho claro
-            else:
-                roi_item.setBackground(QColor(255, 255, 220))  # Amarelo claro
-            self.tabela.setItem(row, 6, roi_item)
+            # Recalcular indicadores personalizados da linha
+            valores = self.indicador_service.avaliar_indicadores(
+                self.indicadores, montar_colunas([imovel], [calculos])
+            )
+            self._preencher_indicadores(row, {nome: lista[0] for nome, lista in valores.items()})
             
         except Exception as e:
             logging.error(f"Erro ao atualizar cálculos da linha {row}: {e}")
+        finally:
+            self.tabela.blockSignals(False)
+            
+    def gerenciar_indicadores(self):
+        """Cria, altera ou remove um indicador personalizado (coluna calculada)"""
+        nome, ok = QInputDialog.getText(self, "Indicador Personalizado", "Nome da coluna:")
+        if not ok or not nome.strip():
+            return
+        nome = nome.strip()
+        
+        existente = next((i for i in self.indicadores if i['nome'] == nome), None)
+        campos = ", ".join(sorted(CAMPOS_DISPONIVEIS))
+        expressao, ok = QInputDialog.getText(
+            self,
+            "Indicador Personalizado",
+            f"Fórmula (deixe em branco para remover):\n\nCampos: {campos}\n"
+            f"Exemplo: preco_venda_estimado / metragem",
+            text=existente['expressao'] if existente else ""
+        )
+        if not ok:
+            return
+        
+        try:
+            if not expressao.strip():
+                if existente:
+                    self.indicador_service.remover_indicador(nome)
+            else:
+                formato, ok = QInputDialog.getItem(
+                    self, "Indicador Personalizado", "Formato:", FORMATOS,
+                    FORMATOS.index(existente['formato']) if existente else 0, False
+                )
+                if not ok:
+                    return
+                self.indicador_service.salvar_indicador(nome, expressao, formato)
+                
+            self.indicadores = self.indicador_service.listar_indicadores()
+            self.atualizar_tabela()
+            
+        except ValueError as e:
+            QMessageBox.warning(self, "Fórmula inválida", str(e))
+        except Exception as e:
+            logging.error(f"Erro ao salvar indicador personalizado: {e}")
+            QMessageBox.critical(self, "Erro", f"Erro ao salvar indicador: {str(e)}")
             
     def atualizar_botoes(self):
         """Atualiza o estado dos botões baseado na seleção"""
@@ -563,7 +673,7 @@ class TabelaImoveis(QWidget):
         self.btn_editar.setEnabled(tem_selecao)
         self.btn_excluir.setEnabled(tem_selecao)
         
-    def novo_imovel(self):
+    def _novo_imovel(self):
         """Abre o formulário para criar um novo imóvel"""
         try:
             from ui.imovel_form import ImovelForm
@@ -577,7 +687,7 @@ class TabelaImoveis(QWidget):
             logging.error(f"Erro ao abrir formulário de novo imóvel: {e}")
             QMessageBox.critical(self, "Erro", f"Erro ao abrir formulário: {str(e)}")
             
-    def editar_imovel(self):
+    def _editar_imovel(self):
         """Abre o formulário para editar o imóvel selecionado"""
         if not self.imovel_selecionado_atual:
             QMessageBox.warning(self, "Aviso", "Selecione um imóvel para editar.")
@@ -596,7 +706,7 @@ class TabelaImoveis(QWidget):
             logging.error(f"Erro ao abrir formulário de edição: {e}")
             QMessageBox.critical(self, "Erro", f"Erro ao abrir formulário: {str(e)}")
             
-    def excluir_imovel(self):
+    def _excluir_imovel(self):
         """Exclui o imóvel selecionado"""
         if not self.imovel_selecionado_atual:
             QMessageBox.warning(self, "Aviso", "Selecione um imóvel para excluir.")
@@ -628,7 +738,7 @@ class TabelaImoveis(QWidget):
                 logging.error(f"Erro ao excluir imóvel: {e}")
                 QMessageBox.critical(self, "Erro", f"Erro ao excluir imóvel: {str(e)}")
                 
-    def exportar_pdf(self):
+    def _exportar_pdf(self):
         """Exporta os dados filtrados para PDF"""
         try:
             # Verificar se há dados para exportar
@@ -645,25 +755,13 @@ class TabelaImoveis(QWidget):
             )
             
             if arquivo:
-                # Exportar
-                sucesso = self.export_service.export_to_pdf(self.imoveis_filtrados, arquivo)
+                self._iniciar_exportacao('PDF', arquivo)
                 
-                if sucesso:
-                    QMessageBox.information(
-                        self, 
-                        "Sucesso", 
-                        f"Relatório PDF exportado com sucesso!\n\n"
-                        f"Arquivo: {arquivo}\n"
-                        f"Imóveis: {len(self.imoveis_filtrados)}"
-                    )
-                else:
-                    QMessageBox.critical(self, "Erro", "Erro ao exportar para PDF.")
-                    
         except Exception as e:
             logging.error(f"Erro na exportação PDF: {e}")
             QMessageBox.critical(self, "Erro", f"Erro na exportação PDF: {str(e)}")
             
-    def exportar_excel(self):
+    def _exportar_excel(self):
         """Exporta os dados filtrados para Excel"""
         try:
             # Verificar se há dados para exportar
@@ -680,24 +778,71 @@ class TabelaImoveis(QWidget):
             )
             
             if arquivo:
-                # Exportar
-                sucesso = self.export_service.export_to_excel(self.imoveis_filtrados, arquivo)
+                self._iniciar_exportacao('Excel', arquivo)
                 
-                if sucesso:
-                    QMessageBox.information(
-                        self, 
-                        "Sucesso", 
-                        f"Planilha Excel exportada com sucesso!\n\n"
-                        f"Arquivo: {arquivo}\n"
-                        f"Imóveis: {len(self.imoveis_filtrados)}"
-                    )
-                else:
-                    QMessageBox.critical(self, "Erro", "Erro ao exportar para Excel.")
-                    
         except Exception as e:
             logging.error(f"Erro na exportação Excel: {e}")
             QMessageBox.critical(self, "Erro", f"Erro na exportação Excel: {str(e)}")
             
+    def _iniciar_exportacao(self, formato: str, arquivo: str):
+        """Dispara a exportação em segundo plano com diálogo de progresso cancelável"""
+        if self.exportacao_thread and self.exportacao_thread.isRunning():
+            QMessageBox.warning(self, "Aviso", "Já existe uma exportação em andamento.")
+            return
+            
+        total = len(self.imoveis_filtrados)
+        self.exportacao_thread = ExportacaoThread(self.export_service, formato, self.imoveis_filtrados, arquivo)
+        self.exportacao_dialogo = QProgressDialog(
+            f"Exportando {total} imóveis para {formato}...", "Cancelar", 0, total, self
+        )
+        self.exportacao_dialogo.setWindowTitle("Exportação")
+        self.exportacao_dialogo.setMinimumDuration(500)
+        self.exportacao_dialogo.setAutoClose(False)
+        self.exportacao_dialogo.setAutoReset(False)
+        self.exportacao_dialogo.canceled.connect(self.exportacao_thread.requestInterruption)
+        self.exportacao_thread.progresso.connect(self.on_exportacao_progresso)
+        self.exportacao_thread.concluida.connect(self.on_exportacao_concluida)
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.exportacao_thread.cancelar)
+            
+        self.btn_export_pdf.setEnabled(False)
+        self.btn_export_excel.setEnabled(False)
+        self.exportacao_thread.start()
+        
+    def on_exportacao_progresso(self, feitos: int, total: int):
+        """Atualiza o diálogo de progresso da exportação"""
+        if self.exportacao_dialogo is not None:
+            self.exportacao_dialogo.setMaximum(total)
+            self.exportacao_dialogo.setValue(feitos)
+            
+    def on_exportacao_concluida(self, sucesso: bool, arquivo: str):
+        """Fecha o progresso e informa o resultado da exportação"""
+        thread = self.exportacao_thread
+        # Antes de fechar o diálogo: fechar também emite canceled
+        cancelada = thread.isInterruptionRequested()
+        if self.exportacao_dialogo is not None:
+            self.exportacao_dialogo.canceled.disconnect()
+            self.exportacao_dialogo.close()
+            self.exportacao_dialogo = None
+        self.btn_export_pdf.setEnabled(True)
+        self.btn_export_excel.setEnabled(True)
+        
+        formato = thread.formato
+        descricao = "Relatório PDF exportado" if formato == 'PDF' else "Planilha Excel exportada"
+        if cancelada:
+            QMessageBox.information(self, "Exportação cancelada", "A exportação foi cancelada.")
+        elif sucesso:
+            QMessageBox.information(
+                self, 
+                "Sucesso", 
+                f"{descricao} com sucesso!\n\n"
+                f"Arquivo: {arquivo}\n"
+                f"Imóveis: {len(thread.imoveis)}"
+            )
+        else:
+            QMessageBox.critical(self, "Erro", f"Erro ao exportar para {formato}.")
+            
     def on_imovel_salvo(self, imovel):
         """Chamado quando um imóvel é salvo"""
         # Recarregar a tabela para mostrar as mudanças